@@ -0,0 +1,21 @@
+-- Stage reuse across iterations
+-- When a stage's consensus is strong enough, later iterations of the same run reuse
+-- its result instead of re-voting it. Each reuse is recorded as an iteration row with
+-- status 'reused', pointing at the iteration that produced the result, together with
+-- the cost and time the original run of the stage took (i.e. what the reuse saved).
+
+ALTER TABLE iterations DROP CONSTRAINT IF EXISTS iterations_status_check;
+ALTER TABLE iterations ADD CONSTRAINT iterations_status_check
+CHECK (status IN ('started', 'completed', 'failed', 'retry', 'retrying', 'reused'));
+
+ALTER TABLE iterations
+ADD COLUMN IF NOT EXISTS reused_from_iteration INTEGER,
+ADD COLUMN IF NOT EXISTS saved_api_cost DECIMAL(10, 4),
+ADD COLUMN IF NOT EXISTS saved_duration_ms INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_iterations_reused
+ON iterations(stage) WHERE status = 'reused';
+
+COMMENT ON COLUMN iterations.reused_from_iteration IS 'For status = reused: the iteration whose stage result was reused';
+COMMENT ON COLUMN iterations.saved_api_cost IS 'For status = reused: API cost of the original stage run, not spent again';
+COMMENT ON COLUMN iterations.saved_duration_ms IS 'For status = reused: duration of the original stage run, not spent again';
@@ -0,0 +1,14 @@
+-- Real token accounting for model_usage
+-- Token counts now come from provider usage metadata; cached prompt tokens are
+-- recorded separately and every row notes the price table version used to cost it.
+
+ALTER TABLE model_usage ADD COLUMN IF NOT EXISTS cached_tokens INTEGER DEFAULT 0;
+ALTER TABLE model_usage ADD COLUMN IF NOT EXISTS cache_write_tokens INTEGER DEFAULT 0;
+ALTER TABLE model_usage ADD COLUMN IF NOT EXISTS token_source TEXT DEFAULT 'provider'; -- 'provider' or 'estimate'
+ALTER TABLE model_usage ADD COLUMN IF NOT EXISTS price_table_version TEXT;
+
+COMMENT ON COLUMN model_usage.prompt_tokens IS 'All input tokens, including cached_tokens and cache_write_tokens';
+COMMENT ON COLUMN model_usage.cached_tokens IS 'Input tokens served from the provider prompt cache';
+COMMENT ON COLUMN model_usage.cache_write_tokens IS 'Input tokens written to the provider prompt cache (Anthropic)';
+COMMENT ON COLUMN model_usage.token_source IS 'provider = usage metadata from the response, estimate = no usage metadata available';
+COMMENT ON COLUMN model_usage.price_table_version IS 'Version of the price table in src/utils/pricing.py used for api_cost';
@@ -0,0 +1,12 @@
+-- Provider batch mode for non-urgent queue items
+-- Items marked 'batch' are processed through the OpenAI Batch / Anthropic Message
+-- Batches APIs when the processor runs with QUEUE_BATCH_MODE=flagged.
+
+ALTER TABLE ai_extraction_queue
+ADD COLUMN IF NOT EXISTS processing_priority TEXT DEFAULT 'interactive'
+CHECK (processing_priority IN ('interactive', 'batch'));
+
+CREATE INDEX IF NOT EXISTS idx_ai_extraction_queue_priority
+ON ai_extraction_queue(status, processing_priority);
+
+COMMENT ON COLUMN ai_extraction_queue.processing_priority IS 'interactive = answer needed now, batch = can wait for provider batch turnaround (up to 24h, half price)';
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Pipeline Benchmark
+Runs SystemDispatcher.achieve_target_accuracy end to end against a provider cassette
+
+Record a cassette once against the live providers:
+    python benchmark_pipeline.py --mode record --uploads upload_123 upload_456
+
+Then replay it offline (no OpenAI/Anthropic/Gemini/Supabase access needed):
+    python benchmark_pipeline.py --mode replay --uploads upload_123 upload_456 \\
+        --systems custom_consensus langgraph hybrid --concurrency 4 --replay-latency
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Add current directory to path for module imports
+sys.path.insert(0, os.path.dirname(__file__))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark extraction systems against a provider cassette")
+    parser.add_argument("--mode", choices=["record", "replay"], default="replay")
+    parser.add_argument("--cassette", default="cassettes/pipeline.jsonl")
+    parser.add_argument("--uploads", nargs="+", required=True, help="Upload IDs to run")
+    parser.add_argument("--systems", nargs="+", default=["custom_consensus", "langgraph", "hybrid"])
+    parser.add_argument("--concurrency", type=int, default=1, help="Runs in flight at once")
+    parser.add_argument("--repeat", type=int, default=1, help="Times to run each upload per system")
+    parser.add_argument("--max-iterations", type=int, default=3)
+    parser.add_argument("--target-accuracy", type=float, default=0.95)
+    parser.add_argument("--replay-latency", action="store_true", help="Sleep for the recorded provider latencies")
+    return parser.parse_args()
+
+
+async def run_system(dispatcher_factory, system: str, uploads, args):
+    """Run every upload through one system and return per-run timings"""
+    semaphore = asyncio.Semaphore(args.concurrency)
+    durations = []
+    failures = []
+
+    async def run_one(upload_id: str):
+        async with semaphore:
+            dispatcher = dispatcher_factory()
+            started = time.perf_counter()
+            try:
+                await dispatcher.achieve_target_accuracy(
+                    upload_id=upload_id,
+                    target_accuracy=args.target_accuracy,
+                    max_iterations=args.max_iterations,
+                    system=system
+                )
+                durations.append(time.perf_counter() - started)
+            except Exception as e:
+                failures.append((upload_id, str(e)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*[run_one(upload_id) for upload_id in uploads for _ in range(args.repeat)])
+    wall_time = time.perf_counter() - started
+
+    return {
+        'system': system,
+        'runs': len(durations),
+        'failures': failures,
+        'wall_time': wall_time,
+        'throughput_per_min': len(durations) / wall_time * 60 if wall_time else 0.0,
+        'p50': statistics.median(durations) if durations else 0.0,
+        'max': max(durations) if durations else 0.0
+    }
+
+
+async def main():
+    args = parse_args()
+
+    # The cassette is configured through the environment before the config is loaded
+    os.environ["PROVIDER_CASSETTE_MODE"] = args.mode
+    os.environ["PROVIDER_CASSETTE_PATH"] = args.cassette
+    os.environ["PROVIDER_CASSETTE_REPLAY_LATENCY"] = "true" if args.replay_latency else "false"
+    if args.mode == "replay":
+        # Clients are still constructed in replay mode; they are never called
+        for key in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "GOOGLE_API_KEY"):
+            os.environ.setdefault(key, "cassette-replay")
+
+    from src.config import SystemConfig
+    from src.orchestrator.system_dispatcher import SystemDispatcher
+    from src.utils import get_provider_cassette
+
+    config = SystemConfig()
+
+    def dispatcher_factory():
+        return SystemDispatcher(config)
+
+    print(f"Cassette: {args.cassette} ({args.mode})")
+    results = []
+    for system in args.systems:
+        result = await run_system(dispatcher_factory, system, args.uploads, args)
+        results.append(result)
+
+    print()
+    print(f"{'system':<20}{'runs':>6}{'fail':>6}{'wall s':>10}{'runs/min':>10}{'p50 s':>10}{'max s':>10}")
+    for result in results:
+        print(
+            f"{result['system']:<20}{result['runs']:>6}{len(result['failures']):>6}"
+            f"{result['wall_time']:>10.2f}{result['throughput_per_min']:>10.2f}"
+            f"{result['p50']:>10.2f}{result['max']:>10.2f}"
+        )
+        for upload_id, error in result['failures'][:3]:
+            print(f"    {upload_id}: {error[:120]}")
+
+    cassette = get_provider_cassette()
+    latency_stats = cassette.get_latency_stats()
+    if latency_stats:
+        print()
+        print("Recorded provider latency (s):")
+        for provider, stats in latency_stats.items():
+            print(f"  {provider:<12} n={stats['count']:<5} p50={stats['p50']:.2f} p95={stats['p95']:.2f} max={stats['max']:.2f}")
+    print(f"\nRecorded: {cassette.recorded}  Replayed: {cassette.replayed}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Position Voting Benchmark
+Compares exact-key position voting with alignment voting on synthetic shelf bays
+
+Three simulated models extract the same bay: one accurate, one whose positions are
+shifted by a phantom product at the start of some shelves and which misspells
+names, and one that misses products. Each bay is voted on with both methods:
+
+    python benchmark_position_voting.py --products 50 200 400 --bays 20
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Add current directory to path for module imports
+sys.path.insert(0, os.path.dirname(__file__))
+
+BRANDS = ["Coca-Cola", "Pepsi", "Heinz", "Kellogg's", "Walkers", "Cadbury", "Nestle", "Danone",
+          "Innocent", "Tropicana", "Lucozade", "Ribena", "Robinsons", "Fanta", "Sprite", "Oasis"]
+VARIANTS = ["Original", "Zero Sugar", "Light", "Cherry", "Orange", "Lemon", "Tropical", "Classic",
+            "Apple", "Mango", "Berry", "Vanilla", "Sparkling", "Still", "Extra", "Mini"]
+SIZES = ["250ml", "330ml", "500ml", "1L", "1.5L", "2L", "4x330ml", "6x250ml"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark exact vs alignment position voting")
+    parser.add_argument("--products", nargs="+", type=int, default=[50, 200, 400], help="Products per bay")
+    parser.add_argument("--shelves", type=int, default=5)
+    parser.add_argument("--bays", type=int, default=20, help="Bays per size")
+    parser.add_argument("--shift-rate", type=float, default=0.5, help="Share of shelves the shifted model offsets")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def make_bay(rng, products, shelves):
+    """Ground truth: list of shelves, each a list of (brand, name)"""
+    per_shelf = [products // shelves + (1 if i < products % shelves else 0) for i in range(shelves)]
+    return [
+        [(rng.choice(BRANDS), f"{rng.choice(VARIANTS)} {rng.choice(SIZES)}") for _ in range(count)]
+        for count in per_shelf
+    ]
+
+
+def misspell(rng, text):
+    if len(text) < 4:
+        return text
+    i = rng.randrange(1, len(text) - 1)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def model_proposal(rng, bay, model, drop_rate=0.0, shift_rate=0.0, typo_rate=0.0):
+    positions = {}
+    for shelf_index, shelf in enumerate(bay, start=1):
+        items = []
+        if rng.random() < shift_rate:
+            items.append(("Unknown", "Shelf Edge Label"))
+        for brand, name in shelf:
+            if rng.random() < drop_rate:
+                continue
+            items.append((brand, misspell(rng, name) if rng.random() < typo_rate else name))
+        for position, (brand, name) in enumerate(items, start=1):
+            positions[f"s{shelf_index}_p{position}"] = {
+                'brand': brand,
+                'name': name,
+                'confidence': round(rng.uniform(0.85, 0.98), 2),
+                'shelf': shelf_index,
+                'position': position
+            }
+    return {'model': model, 'positions': positions}
+
+
+def score(bay, result):
+    """(recall, position accuracy) of a vote result against the ground truth"""
+    truth = {
+        (shelf, position): (brand.lower(), name.lower())
+        for shelf, items in enumerate(bay, start=1)
+        for position, (brand, name) in enumerate(items, start=1)
+    }
+    voted = {
+        (product.get('shelf'), product.get('position')): (str(product.get('brand')).lower(), str(product.get('name')).lower())
+        for product in result.get('result', {}).values()
+    }
+    found = sum(1 for product in truth.values() if product in voted.values())
+    placed = sum(1 for key, product in truth.items() if voted.get(key) == product)
+    return found / len(truth), placed / len(truth)
+
+
+def run(args):
+    from src.systems.custom_consensus import DeterministicOrchestrator
+
+    rng = random.Random(args.seed)
+    voters = {
+        'exact': DeterministicOrchestrator(position_voting="exact"),
+        'alignment': DeterministicOrchestrator(position_voting="alignment")
+    }
+
+    print(f"{'products':>8} {'method':>10} {'consensus':>10} {'recall':>8} {'placed':>8} {'ms/vote':>9}")
+    for products in args.products:
+        stats = {method: {'consensus': 0, 'recall': [], 'placed': [], 'ms': []} for method in voters}
+        for _ in range(args.bays):
+            bay = make_bay(rng, products, args.shelves)
+            proposals = [
+                model_proposal(rng, bay, 'claude', drop_rate=0.02),
+                model_proposal(rng, bay, 'gpt4o', drop_rate=0.02, shift_rate=args.shift_rate, typo_rate=0.1),
+                model_proposal(rng, bay, 'gemini', drop_rate=0.15)
+            ]
+            for method, orchestrator in voters.items():
+                started = time.perf_counter()
+                result = orchestrator.vote_on_positions(proposals)
+                stats[method]['ms'].append((time.perf_counter() - started) * 1000)
+                stats[method]['consensus'] += result['consensus_reached']
+                recall, placed = score(bay, result)
+                stats[method]['recall'].append(recall)
+                stats[method]['placed'].append(placed)
+
+        for method, values in stats.items():
+            print(
+                f"{products:>8} {method:>10} {values['consensus'] / args.bays:>10.0%} "
+                f"{statistics.mean(values['recall']):>8.1%} {statistics.mean(values['placed']):>8.1%} "
+                f"{statistics.median(values['ms']):>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    run(parse_args())
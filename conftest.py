@@ -0,0 +1,16 @@
+"""
+Pytest setup for the root-level tests
+
+`src/__init__` imports the whole agent system up front. The unit tests register
+the package without running it, so each test file only imports the modules it
+covers.
+"""
+
+import os
+import sys
+import types
+
+if "src" not in sys.modules:
+    _package = types.ModuleType("src")
+    _package.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")]
+    sys.modules["src"] = _package
@@ -0,0 +1,25 @@
+-- Shared spend ledger for budget-aware queue admission (src/utils/budget_ledger.py)
+-- One row per scope per UTC hour; daily spend is the sum of the day's hours.
+-- Scopes: 'global', 'tenant:<retailer_name>', 'store:<store_id>'
+
+CREATE TABLE IF NOT EXISTS budget_ledger (
+    scope TEXT NOT NULL,
+    window_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    spent DECIMAL(12, 4) NOT NULL DEFAULT 0,
+    calls INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (scope, window_start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_budget_ledger_window ON budget_ledger (window_start);
+
+-- Spend per scope for today and the current hour
+CREATE OR REPLACE VIEW budget_ledger_today AS
+SELECT
+    scope,
+    SUM(spent) AS daily_spent,
+    SUM(CASE WHEN window_start = date_trunc('hour', NOW()) THEN spent ELSE 0 END) AS hourly_spent,
+    SUM(calls) AS calls
+FROM budget_ledger
+WHERE window_start >= date_trunc('day', NOW() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+GROUP BY scope;
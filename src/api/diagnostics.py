@@ -10,6 +10,11 @@ import json
 from ..utils import logger
 from ..config import SystemConfig
 from ..utils.extraction_analytics import get_extraction_analytics
+from ..utils.rate_limiter import get_rate_limiter
+from ..utils.request_hedging import get_hedge_policy
+from ..utils.error_handling import get_circuit_breakers
+from ..utils.model_usage_tracker import get_model_usage_tracker
+from ..utils.pricing import get_price_table_version
 
 router = APIRouter(prefix="/api/diagnostics", tags=["diagnostics"])
 
@@ -271,4 +276,59 @@ async def get_visual_feedback_analysis(run_id: str):
         
     except Exception as e:
         logger.error(f"Failed to get visual feedback analysis: {e}")
-        return {"feedback_analysis": None}
\ No newline at end of file
+        return {"feedback_analysis": None}
+
+@router.get("/rate-limits")
+async def get_rate_limit_stats():
+    """Get per-provider rate limiter queue wait times and token throughput"""
+    try:
+        return {
+            "providers": get_rate_limiter().get_stats(),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Failed to get rate limit stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/hedging")
+async def get_hedging_stats():
+    """Get hedged request rate, hedge win rate and cost overhead for the fallback chain"""
+    try:
+        return {
+            "hedging": get_hedge_policy().get_stats(),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Failed to get hedging stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/circuit-breakers")
+async def get_circuit_breaker_states():
+    """Get the state, rolling error rate and rejected calls of every provider/model circuit"""
+    try:
+        return {
+            "circuit_breakers": get_circuit_breakers().get_states(),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Failed to get circuit breaker states: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/token-usage")
+async def get_token_usage():
+    """Get provider-reported token counts and cost per model and stage since process start"""
+    try:
+        return {
+            "usage": get_model_usage_tracker().get_usage_summary(),
+            "price_table_version": get_price_table_version(),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Failed to get token usage: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
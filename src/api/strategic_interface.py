@@ -4,10 +4,12 @@ API endpoints for strategic system selection and comparison
 """
 
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 import uuid
+import json
 import asyncio
 
 from ..systems.base_system import ExtractionSystemFactory
@@ -148,7 +150,7 @@ async def extract_with_strategic_comparison(
         
         # Run strategic comparison
         comparison_results = await ExtractionSystemFactory.run_strategic_comparison(
-            image_data, upload_id, config
+            image_data, upload_id, config, system_list
         )
         
         # Format response
@@ -170,49 +172,9 @@ async def extract_with_strategic_comparison(
         
         # Add individual system results
         for system_type in system_list:
-            if system_type in comparison_results and comparison_results[system_type].get('success', False):
-                system_data = comparison_results[system_type]
-                result = system_data['result']
-                
-                response["system_results"][system_type] = {
-                    "system_name": ExtractionSystemFactory.AVAILABLE_SYSTEMS[system_type],
-                    "success": True,
-                    "processing_time": system_data['processing_time'],
-                    
-                    # Core metrics
-                    "accuracy": result.overall_accuracy,
-                    "consensus_rate": result.performance_metrics.consensus_rate,
-                    "products_found": len(result.positions),
-                    "iteration_count": result.iteration_count,
-                    
-                    # Cost and performance
-                    "total_cost": system_data['cost'].total_cost,
-                    "cost_per_accuracy": system_data['cost'].cost_per_accuracy_point,
-                    
-                    # Architecture
-                    "architecture_benefits": system_data['architecture_benefits'],
-                    "complexity_rating": system_data['complexity_rating'],
-                    "control_level": system_data['control_level'],
-                    
-                    # Detailed results
-                    "extraction_data": {
-                        "structure": result.structure,
-                        "positions": result.positions,
-                        "quantities": result.quantities,
-                        "details": result.details
-                    },
-                    
-                    "validation_result": result.validation_result
-                }
-            else:
-                # System failed
-                error_info = comparison_results.get(system_type, {})
-                response["system_results"][system_type] = {
-                    "system_name": ExtractionSystemFactory.AVAILABLE_SYSTEMS.get(system_type, system_type),
-                    "success": False,
-                    "error": error_info.get('error', 'Unknown error'),
-                    "processing_time": 0
-                }
+            response["system_results"][system_type] = _format_system_result(
+                system_type, comparison_results.get(system_type, {})
+            )
         
         logger.info(
             f"Strategic comparison completed",
@@ -232,6 +194,36 @@ async def extract_with_strategic_comparison(
         raise HTTPException(status_code=500, detail=f"Comparison failed: {str(e)}")
 
 
+@router.post("/extract-comparison/stream")
+async def stream_strategic_comparison(
+    file: UploadFile = File(...),
+    systems: str = Form("custom,langgraph,hybrid", description="Comma-separated system types"),
+    upload_id: Optional[str] = Form(None)
+):
+    """Run strategic comparison and stream each system's result as it finishes (NDJSON)"""
+    
+    if not upload_id:
+        upload_id = str(uuid.uuid4())
+    
+    system_list = [s.strip() for s in systems.split(",")]
+    invalid_systems = [s for s in system_list if s not in ExtractionSystemFactory.AVAILABLE_SYSTEMS]
+    if invalid_systems:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid systems: {invalid_systems}. Available: {list(ExtractionSystemFactory.AVAILABLE_SYSTEMS.keys())}"
+        )
+    
+    image_data = await file.read()
+    
+    async def system_results():
+        async for system_type, system_data in ExtractionSystemFactory.stream_strategic_comparison(
+            image_data, upload_id, config, system_list
+        ):
+            line = {"upload_id": upload_id, "system_type": system_type, **_format_system_result(system_type, system_data)}
+            yield json.dumps(jsonable_encoder(line)) + "\n"
+    
+    return StreamingResponse(system_results(), media_type="application/x-ndjson")
+
 @router.get("/systems")
 async def get_available_systems():
     """Get all available extraction systems with descriptions"""
@@ -846,4 +838,47 @@ def _get_system_recommendations(system_type: str) -> List[str]:
         ]
     }
     
-    return recommendations.get(system_type, ["General purpose extraction"]) 
\ No newline at end of file
+    return recommendations.get(system_type, ["General purpose extraction"]) 
+
+
+def _format_system_result(system_type: str, system_data: Dict[str, Any]) -> Dict[str, Any]:
+    """API form of one system's strategic comparison entry"""
+    if not system_data.get('success', False):
+        return {
+            "system_name": ExtractionSystemFactory.AVAILABLE_SYSTEMS.get(system_type, system_type),
+            "success": False,
+            "error": system_data.get('error', 'Unknown error'),
+            "processing_time": 0
+        }
+    
+    result = system_data['result']
+    return {
+        "system_name": ExtractionSystemFactory.AVAILABLE_SYSTEMS[system_type],
+        "success": True,
+        "processing_time": system_data['processing_time'],
+        
+        # Core metrics
+        "accuracy": result.overall_accuracy,
+        "consensus_rate": result.performance_metrics.consensus_rate,
+        "products_found": len(result.positions),
+        "iteration_count": result.iteration_count,
+        
+        # Cost and performance
+        "total_cost": system_data['cost'].total_cost,
+        "cost_per_accuracy": system_data['cost'].cost_per_accuracy_point,
+        
+        # Architecture
+        "architecture_benefits": system_data['architecture_benefits'],
+        "complexity_rating": system_data['complexity_rating'],
+        "control_level": system_data['control_level'],
+        
+        # Detailed results
+        "extraction_data": {
+            "structure": result.structure,
+            "positions": result.positions,
+            "quantities": result.quantities,
+            "details": result.details
+        },
+        
+        "validation_result": result.validation_result
+    }
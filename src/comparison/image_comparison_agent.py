@@ -3,6 +3,7 @@ Image Comparison Agent
 Compares original shelf images to generated planograms for accuracy assessment
 """
 
+import time
 from typing import Dict, List, Optional
 from datetime import datetime
 import instructor
@@ -13,7 +14,11 @@ from ..config import SystemConfig
 from ..models.shelf_structure import ShelfStructure
 from ..planogram.models import VisualPlanogram
 from ..orchestrator.feedback_manager import ImageComparison
-from ..utils import logger
+from ..utils import (
+    logger, get_rate_limiter, estimate_request_tokens, get_image_cache,
+    make_request_key, get_provider_cassette, get_circuit_breakers, get_budget_ledger,
+    get_model_usage_tracker, usage_from_openai, price_usage, get_price_table_version, TokenUsage
+)
 
 
 class ShelfMismatch(BaseModel):
@@ -42,14 +47,24 @@ class ImageComparisonAgent:
         
         # Initialize AI client
         self.client = instructor.from_openai(
-            openai.OpenAI(api_key=config.openai_api_key)
+            openai.AsyncOpenAI(api_key=config.openai_api_key)
         )
+        self.rate_limiter = get_rate_limiter()
+        self.cassette = get_provider_cassette()
+        self.circuit_breakers = get_circuit_breakers()
+        self.reset_run_state()
         
         logger.info(
             "Image Comparison Agent initialized",
             component="comparison_agent"
         )
     
+    def reset_run_state(self, queue_item_id: Optional[int] = None, extraction_run_id: Optional[str] = None):
+        """Clear per-run state; comparison calls are logged against this run's queue item"""
+        self.queue_item_id = queue_item_id
+        self.extraction_run_id = extraction_run_id
+        self.total_cost = 0.0
+    
     async def compare_image_vs_planogram(self,
                                        original_image: bytes,
                                        planogram: VisualPlanogram,
@@ -100,12 +115,10 @@ class ImageComparisonAgent:
         is_gemini_model = model.startswith('gemini-')
         
         try:
-            # Use appropriate vision model for comparison
-            import base64
-            
-            # Encode images to base64
-            original_image_base64 = base64.b64encode(original_image).decode('utf-8')
-            planogram_image_base64 = base64.b64encode(planogram_image).decode('utf-8')
+            # Encode images once per run (shared with the extraction calls)
+            image_cache = get_image_cache()
+            original_image_url = image_cache.data_url(original_image, "image/jpeg")
+            planogram_image_url = image_cache.data_url(planogram_image, "image/png")
             
             # Use provided prompt or default
             if not comparison_prompt:
@@ -154,33 +167,62 @@ class ImageComparisonAgent:
                 logger.info("Falling back to GPT-4 for vision comparison", component="comparison_agent")
             
             # Call vision model with both images
-            response = self.client.chat.completions.create(
-                model=api_model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": comparison_prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{original_image_base64}",
-                                    "detail": "high"
-                                }
-                            },
-                            {
-                                "type": "image_url", 
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{planogram_image_base64}",
-                                    "detail": "high"
+            estimated_tokens = estimate_request_tokens(comparison_prompt, 2, 2000)
+            
+            ledger = get_budget_ledger()
+            
+            # An open circuit raises CircuitOpenError here, so the comparison falls back immediately
+            async def call():
+                started = time.time()
+                async with ledger.reserve(ledger.predict_cost(api_model, "comparison"), f"{api_model} comparison") as reservation:
+                    async with self.circuit_breakers.guard("openai", api_model), \
+                            self.rate_limiter.acquire("openai", api_model, estimated_tokens):
+                        response, completion = await self.client.chat.completions.create_with_completion(
+                            model=api_model,
+                            messages=[
+                                {
+                                    "role": "user",
+                                    "content": [
+                                        {"type": "text", "text": comparison_prompt},
+                                        {
+                                            "type": "image_url",
+                                            "image_url": {
+                                                "url": original_image_url,
+                                                "detail": "high"
+                                            }
+                                        },
+                                        {
+                                            "type": "image_url", 
+                                            "image_url": {
+                                                "url": planogram_image_url,
+                                                "detail": "high"
+                                            }
+                                        }
+                                    ]
                                 }
-                            }
-                        ]
-                    }
-                ],
-                response_model=VisualComparisonResult,
-                max_tokens=2000,
-                temperature=0.1  # Very low temperature for consistent, factual comparison
+                            ],
+                            response_model=VisualComparisonResult,
+                            max_tokens=2000,
+                            temperature=0.1  # Very low temperature for consistent, factual comparison
+                        )
+                    usage = usage_from_openai(completion)
+                    self.rate_limiter.record_usage("openai", api_model, estimated_tokens, usage.total_tokens)
+                    cost = price_usage(api_model, usage)
+                    reservation.settle(cost)
+                self.total_cost += cost
+                await self._log_model_usage(api_model, usage, cost, time.time() - started)
+                return response
+            
+            # Recorded/replayed when a provider cassette is active
+            request_key = make_request_key(
+                api_model, comparison_prompt,
+                [image_cache.digest(original_image), image_cache.digest(planogram_image)],
+                "VisualComparisonResult", 0.1
+            )
+            response = await self.cassette.call(
+                "openai", api_model, request_key, call,
+                dump=lambda result: result.model_dump(mode='json'),
+                restore=VisualComparisonResult.model_validate
             )
             
             # Parse response into our format
@@ -191,6 +233,30 @@ class ImageComparisonAgent:
             # Fallback to mock if vision fails
             return self._mock_comparison(planogram, structure_context)
     
+    async def _log_model_usage(self, model: str, usage: TokenUsage, cost: float, duration: float):
+        """Record a comparison call in the shared model usage tracker"""
+        try:
+            await get_model_usage_tracker().log_model_usage(
+                queue_item_id=self.queue_item_id,
+                extraction_run_id=self.extraction_run_id,
+                stage="comparison",
+                model_id=model,
+                model_provider="openai",
+                iteration_number=1,
+                temperature=0.1,
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.output_tokens,
+                response_time_ms=int(duration * 1000),
+                api_cost=cost,
+                success=True,
+                cached_tokens=usage.cached_input_tokens,
+                cache_write_tokens=usage.cache_write_tokens,
+                token_source=usage.source,
+                price_table_version=get_price_table_version()
+            )
+        except Exception as e:
+            logger.error(f"Failed to log model usage: {e}", component="comparison_agent")
+    
     def _parse_vision_response(self, vision_response: VisualComparisonResult, planogram, structure_context):
         """Parse vision model response into ImageComparison format"""
         
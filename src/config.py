@@ -5,6 +5,7 @@ Central configuration for the revolutionary self-debugging AI extraction system
 
 from dataclasses import dataclass, field
 from typing import Dict, Optional
+import json
 import os
 from dotenv import load_dotenv
 
@@ -47,7 +48,163 @@ class SystemConfig:
     # Processing limits
     max_processing_time_seconds: int = 300  # 5 minutes
     max_api_cost_per_extraction: float = 1.00  # £1
-    
+    # Version of the model price table in src/utils/pricing.py (empty = latest)
+    model_price_table_version: str = field(default_factory=lambda: os.getenv("MODEL_PRICE_TABLE_VERSION", ""))
+    # Provider prices are in USD; costs, cost limits and budget caps are all in GBP
+    usd_to_gbp_rate: float = field(default_factory=lambda: float(os.getenv("USD_TO_GBP_RATE", "0.79")))
+    # Model usage rows are written to Supabase in batches
+    model_usage_batch_size: int = field(default_factory=lambda: int(os.getenv("MODEL_USAGE_BATCH_SIZE", "25")))
+    model_usage_flush_seconds: float = field(default_factory=lambda: float(os.getenv("MODEL_USAGE_FLUSH_SECONDS", "5")))
+
+    # Provider rate limits (shared by every extraction system in the process)
+    rate_limiter_enabled: bool = field(
+        default_factory=lambda: os.getenv("RATE_LIMITER_ENABLED", "false").lower() == "true"
+    )
+    provider_rate_limits: Dict[str, Dict[str, int]] = field(default_factory=lambda: {
+        'openai': {
+            'requests_per_minute': int(os.getenv("OPENAI_RPM_LIMIT", "500")),
+            'tokens_per_minute': int(os.getenv("OPENAI_TPM_LIMIT", "300000")),
+            'max_concurrency': int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+        },
+        'anthropic': {
+            'requests_per_minute': int(os.getenv("ANTHROPIC_RPM_LIMIT", "50")),
+            'tokens_per_minute': int(os.getenv("ANTHROPIC_TPM_LIMIT", "80000")),
+            'max_concurrency': int(os.getenv("ANTHROPIC_MAX_CONCURRENCY", "4"))
+        },
+        'google': {
+            'requests_per_minute': int(os.getenv("GOOGLE_RPM_LIMIT", "60")),
+            'tokens_per_minute': int(os.getenv("GOOGLE_TPM_LIMIT", "1000000")),
+            'max_concurrency': int(os.getenv("GOOGLE_MAX_CONCURRENCY", "8"))
+        }
+    })
+    # Optional per-model overrides, e.g. {"gpt-4o-2024-11-20": {"requests_per_minute": 200}}
+    model_rate_limits: Dict[str, Dict[str, int]] = field(
+        default_factory=lambda: json.loads(os.getenv("MODEL_RATE_LIMITS", "{}"))
+    )
+
+    # LLM response cache: "off", "read_write" or "replay_only" (no network, misses fail)
+    response_cache_mode: str = field(default_factory=lambda: os.getenv("RESPONSE_CACHE_MODE", "off"))
+    response_cache_dir: str = field(default_factory=lambda: os.getenv("RESPONSE_CACHE_DIR", ".cache/llm_responses"))
+    response_cache_max_mb: int = field(default_factory=lambda: int(os.getenv("RESPONSE_CACHE_MAX_MB", "500")))
+
+    # Provider cassettes for offline benchmarking: "off", "record" or "replay"
+    provider_cassette_mode: str = field(default_factory=lambda: os.getenv("PROVIDER_CASSETTE_MODE", "off"))
+    provider_cassette_path: str = field(default_factory=lambda: os.getenv("PROVIDER_CASSETTE_PATH", "cassettes/pipeline.jsonl"))
+    provider_cassette_replay_latency: bool = field(
+        default_factory=lambda: os.getenv("PROVIDER_CASSETTE_REPLAY_LATENCY", "false").lower() == "true"
+    )
+
+    # Hedged requests in the extraction fallback chain: fire the next model once the
+    # current one is slower than this percentile of its recorded latencies
+    hedge_requests_enabled: bool = field(
+        default_factory=lambda: os.getenv("HEDGE_REQUESTS_ENABLED", "false").lower() == "true"
+    )
+    hedge_latency_percentile: float = field(default_factory=lambda: float(os.getenv("HEDGE_LATENCY_PERCENTILE", "90")))
+    hedge_min_samples: int = field(default_factory=lambda: int(os.getenv("HEDGE_MIN_SAMPLES", "10")))
+    hedge_default_delay_seconds: float = field(default_factory=lambda: float(os.getenv("HEDGE_DEFAULT_DELAY_SECONDS", "45")))
+
+    # Lay prompts out as image + static prefix + per-call suffix so repeated per-shelf
+    # and per-model calls hit the provider prompt cache
+    prompt_caching_enabled: bool = field(
+        default_factory=lambda: os.getenv("PROMPT_CACHING_ENABLED", "false").lower() == "true"
+    )
+
+    # Independent steps of an extraction sequence run concurrently, up to this many at once
+    extraction_step_parallelism: int = field(default_factory=lambda: int(os.getenv("EXTRACTION_STEP_PARALLELISM", "1")))
+
+    # Shelves of a shelf-by-shelf products extraction run concurrently, up to this many at once
+    shelf_extraction_parallelism: int = field(default_factory=lambda: int(os.getenv("SHELF_EXTRACTION_PARALLELISM", "1")))
+
+    # Send each shelf-by-shelf products call only its shelf's crop (cut from the structure
+    # stage's shelf bands, grown by this share of the band height above and below)
+    shelf_cropping_enabled: bool = field(
+        default_factory=lambda: os.getenv("SHELF_CROPPING_ENABLED", "false").lower() == "true"
+    )
+    shelf_crop_margin: float = field(default_factory=lambda: float(os.getenv("SHELF_CROP_MARGIN", "0.25")))
+
+    # How CustomConsensusVisualSystem runs a stage's models: "sequential" (visual
+    # feedback after each model) or "parallel" (all models at once, then one reconcile pass)
+    consensus_stage_mode: str = field(default_factory=lambda: os.getenv("CONSENSUS_STAGE_MODE", "sequential"))
+
+    # Early-exit consensus voting: cancel the outstanding model calls once a vote is decided
+    consensus_early_exit: bool = field(
+        default_factory=lambda: os.getenv("CONSENSUS_EARLY_EXIT", "false").lower() == "true"
+    )
+    consensus_early_exit_min_agreeing: int = field(default_factory=lambda: int(os.getenv("CONSENSUS_EARLY_EXIT_MIN_AGREEING", "2")))
+    consensus_early_exit_min_confidence: float = field(default_factory=lambda: float(os.getenv("CONSENSUS_EARLY_EXIT_MIN_CONFIDENCE", "0.8")))
+
+    # Position voting: "exact" (identical position keys) or "alignment" (products matched
+    # across models by name similarity and relative position)
+    position_voting: str = field(default_factory=lambda: os.getenv("POSITION_VOTING", "exact"))
+
+    # Iterations 2..N of CustomConsensusVisualSystem keep the structure and locked
+    # positions and re-query only the shelves that still have uncertain positions
+    focused_reextraction: bool = field(
+        default_factory=lambda: os.getenv("FOCUSED_REEXTRACTION", "false").lower() == "true"
+    )
+
+    # Stage memo across iterations: a stage whose consensus confidence reaches the
+    # threshold is frozen, and later iterations of the run reuse it instead of re-voting
+    stage_memo_enabled: bool = field(
+        default_factory=lambda: os.getenv("STAGE_MEMO_ENABLED", "false").lower() == "true"
+    )
+    stage_memo_confidence: float = field(default_factory=lambda: float(os.getenv("STAGE_MEMO_CONFIDENCE", "0.9")))
+
+    # Keep built extraction systems (SDK clients, orchestrators, agents) warm between
+    # queue items instead of constructing a fresh instance per item
+    system_pool_enabled: bool = field(
+        default_factory=lambda: os.getenv("SYSTEM_POOL_ENABLED", "false").lower() == "true"
+    )
+    system_pool_max_idle: int = field(default_factory=lambda: int(os.getenv("SYSTEM_POOL_MAX_IDLE", "4")))
+
+    # Budget ledger: hourly/daily spend caps per scope kind ("global", "tenant", "store") or
+    # exact scope ("store:<store_id>", "tenant:<retailer>"), e.g.
+    # {"global": {"daily": 200, "hourly": 30}, "store": {"daily": 5}} (GBP). Stage calls wait
+    # while a cap is reached; the queue stops admitting items at `headroom` of a cap.
+    # With a database URL the spend is shared through the budget_ledger table.
+    budget_ledger_enabled: bool = field(
+        default_factory=lambda: os.getenv("BUDGET_LEDGER_ENABLED", "false").lower() == "true"
+    )
+    budget_caps: Dict[str, Dict[str, float]] = field(
+        default_factory=lambda: json.loads(os.getenv("BUDGET_CAPS", "{}"))
+    )
+    budget_admission_headroom: float = field(default_factory=lambda: float(os.getenv("BUDGET_ADMISSION_HEADROOM", "0.9")))
+    budget_defer_max_seconds: float = field(default_factory=lambda: float(os.getenv("BUDGET_DEFER_MAX_SECONDS", "900")))
+    budget_ledger_database_url: str = field(default_factory=lambda: os.getenv("BUDGET_LEDGER_DATABASE_URL", ""))
+
+    # Durable LangGraph checkpoints: "" (in memory), a SQLite path / sqlite:///path, or a
+    # postgresql:// URL. Interrupted workflow runs resume from their last completed node.
+    langgraph_checkpoint_url: str = field(default_factory=lambda: os.getenv("LANGGRAPH_CHECKPOINT_URL", ""))
+    # Processing items whose worker has not heartbeated for this long (e.g. it crashed) go
+    # back to pending when a processor starts; running processors heartbeat every third of it (0 = never)
+    queue_requeue_stale_seconds: int = field(default_factory=lambda: int(os.getenv("QUEUE_REQUEUE_STALE_SECONDS", "0")))
+
+    # Provider batch mode for non-urgent queue items: "off", "flagged" (items with
+    # processing_priority = 'batch') or "all". Base URLs can point at a local stub.
+    queue_batch_mode: str = field(default_factory=lambda: os.getenv("QUEUE_BATCH_MODE", "off"))
+    queue_batch_max_items: int = field(default_factory=lambda: int(os.getenv("QUEUE_BATCH_MAX_ITEMS", "50")))
+    batch_max_requests: int = field(default_factory=lambda: int(os.getenv("BATCH_MAX_REQUESTS", "500")))
+    batch_collect_seconds: float = field(default_factory=lambda: float(os.getenv("BATCH_COLLECT_SECONDS", "60")))
+    batch_poll_seconds: float = field(default_factory=lambda: float(os.getenv("BATCH_POLL_SECONDS", "60")))
+    openai_batch_base_url: str = field(default_factory=lambda: os.getenv("OPENAI_BATCH_BASE_URL", ""))
+    anthropic_batch_base_url: str = field(default_factory=lambda: os.getenv("ANTHROPIC_BATCH_BASE_URL", ""))
+
+    # Per-provider/model circuit breakers: skip a model while its recent calls are
+    # mostly failing or too slow, then let a probe call through after the cooldown
+    circuit_breaker_enabled: bool = field(
+        default_factory=lambda: os.getenv("CIRCUIT_BREAKER_ENABLED", "false").lower() == "true"
+    )
+    circuit_breaker_error_rate: float = field(default_factory=lambda: float(os.getenv("CIRCUIT_BREAKER_ERROR_RATE", "0.5")))
+    circuit_breaker_slow_call_seconds: float = field(default_factory=lambda: float(os.getenv("CIRCUIT_BREAKER_SLOW_CALL_SECONDS", "90")))
+    circuit_breaker_min_calls: int = field(default_factory=lambda: int(os.getenv("CIRCUIT_BREAKER_MIN_CALLS", "5")))
+    circuit_breaker_window_seconds: float = field(default_factory=lambda: float(os.getenv("CIRCUIT_BREAKER_WINDOW_SECONDS", "60")))
+    circuit_breaker_cooldown_seconds: float = field(default_factory=lambda: float(os.getenv("CIRCUIT_BREAKER_COOLDOWN_SECONDS", "30")))
+
+    # Stream products out of the products stage as the model emits them
+    stream_products: bool = field(
+        default_factory=lambda: os.getenv("STREAM_PRODUCTS", "false").lower() == "true"
+    )
+
     # WebSocket configuration
     websocket_host: str = "0.0.0.0"
     websocket_port: int = 8000
@@ -5,10 +5,10 @@ Enhanced with logging, cost tracking, error handling, and multi-image support
 """
 
 import asyncio
+import contextlib
 import json
-import base64
 import time
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Awaitable, Callable
 from datetime import datetime
 
 import instructor
@@ -20,7 +20,13 @@ from pydantic import BaseModel
 from ..config import SystemConfig
 from ..utils import (
     logger, CostTracker, CostLimitExceededException, ErrorHandler,
-    with_retry, RetryConfig, GracefulDegradation, MultiImageCoordinator
+    with_retry, RetryConfig, GracefulDegradation, MultiImageCoordinator,
+    get_rate_limiter, estimate_request_tokens, get_image_cache, get_image_variant_store,
+    safe_image_byte_limit, get_response_cache, make_request_key, get_provider_cassette,
+    get_hedge_policy, get_circuit_breakers, CircuitOpenError, get_gemini_model_pool,
+    TokenUsage, usage_from_openai, usage_from_anthropic, usage_from_gemini,
+    estimate_usage, price_usage, get_price_table_version, get_active_batch, record_batch_cost,
+    flatten_prompt, message_content, get_budget_ledger
 )
 from .models import (
     ExtractionStep, AIModelType, ShelfStructure, ProductExtraction,
@@ -32,12 +38,33 @@ from .prompts import PromptTemplates
 class ModularExtractionEngine:
     """Extraction system with sequential, modular steps that build on each other"""
     
+    # Output schemas whose responses can be rebuilt from a cached JSON payload
+    _CACHEABLE_SCHEMAS = {
+        "ShelfStructure": ShelfStructure,
+        "List[ProductExtraction]": ProductExtraction,
+        "CompleteShelfExtraction": CompleteShelfExtraction,
+    }
+    
+    # Provider of each fallback-chain model (the enum value is the API model name)
+    _CHAIN_PROVIDERS = {
+        AIModelType.CLAUDE_3_SONNET: "anthropic",
+        AIModelType.GPT4O_LATEST: "openai",
+        AIModelType.GEMINI_2_FLASH: "google",
+    }
+    
     def __init__(self, config: SystemConfig, temperature: float = 0.1):
         self.config = config
         self.temperature = temperature
         self._initialize_ai_clients()
+        self.rate_limiter = get_rate_limiter()
+        self.response_cache = get_response_cache()
+        self.cassette = get_provider_cassette()
+        self.hedging = get_hedge_policy()
+        self.circuit_breakers = get_circuit_breakers()
+        self.budget_ledger = get_budget_ledger()
         self.prompt_templates = PromptTemplates()
         self.step_history = []
+        self.last_sequence_timing: Dict[str, Any] = {}
         
         # Enhanced capabilities
         self.cost_tracker: Optional[CostTracker] = None
@@ -52,23 +79,22 @@ class ModularExtractionEngine:
         )
     
     def _initialize_ai_clients(self):
-        """Initialize AI model clients with Instructor for structured outputs"""
+        """Initialize async AI model clients with Instructor for structured outputs
+        
+        The async SDK clients keep provider calls off the event loop so that
+        several extractions (and the API/WebSocket handlers) can overlap.
+        """
         try:
-            self.openai_client = instructor.from_openai(
-                openai.OpenAI(api_key=self.config.openai_api_key)
+            self._openai_client = instructor.from_openai(
+                openai.AsyncOpenAI(api_key=self.config.openai_api_key)
             )
-            self.anthropic_client = instructor.from_anthropic(
-                anthropic.Anthropic(api_key=self.config.anthropic_api_key)
+            self._anthropic_client = instructor.from_anthropic(
+                anthropic.AsyncAnthropic(api_key=self.config.anthropic_api_key)
             )
             genai.configure(api_key=self.config.google_api_key)
-            # Configure generation with temperature
-            generation_config = genai.types.GenerationConfig(
-                temperature=self.temperature,
-                top_p=1,
-                top_k=1,
-                max_output_tokens=8000,
-            )
-            self.gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp', generation_config=generation_config)
+            # Gemini handles are shared per model and generation config
+            self.gemini_pool = get_gemini_model_pool()
+            self.gemini_model = self._get_gemini_model('gemini-2.0-flash-exp')
             
             logger.info(
                 "AI clients initialized successfully",
@@ -82,6 +108,64 @@ class ModularExtractionEngine:
             )
             raise
     
+    @property
+    def openai_client(self):
+        """Interactive OpenAI client, or the batch-backed one inside a batch_mode_scope"""
+        active = get_active_batch()
+        return active[0].instructor_client("openai") if active else self._openai_client
+    
+    @property
+    def anthropic_client(self):
+        """Interactive Anthropic client, or the batch-backed one inside a batch_mode_scope"""
+        active = get_active_batch()
+        return active[0].instructor_client("anthropic") if active else self._anthropic_client
+    
+    def _batched(self, provider: str) -> bool:
+        """Whether calls to `provider` currently go through a provider batch"""
+        return get_active_batch() is not None and provider in ("openai", "anthropic")
+    
+    @contextlib.asynccontextmanager
+    async def _provider_call(self, provider: str, model: str, estimated_tokens: int):
+        """Circuit breaker and rate limiter around one provider call
+        
+        Batched calls skip both: they queue on the batch rather than on interactive
+        quota, and their hours-long latency says nothing about provider health.
+        """
+        if self._batched(provider):
+            yield
+            return
+        async with self.circuit_breakers.guard(provider, model), \
+                self.rate_limiter.acquire(provider, model, estimated_tokens):
+            yield
+    
+    def _record_usage(self, provider: str, model: str, estimated_tokens: int, usage: TokenUsage):
+        """Refund the rate limiter the difference between the estimate and actual usage"""
+        if not self._batched(provider):
+            self.rate_limiter.record_usage(provider, model, estimated_tokens, usage.total_tokens)
+    
+    def _price_call(self, provider: str, model: str, usage: TokenUsage) -> float:
+        """Cost of one call, at the batch discount when it went through a provider batch"""
+        cost = price_usage(model, usage)
+        if self._batched(provider):
+            batch_cost = price_usage(model, usage, batch=True)
+            record_batch_cost(batch_cost, cost)
+            return batch_cost
+        return cost
+    
+    def reset_run_state(self, queue_item_id: Optional[int] = None, extraction_run_id: Optional[str] = None):
+        """Clear per-run state so a reused engine starts its next run clean
+        
+        Cost limits, error history and image coordination are rebuilt by
+        initialize_for_agent; SDK clients and shared limiters are kept.
+        """
+        self.step_history = []
+        self.last_sequence_timing = {}
+        self.cost_tracker = None
+        self.error_handler = None
+        self.image_coordinator = None
+        self.queue_item_id = queue_item_id
+        self.extraction_run_id = extraction_run_id
+    
     def initialize_for_agent(self, agent_id: str, cost_limit: float):
         """Initialize engine for a specific agent run"""
         self.cost_tracker = CostTracker(cost_limit, agent_id)
@@ -242,7 +326,11 @@ class ModularExtractionEngine:
                                         images: Dict[str, bytes],
                                         extraction_steps: List[ExtractionStep],
                                         agent_id: str = None) -> CompleteShelfExtraction:
-        """Execute the designed extraction sequence step by step"""
+        """Execute the designed extraction sequence
+        
+        Steps run as soon as their `input_dependencies` have finished, up to
+        `extraction_step_parallelism` at a time; ties go to the earlier step in the list.
+        """
         
         if agent_id and not self.cost_tracker:
             self.initialize_for_agent(agent_id, self.config.max_api_cost_per_extraction)
@@ -251,16 +339,21 @@ class ModularExtractionEngine:
         step_outputs = {}
         api_costs = []
         models_used = set()
+        step_durations: Dict[str, float] = {}
+        in_flight = 0
+        parallelism = max(1, self.config.extraction_step_parallelism)
         
         logger.info(
             f"Starting extraction sequence with {len(extraction_steps)} steps",
             component="extraction_engine",
             agent_id=agent_id,
             upload_id=upload_id,
-            step_count=len(extraction_steps)
+            step_count=len(extraction_steps),
+            parallelism=parallelism
         )
         
-        for step in extraction_steps:
+        async def run_step(step: ExtractionStep) -> None:
+            nonlocal in_flight
             logger.info(
                 f"Executing step: {step.step_id}",
                 component="extraction_engine",
@@ -269,9 +362,12 @@ class ModularExtractionEngine:
                 model=step.model.value
             )
             
+            step_started = time.time()
             try:
-                # Check cost limits before proceeding
-                if self.cost_tracker and not self.cost_tracker.check_remaining_budget(step.step_id, 0.10):
+                # Check cost limits before proceeding (steps already running are budgeted too),
+                # using the step model's average cost from usage history
+                predicted_cost = self.budget_ledger.predict_cost(step.model.value, self._stage_for_schema(step.output_schema))
+                if self.cost_tracker and not self.cost_tracker.check_remaining_budget(step.step_id, predicted_cost * (in_flight + 1)):
                     raise CostLimitExceededException(
                         self.cost_tracker.total_cost, 
                         self.cost_tracker.cost_limit, 
@@ -281,8 +377,14 @@ class ModularExtractionEngine:
                 # Prepare inputs for this step
                 step_inputs = self._prepare_step_inputs(step, step_outputs, images)
                 
-                # Execute the step
-                step_output, cost = await self._execute_step(step, step_inputs, agent_id)
+                # Execute the step (deferred while a spend cap is reached)
+                in_flight += 1
+                try:
+                    async with self.budget_ledger.reserve(predicted_cost, step.step_id) as reservation:
+                        step_output, cost = await self._execute_step(step, step_inputs, agent_id)
+                        reservation.settle(cost)
+                finally:
+                    in_flight -= 1
                 
                 # Track cost
                 if self.cost_tracker:
@@ -292,6 +394,7 @@ class ModularExtractionEngine:
                 step_outputs[step.step_id] = step_output
                 api_costs.append(cost)
                 models_used.add(step.model)
+                step_durations[step.step_id] = time.time() - step_started
                 
                 # Store in history for debugging
                 # Convert output to serializable format
@@ -306,6 +409,7 @@ class ModularExtractionEngine:
                     'model': step.model.value,
                     'output': serializable_output,
                     'cost': cost,
+                    'duration': step_durations[step.step_id],
                     'timestamp': datetime.utcnow().isoformat()
                 })
                 
@@ -315,6 +419,7 @@ class ModularExtractionEngine:
                     agent_id=agent_id,
                     step_id=step.step_id,
                     duration=time.time() - start_time,
+                    step_duration=step_durations[step.step_id],
                     cost=cost
                 )
                 
@@ -346,6 +451,9 @@ class ModularExtractionEngine:
                 )
                 raise
         
+        dependencies = self._step_dependencies(extraction_steps)
+        await self._run_step_graph(extraction_steps, dependencies, run_step, parallelism)
+        
         # The final step should produce CompleteShelfExtraction
         final_step_id = extraction_steps[-1].step_id
         final_output = step_outputs[final_step_id]
@@ -358,6 +466,14 @@ class ModularExtractionEngine:
         
         total_duration = time.time() - start_time
         total_cost = sum(api_costs)
+        critical_path, critical_path_duration = self._critical_path(extraction_steps, dependencies, step_durations)
+        self.last_sequence_timing = {
+            'total_duration': total_duration,
+            'critical_path_duration': critical_path_duration,
+            'critical_path': critical_path,
+            'step_durations': step_durations,
+            'parallelism': parallelism
+        }
         
         logger.info(
             f"Extraction sequence completed successfully",
@@ -365,12 +481,97 @@ class ModularExtractionEngine:
             agent_id=agent_id,
             upload_id=upload_id,
             total_duration=total_duration,
+            critical_path_duration=critical_path_duration,
+            critical_path=critical_path,
             total_cost=total_cost,
             products_found=final_output.total_products_detected
         )
         
         return final_output
     
+    def _step_dependencies(self, steps: List[ExtractionStep]) -> Dict[str, List[str]]:
+        """Dependencies of each step on other steps of the sequence
+        
+        Dependencies on steps that aren't in the sequence are ignored, as before.
+        Raises ValueError for duplicate step ids or dependency cycles.
+        """
+        step_ids = [step.step_id for step in steps]
+        if len(set(step_ids)) != len(step_ids):
+            raise ValueError(f"Duplicate step ids in extraction sequence: {step_ids}")
+        
+        dependencies = {
+            step.step_id: [dep for dep in step.input_dependencies if dep in step_ids and dep != step.step_id]
+            for step in steps
+        }
+        
+        # Kahn's algorithm, only to reject cycles before anything runs
+        remaining = {step_id: set(deps) for step_id, deps in dependencies.items()}
+        while remaining:
+            ready = [step_id for step_id, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Dependency cycle between extraction steps: {sorted(remaining)}")
+            for step_id in ready:
+                del remaining[step_id]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        
+        return dependencies
+    
+    async def _run_step_graph(self, steps: List[ExtractionStep], dependencies: Dict[str, List[str]],
+                              run_step: Callable[[ExtractionStep], Awaitable[None]], parallelism: int) -> None:
+        """Run steps in dependency order, at most `parallelism` at once
+        
+        The first failing step cancels the steps still running and its error is raised.
+        """
+        done: set = set()
+        running: Dict[asyncio.Task, str] = {}
+        pending = list(steps)
+        
+        try:
+            while pending or running:
+                # Start ready steps in sequence order
+                for step in list(pending):
+                    if len(running) >= parallelism:
+                        break
+                    if all(dep in done for dep in dependencies[step.step_id]):
+                        pending.remove(step)
+                        running[asyncio.ensure_future(run_step(step))] = step.step_id
+                
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    step_id = running.pop(task)
+                    task.result()  # re-raises the step's error
+                    done.add(step_id)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+    
+    def _critical_path(self, steps: List[ExtractionStep], dependencies: Dict[str, List[str]],
+                       step_durations: Dict[str, float]) -> tuple[List[str], float]:
+        """Longest chain of dependent steps by duration (the lower bound on sequence time)"""
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        
+        def longest(step_id: str) -> float:
+            if step_id not in finish:
+                slowest = max(dependencies[step_id], key=longest, default=None)
+                previous[step_id] = slowest
+                finish[step_id] = step_durations.get(step_id, 0.0) + (finish[slowest] if slowest else 0.0)
+            return finish[step_id]
+        
+        if not steps:
+            return [], 0.0
+        
+        end = max((step.step_id for step in steps), key=longest)
+        path = []
+        step_id = end
+        while step_id:
+            path.append(step_id)
+            step_id = previous[step_id]
+        return list(reversed(path)), finish[end]
+    
     def _prepare_step_inputs(self, 
                            step: ExtractionStep, 
                            previous_outputs: Dict, 
@@ -455,8 +656,14 @@ class ModularExtractionEngine:
         
         return model_mapping.get(model_id, ("openai", "gpt-4o-2024-11-20"))
     
-    async def execute_with_model_id(self, model_id: str, prompt: str, images: Dict[str, bytes], output_schema: str, agent_id: str = None) -> tuple[Any, float]:
-        """Execute with specific frontend model ID"""
+    async def execute_with_model_id(self, model_id: str, prompt: str, images: Dict[str, bytes], output_schema: str, agent_id: str = None,
+                                    on_product: Optional[Callable[[ProductExtraction], Awaitable[None]]] = None) -> tuple[Any, float]:
+        """Execute with specific frontend model ID
+        
+        For "List[ProductExtraction]" requests `on_product` is awaited once per product:
+        as each product is streamed from the model when product streaming is enabled,
+        otherwise when the full (or cached / replayed) response is available.
+        """
         provider, api_model = self._get_api_model_name(model_id)
         
         logger.info(
@@ -467,18 +674,200 @@ class ModularExtractionEngine:
             provider=provider
         )
         
-        if provider == "openai":
-            return await self._execute_with_gpt4o_model(prompt, images, output_schema, api_model, agent_id)
-        elif provider == "anthropic":
-            return await self._execute_with_claude_model(prompt, images, output_schema, api_model, agent_id)
-        elif provider == "google":
-            return await self._execute_with_gemini_model(prompt, images, output_schema, api_model, agent_id)
+        # Deterministic response cache (temperature, prompt and images are all in the key)
+        stage = self._stage_for_schema(output_schema)
+        cache_key = self._request_key(api_model, prompt, images, output_schema)
+        cached = await self.response_cache.get(cache_key, stage=stage, model=api_model)
+        if cached is not None:
+            result = self._deserialize_cached_result(cached, output_schema)
+            await self._log_model_usage(
+                model_id=api_model,
+                model_provider=provider,
+                usage=TokenUsage(),
+                duration=0.0,
+                cost=0.0,
+                stage=stage,
+                agent_id=agent_id,
+                cache_hit=True
+            )
+            await self._publish_products(result, output_schema, on_product)
+            return result, 0.0
+        
+        stream = (
+            on_product is not None
+            and output_schema == "List[ProductExtraction]"
+            and self.config.stream_products
+            and provider in ("openai", "anthropic")
+            and not self._batched(provider)
+        )
+        streamed = False
+        
+        async def dispatch() -> tuple[Any, float]:
+            nonlocal streamed
+            if stream:
+                streamed = True
+                return await self._stream_products(provider, api_model, prompt, images, on_product, agent_id)
+            if provider == "openai":
+                return await self._execute_with_gpt4o_model(prompt, images, output_schema, api_model, agent_id)
+            elif provider == "anthropic":
+                return await self._execute_with_claude_model(prompt, images, output_schema, api_model, agent_id)
+            elif provider == "google":
+                return await self._execute_with_gemini_model(prompt, images, output_schema, api_model, agent_id)
+            else:
+                # Fallback to GPT-4o
+                return await self._execute_with_gpt4o(prompt, images, output_schema, agent_id)
+        
+        # Admitted by the budget ledger on the model's predicted cost; deferred while a spend cap is reached
+        async with self.budget_ledger.reserve(self.budget_ledger.predict_cost(api_model, stage), f"{stage}:{api_model}") as reservation:
+            result, cost = await self._through_cassette(provider, api_model, cache_key, output_schema, dispatch)
+            reservation.settle(cost)
+        if not streamed:
+            await self._publish_products(result, output_schema, on_product)
+        
+        payload = self._serialize_result_for_cache(result, output_schema)
+        if payload is not None:
+            await self.response_cache.put(cache_key, payload, stage=stage)
+        
+        return result, cost
+    
+    async def _publish_products(self, result: Any, output_schema: str,
+                                on_product: Optional[Callable[[ProductExtraction], Awaitable[None]]]) -> None:
+        """Hand a complete products response to `on_product` (for responses that weren't streamed)"""
+        if on_product is None or output_schema != "List[ProductExtraction]" or not isinstance(result, list):
+            return
+        for product in result:
+            await on_product(product)
+    
+    @with_retry(RetryConfig(max_retries=2, base_delay=1.0))
+    async def _stream_products(self, provider: str, api_model: str, prompt: str, images: Dict[str, bytes],
+                               on_product: Callable[[ProductExtraction], Awaitable[None]],
+                               agent_id: str = None) -> tuple[List[ProductExtraction], float]:
+        """Extract a product list as a stream, awaiting `on_product` as each product is completed
+        
+        A retried stream re-emits its products; consumers replace products by position.
+        """
+        start_time = time.time()
+        time_to_first_product = None
+        products: List[ProductExtraction] = []
+        
+        if provider == "anthropic":
+            content = await self._build_claude_content(prompt, images, api_model)
+            create_iterable = self.anthropic_client.messages.create_iterable
         else:
-            # Fallback to GPT-4o
-            return await self._execute_with_gpt4o(prompt, images, output_schema, agent_id)
+            content = self._build_openai_content(prompt, images, api_model)
+            create_iterable = self.openai_client.chat.completions.create_iterable
+        
+        estimated_tokens = estimate_request_tokens(prompt, self._image_count(images), 6000)
+        async with self._provider_call(provider, api_model, estimated_tokens):
+            product_stream = create_iterable(
+                model=api_model,
+                max_tokens=6000,
+                temperature=self.temperature,
+                messages=[{"role": "user", "content": content}],
+                response_model=ProductExtraction
+            )
+            async for product in product_stream:
+                if time_to_first_product is None:
+                    time_to_first_product = time.time() - start_time
+                products.append(product)
+                await on_product(product)
+        
+        # Streamed responses carry no usage metadata, so this call is priced from an estimate
+        duration = time.time() - start_time
+        output_chars = sum(len(product.model_dump_json()) for product in products)
+        usage = estimate_usage(len(prompt), self._image_count(images), output_chars)
+        self._record_usage(provider, api_model, estimated_tokens, usage)
+        estimated_cost = self._price_call(provider, api_model, usage)
+        
+        await self._log_model_usage(
+            model_id=api_model,
+            model_provider=provider,
+            usage=usage,
+            duration=duration,
+            cost=estimated_cost,
+            stage="products",
+            agent_id=agent_id
+        )
+        
+        logger.debug(
+            f"Streamed {len(products)} products from {api_model} in {duration:.2f}s "
+            f"(first product after {time_to_first_product or duration:.2f}s)",
+            component="extraction_engine",
+            agent_id=agent_id,
+            duration=duration,
+            time_to_first_product=time_to_first_product,
+            cost=estimated_cost
+        )
+        
+        return products, estimated_cost
+    
+    def _request_key(self, model: str, prompt: str, images: Dict[str, bytes], output_schema: str) -> str:
+        """Key identifying one request for the response cache and provider cassettes"""
+        image_cache = get_image_cache()
+        return make_request_key(
+            model, prompt, [image_cache.digest(images[name]) for name in sorted(images)],
+            output_schema, self.temperature
+        )
+    
+    async def _through_cassette(self, provider: str, model: str, key: str, output_schema: str,
+                                call: Callable[[], Awaitable[tuple[Any, float]]]) -> tuple[Any, float]:
+        """Record or replay a (result, cost) provider call when a provider cassette is active"""
+        def dump(outcome: tuple[Any, float]) -> Optional[Dict[str, Any]]:
+            payload = self._serialize_result_for_cache(outcome[0], output_schema)
+            return None if payload is None else {'result': payload, 'cost': outcome[1]}
+        
+        def restore(payload: Dict[str, Any]) -> tuple[Any, float]:
+            return self._deserialize_cached_result(payload['result'], output_schema), payload['cost']
+        
+        return await self.cassette.call(provider, model, key, call, dump, restore)
+    
+    def _stage_for_schema(self, output_schema: str) -> str:
+        """Best-effort pipeline stage for an output schema (used for cache accounting)"""
+        if output_schema == "ShelfStructure":
+            return "structure"
+        elif output_schema in ("List[ProductExtraction]", "CompleteShelfExtraction"):
+            return "products"
+        elif output_schema == "Dict[str, float]":
+            return "details"
+        return "other"
+    
+    def _max_tokens_for_schema(self, output_schema: str) -> int:
+        """Output token limit requested for an output schema"""
+        if output_schema == "List[ProductExtraction]":
+            return 6000
+        elif output_schema == "CompleteShelfExtraction":
+            return 8000
+        return 4000
+    
+    def _serialize_result_for_cache(self, result: Any, output_schema: str) -> Optional[Dict[str, Any]]:
+        """JSON payload for the response cache, or None if the result can't be rebuilt from JSON"""
+        if output_schema in self._CACHEABLE_SCHEMAS:
+            if isinstance(result, list):
+                return {'schema': output_schema, 'data': [item.model_dump(mode='json') for item in result]}
+            return {'schema': output_schema, 'data': result.model_dump(mode='json')}
+        if isinstance(result, (str, dict)):
+            return {'schema': output_schema, 'data': result}
+        return None
+    
+    def _deserialize_cached_result(self, payload: Dict[str, Any], output_schema: str) -> Any:
+        """Rebuild a cached result into the object the provider call would have returned"""
+        model_class = self._CACHEABLE_SCHEMAS.get(output_schema)
+        if model_class is None:
+            return payload['data']
+        if isinstance(payload['data'], list):
+            return [model_class.model_validate(item) for item in payload['data']]
+        return model_class.model_validate(payload['data'])
     
     async def _execute_with_fallback(self, primary_model: AIModelType, prompt: str, images: Dict[str, bytes], output_schema: str, agent_id: str = None) -> tuple[Any, float]:
         """Execute step with automatic model fallback for maximum reliability"""
+        key = self._request_key(primary_model.value, prompt, images, output_schema)
+        return await self._through_cassette(
+            "fallback", primary_model.value, key, output_schema,
+            lambda: self._execute_fallback_chain(primary_model, prompt, images, output_schema, agent_id)
+        )
+    
+    async def _execute_fallback_chain(self, primary_model: AIModelType, prompt: str, images: Dict[str, bytes], output_schema: str, agent_id: str = None) -> tuple[Any, float]:
+        """Walk the model fallback chain until one model succeeds"""
         
         # Define fallback order: try primary model first, then fallbacks
         fallback_chain = [primary_model]
@@ -489,20 +878,35 @@ class ModularExtractionEngine:
             if model != primary_model:
                 fallback_chain.append(model)
         
+        # Skip models whose circuit is open instead of spending their retries on an outage
+        skipped = [m for m in fallback_chain if self.circuit_breakers.is_open(self._CHAIN_PROVIDERS[m], m.value)]
+        if skipped:
+            fallback_chain = [m for m in fallback_chain if m not in skipped]
+            logger.warning(
+                f"Skipping models with open circuits: {', '.join(m.value for m in skipped)}",
+                component="extraction_engine",
+                agent_id=agent_id,
+                skipped_models=[m.value for m in skipped]
+            )
+            if not fallback_chain:
+                breaker = self.circuit_breakers.get(self._CHAIN_PROVIDERS[primary_model], primary_model.value)
+                raise CircuitOpenError(breaker.provider, breaker.model, breaker.retry_after())
+        
+        # Hedging races interactive latencies; batched calls have none worth racing
+        batched = get_active_batch() is not None
+        if self.hedging.enabled and not batched:
+            return await self._execute_hedged_chain(fallback_chain, prompt, images, output_schema, agent_id)
+        
         last_error = None
         
         for i, model in enumerate(fallback_chain):
             is_fallback = i > 0
             
             try:
-                if model == AIModelType.CLAUDE_3_SONNET:
-                    result = await self._execute_with_claude(prompt, images, output_schema, agent_id)
-                elif model == AIModelType.GPT4O_LATEST:
-                    result = await self._execute_with_gpt4o(prompt, images, output_schema, agent_id)
-                elif model == AIModelType.GEMINI_2_FLASH:
-                    result = await self._execute_with_gemini(prompt, images, output_schema, agent_id)
-                else:
-                    continue
+                started = time.perf_counter()
+                result = await self._execute_chain_model(model, prompt, images, output_schema, agent_id)
+                if not batched:
+                    self.hedging.record_latency(model.value, time.perf_counter() - started, result[1])
                 
                 # Success! Log if we used a fallback
                 if is_fallback:
@@ -519,33 +923,7 @@ class ModularExtractionEngine:
                 
             except Exception as e:
                 last_error = e
-                error_msg = str(e)
-                
-                # Check if it's a content moderation or similar policy issue
-                is_content_issue = any(phrase in error_msg.lower() for phrase in [
-                    "could not process image",
-                    "content policy",
-                    "safety",
-                    "inappropriate",
-                    "invalid_request_error"
-                ])
-                
-                if is_fallback:
-                    logger.warning(
-                        f"Fallback model {model.value} also failed: {error_msg[:100]}",
-                        component="extraction_engine",
-                        agent_id=agent_id,
-                        model=model.value,
-                        error_type="content_moderation" if is_content_issue else "api_error"
-                    )
-                else:
-                    logger.warning(
-                        f"Primary model {model.value} failed, trying fallbacks: {error_msg[:100]}",
-                        component="extraction_engine",
-                        agent_id=agent_id,
-                        model=model.value,
-                        error_type="content_moderation" if is_content_issue else "api_error"
-                    )
+                self._log_chain_failure(model, e, is_fallback, agent_id)
                 
                 # Continue to next model in chain
                 continue
@@ -559,82 +937,212 @@ class ModularExtractionEngine:
         )
         raise Exception(f"All AI models failed. Last error: {last_error}")
     
-    async def _log_model_usage(self, model_id: str, model_provider: str, prompt_length: int, completion_length: int, duration: float, cost: float, stage: str, agent_id: str = None):
-        """Log model usage to analytics"""
+    async def _execute_hedged_chain(self, fallback_chain: List[AIModelType], prompt: str, images: Dict[str, bytes], output_schema: str, agent_id: str = None) -> tuple[Any, float]:
+        """Walk the fallback chain, firing the next model early when the newest call runs slow
+        
+        A call slower than its model's hedge trigger (a percentile of recorded latency)
+        gets the next model in the chain started alongside it. The first valid
+        structured result wins and every other in-flight call is cancelled.
+        """
+        in_flight: Dict[asyncio.Task, tuple[int, AIModelType, float]] = {}
+        next_index = 0
+        hedges_fired = 0
+        last_error = None
+        
+        def launch() -> None:
+            nonlocal next_index
+            model = fallback_chain[next_index]
+            task = asyncio.ensure_future(self._execute_chain_model(model, prompt, images, output_schema, agent_id))
+            in_flight[task] = (next_index, model, time.perf_counter())
+            next_index += 1
+        
+        launch()
         try:
-            # Only log if we have queue item context
-            if hasattr(self, 'queue_item_id') and hasattr(self, 'extraction_run_id'):
-                from ..utils.model_usage_tracker import get_model_usage_tracker
-                tracker = get_model_usage_tracker()
+            while in_flight:
+                # The hedge timer runs against the most recently started call
+                _, newest_model, newest_started = max(in_flight.values(), key=lambda entry: entry[0])
+                timeout = None
+                if next_index < len(fallback_chain):
+                    elapsed = time.perf_counter() - newest_started
+                    timeout = max(0.0, self.hedging.hedge_delay(newest_model.value) - elapsed)
+                
+                done, _ = await asyncio.wait(in_flight, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
                 
-                # Estimate tokens (rough approximation)
-                prompt_tokens = prompt_length // 4  # ~4 chars per token
-                completion_tokens = completion_length // 4  # Based on max_tokens
+                if not done:
+                    hedges_fired += 1
+                    logger.info(
+                        f"Hedging slow {newest_model.value} call with {fallback_chain[next_index].value}",
+                        component="extraction_engine",
+                        agent_id=agent_id,
+                        slow_model=newest_model.value,
+                        hedge_model=fallback_chain[next_index].value,
+                        trigger_seconds=self.hedging.hedge_delay(newest_model.value)
+                    )
+                    launch()
+                    continue
                 
-                # Extract iteration number from agent_id
-                iteration_number = 1
-                if agent_id and '_' in agent_id:
-                    try:
-                        iteration_number = int(agent_id.split('_')[-1])
-                    except:
-                        pass
+                for task in sorted(done, key=lambda t: in_flight[t][0]):
+                    index, model, started = in_flight.pop(task)
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        self._log_chain_failure(model, last_error, index > 0, agent_id)
+                        continue
+                    
+                    result = task.result()
+                    self.hedging.record_latency(model.value, time.perf_counter() - started, result[1])
+                    
+                    losers = [loser for loser in in_flight if not loser.done()]
+                    cancelled_models = tuple(in_flight[loser][1].value for loser in losers)
+                    self.hedging.record_outcome(
+                        hedges_fired, hedge_won=hedges_fired > 0 and index > 0,
+                        winner_cost=result[1], cancelled_models=cancelled_models
+                    )
+                    if index > 0:
+                        logger.info(
+                            f"Fallback successful: {model.value} won after {fallback_chain[0].value}",
+                            component="extraction_engine",
+                            agent_id=agent_id,
+                            primary_model=fallback_chain[0].value,
+                            successful_model=model.value,
+                            attempt_number=index + 1,
+                            hedges_fired=hedges_fired,
+                            cancelled_models=list(cancelled_models)
+                        )
+                    return result
                 
-                await tracker.log_model_usage(
-                    queue_item_id=self.queue_item_id,
-                    extraction_run_id=self.extraction_run_id,
+                # Everything in flight failed outright: move down the chain immediately
+                if not in_flight and next_index < len(fallback_chain):
+                    launch()
+        finally:
+            for task in in_flight:
+                task.cancel()
+            # Let the losers' circuit breaker and rate limiter cleanup finish before returning
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        
+        self.hedging.record_outcome(hedges_fired, hedge_won=False, winner_cost=0.0)
+        logger.error(
+            f"All models failed for this step. Last error: {str(last_error)[:200]}",
+            component="extraction_engine",
+            agent_id=agent_id,
+            tried_models=[m.value for m in fallback_chain]
+        )
+        raise Exception(f"All AI models failed. Last error: {last_error}")
+    
+    async def _execute_chain_model(self, model: AIModelType, prompt: str, images: Dict[str, bytes], output_schema: str, agent_id: str = None) -> tuple[Any, float]:
+        """Run one model of the fallback chain"""
+        if model == AIModelType.CLAUDE_3_SONNET:
+            return await self._execute_with_claude(prompt, images, output_schema, agent_id)
+        elif model == AIModelType.GPT4O_LATEST:
+            return await self._execute_with_gpt4o(prompt, images, output_schema, agent_id)
+        elif model == AIModelType.GEMINI_2_FLASH:
+            return await self._execute_with_gemini(prompt, images, output_schema, agent_id)
+        raise ValueError(f"Model {model.value} is not part of the fallback chain")
+    
+    def _log_chain_failure(self, model: AIModelType, error: Exception, is_fallback: bool, agent_id: str = None):
+        """Log a failed model in the fallback chain"""
+        error_msg = str(error)
+        
+        # Check if it's a content moderation or similar policy issue
+        is_content_issue = any(phrase in error_msg.lower() for phrase in [
+            "could not process image",
+            "content policy",
+            "safety",
+            "inappropriate",
+            "invalid_request_error"
+        ])
+        
+        if is_fallback:
+            logger.warning(
+                f"Fallback model {model.value} also failed: {error_msg[:100]}",
+                component="extraction_engine",
+                agent_id=agent_id,
+                model=model.value,
+                error_type="content_moderation" if is_content_issue else "api_error"
+            )
+        else:
+            logger.warning(
+                f"Primary model {model.value} failed, trying fallbacks: {error_msg[:100]}",
+                component="extraction_engine",
+                agent_id=agent_id,
+                model=model.value,
+                error_type="content_moderation" if is_content_issue else "api_error"
+            )
+    
+    async def _log_model_usage(self, model_id: str, model_provider: str, usage: TokenUsage, duration: float, cost: float, stage: str, agent_id: str = None, cache_hit: bool = False):
+        """Log model usage to analytics"""
+        try:
+            if self.response_cache.enabled:
+                cache_stats = self.response_cache.get_stage_stats(stage)
+                logger.debug(
+                    f"Response cache {'hit' if cache_hit else 'miss'} for {model_id} ({stage}): "
+                    f"{cache_stats['hits']} hits / {cache_stats['misses']} misses",
+                    component="extraction_engine",
+                    agent_id=agent_id,
                     stage=stage,
-                    model_id=model_id,
-                    model_provider=model_provider,
-                    iteration_number=iteration_number,
-                    temperature=self.temperature,
-                    prompt_tokens=prompt_tokens,
-                    completion_tokens=completion_tokens,
-                    response_time_ms=int(duration * 1000),
-                    api_cost=cost,
-                    success=True
+                    cache_hit=cache_hit,
+                    cache_hits=cache_stats['hits'],
+                    cache_misses=cache_stats['misses']
                 )
+            
+            if self.cost_tracker and not cache_hit:
+                self.cost_tracker.record_tokens(stage, usage)
+            
+            from ..utils.model_usage_tracker import get_model_usage_tracker
+            tracker = get_model_usage_tracker()
+            
+            # Extract iteration number from agent_id
+            iteration_number = 1
+            if agent_id and '_' in agent_id:
+                try:
+                    iteration_number = int(agent_id.split('_')[-1])
+                except:
+                    pass
+            
+            # Rows are only persisted with queue item context; the tracker still aggregates the rest
+            await tracker.log_model_usage(
+                queue_item_id=getattr(self, 'queue_item_id', None),
+                extraction_run_id=getattr(self, 'extraction_run_id', None),
+                stage=stage,
+                model_id=model_id,
+                model_provider=model_provider,
+                iteration_number=iteration_number,
+                temperature=self.temperature,
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.output_tokens,
+                response_time_ms=int(duration * 1000),
+                api_cost=cost,
+                success=True,
+                cached_tokens=usage.cached_input_tokens,
+                cache_write_tokens=usage.cache_write_tokens,
+                token_source="cache" if cache_hit else usage.source,
+                price_table_version=get_price_table_version()
+            )
         except Exception as e:
             logger.error(f"Failed to log model usage: {e}", component="extraction_engine")
     
-    def _compress_image_for_model(self, img_data: bytes, model_type: str, img_name: str = "image") -> bytes:
-        """Compress image only if needed for specific model limits"""
-        MODEL_LIMITS = {
-            'claude': 5 * 1024 * 1024,      # 5 MB
-            'gpt4': 20 * 1024 * 1024,       # 20 MB  
-            'gemini': 20 * 1024 * 1024,     # 20 MB
-        }
+    async def _compress_image_for_model(self, img_data: bytes, model_type: str, img_name: str = "image") -> bytes:
+        """Compress image only if needed for specific model limits
         
+        Variants come from the run's ImageVariantStore, so each (image, limit) pair is
+        resized once in a worker thread and reused by every stage, shelf, retry and model.
+        """
         # Base64 encoding increases size by ~33%
-        limit = MODEL_LIMITS.get(model_type, 20 * 1024 * 1024)
-        safe_limit = limit * 0.75  # Safety margin for base64 encoding
+        safe_limit = safe_image_byte_limit(model_type)
         
         if len(img_data) <= safe_limit:
             return img_data  # No compression needed
         
-        # Only compress if necessary
-        from PIL import Image
-        import io
-        
-        img = Image.open(io.BytesIO(img_data))
-        
-        # Calculate resize ratio to fit within limit
-        resize_ratio = (safe_limit / len(img_data)) ** 0.5
-        new_size = (int(img.width * resize_ratio), int(img.height * resize_ratio))
-        
-        logger.info(
-            f"Compressing {img_name} for {model_type}: {img.width}x{img.height} -> {new_size[0]}x{new_size[1]}",
+        logger.debug(
+            f"Fitting {img_name} to {model_type} limit",
             component="extraction_engine",
             original_size=len(img_data),
             target_size=safe_limit,
             model=model_type
         )
         
-        # Resize with high quality
-        img_resized = img.resize(new_size, Image.Resampling.LANCZOS)
-        output = io.BytesIO()
-        img_resized.save(output, format='JPEG', quality=90, optimize=True)
-        
-        return output.getvalue()
+        return await get_image_variant_store().get_variant(
+            img_data, max_bytes=safe_limit, image_format='JPEG', quality=90
+        )
     
     async def _execute_with_claude_model(self, prompt: str, images: Dict[str, bytes], output_schema: str, api_model: str, agent_id: str = None) -> tuple[Any, float]:
         """Execute with specific Claude model"""
@@ -646,15 +1154,48 @@ class ModularExtractionEngine:
     
     async def _execute_with_gemini_model(self, prompt: str, images: Dict[str, bytes], output_schema: str, api_model: str, agent_id: str = None) -> tuple[Any, float]:
         """Execute with specific Gemini model"""
-        # Recreate Gemini model with specific model name
-        generation_config = genai.types.GenerationConfig(
-            temperature=self.temperature,
-            top_p=1,
-            top_k=1,
-            max_output_tokens=8000,
-        )
-        self.gemini_model = genai.GenerativeModel(api_model, generation_config=generation_config)
-        return await self._execute_with_gemini(prompt, images, output_schema, agent_id)
+        return await self._execute_with_gemini(prompt, images, output_schema, agent_id, self._get_gemini_model(api_model))
+    
+    def _get_gemini_model(self, model_name: str):
+        """Pooled Gemini handle for this engine's generation settings"""
+        return self.gemini_pool.get(model_name, temperature=self.temperature, top_p=1, top_k=1, max_output_tokens=8000)
+    
+    # For now, limit to 2 images per call to manage costs
+    _MAX_IMAGES_PER_CALL = 2
+    
+    def _image_count(self, images: Dict[str, bytes]) -> int:
+        return min(len(images), self._MAX_IMAGES_PER_CALL)
+    
+    async def _build_claude_content(self, prompt: str, images: Dict[str, bytes], model: str) -> List[Dict[str, Any]]:
+        """Claude message content: the prompt plus up to 2 images fitted to Claude's size limit"""
+        image_cache = get_image_cache()
+        image_parts = []
+        
+        for img_name, img_data in list(images.items())[:self._MAX_IMAGES_PER_CALL]:
+            # Compress only for Claude if needed
+            compressed_img = await self._compress_image_for_model(img_data, 'claude', img_name)
+            image_parts.append({
+                "type": "image",
+                "source": image_cache.anthropic_source(compressed_img, "image/jpeg")
+            })
+        
+        return message_content(prompt, image_parts, "anthropic", model)
+    
+    def _build_openai_content(self, prompt: str, images: Dict[str, bytes], model: str) -> List[Dict[str, Any]]:
+        """OpenAI message content: the prompt plus up to 2 high-detail images"""
+        image_cache = get_image_cache()
+        image_parts = [
+            {
+                "type": "image_url",
+                "image_url": {
+                    "url": image_cache.data_url(img_data, "image/jpeg"),
+                    "detail": "high"
+                }
+            }
+            for img_data in list(images.values())[:self._MAX_IMAGES_PER_CALL]
+        ]
+        
+        return message_content(prompt, image_parts, "openai", model)
     
     @with_retry(RetryConfig(max_retries=2, base_delay=1.0))
     async def _execute_with_claude(self, prompt: str, images: Dict[str, bytes], output_schema: str, agent_id: str = None) -> tuple[Any, float]:
@@ -684,86 +1225,76 @@ class ModularExtractionEngine:
             start_time = time.time()
             
             # Prepare messages with image
-            content = [{"type": "text", "text": prompt}]
-            
-            # Add multiple images if available
-            for img_name, img_data in images.items():
-                # Compress only for Claude if needed
-                compressed_img = self._compress_image_for_model(img_data, 'claude', img_name)
-                
-                content.append({
-                    "type": "image",
-                    "source": {
-                        "type": "base64",
-                        "media_type": "image/jpeg",
-                        "data": base64.b64encode(compressed_img).decode()
-                    }
-                })
-                # For now, limit to 2 images to manage costs
-                if len(content) >= 3:  # 1 text + 2 images
-                    break
-            
+            content = await self._build_claude_content(prompt, images, api_model)
             messages = [{"role": "user", "content": content}]
             
             # Execute based on schema
-            if output_schema == "ShelfStructure":
-                response = self.anthropic_client.messages.create(
-                    model=api_model,
-                    max_tokens=4000,
-                    temperature=self.temperature,
-                    messages=messages,
-                    response_model=ShelfStructure
-                )
-            elif output_schema == "List[ProductExtraction]":
-                response = self.anthropic_client.messages.create(
-                    model=api_model,
-                    max_tokens=6000,
-                    temperature=self.temperature,
-                    messages=messages,
-                    response_model=List[ProductExtraction]
-                )
-            elif output_schema == "CompleteShelfExtraction":
-                response = self.anthropic_client.messages.create(
-                    model=api_model,
-                    max_tokens=8000,
-                    temperature=self.temperature,
-                    messages=messages,
-                    response_model=CompleteShelfExtraction
-                )
-            else:
-                # Generic text response
-                response = self.anthropic_client.messages.create(
-                    model=api_model,
-                    max_tokens=4000,
-                    temperature=self.temperature,
-                    messages=messages
-                )
+            max_tokens = self._max_tokens_for_schema(output_schema)
+            estimated_tokens = estimate_request_tokens(prompt, self._image_count(images), max_tokens)
+            async with self._provider_call("anthropic", api_model, estimated_tokens):
+                if output_schema == "ShelfStructure":
+                    response, completion = await self.anthropic_client.messages.create_with_completion(
+                        model=api_model,
+                        max_tokens=max_tokens,
+                        temperature=self.temperature,
+                        messages=messages,
+                        response_model=ShelfStructure
+                    )
+                elif output_schema == "List[ProductExtraction]":
+                    response, completion = await self.anthropic_client.messages.create_with_completion(
+                        model=api_model,
+                        max_tokens=max_tokens,
+                        temperature=self.temperature,
+                        messages=messages,
+                        response_model=List[ProductExtraction]
+                    )
+                elif output_schema == "CompleteShelfExtraction":
+                    response, completion = await self.anthropic_client.messages.create_with_completion(
+                        model=api_model,
+                        max_tokens=max_tokens,
+                        temperature=self.temperature,
+                        messages=messages,
+                        response_model=CompleteShelfExtraction
+                    )
+                else:
+                    # Generic text response
+                    response = await self.anthropic_client.messages.create(
+                        model=api_model,
+                        max_tokens=max_tokens,
+                        temperature=self.temperature,
+                        messages=messages
+                    )
+                    completion = response
             
-            # Estimate API cost (Claude 3 Sonnet pricing)
+            # Price the call from the usage the API reported
             duration = time.time() - start_time
-            estimated_cost = self._estimate_claude_cost(len(prompt), 4000, len(images))
+            usage = usage_from_anthropic(completion)
+            self._record_usage("anthropic", api_model, estimated_tokens, usage)
+            cost = self._price_call("anthropic", api_model, usage)
             
             # Log model usage with the actual model name
             await self._log_model_usage(
                 model_id=api_model,
                 model_provider="anthropic",
-                prompt_length=len(prompt),
-                completion_length=4000,
+                usage=usage,
                 duration=duration,
-                cost=estimated_cost,
-                stage="products",
+                cost=cost,
+                stage=self._stage_for_schema(output_schema),
                 agent_id=agent_id
             )
             
             logger.debug(
-                f"Claude execution completed in {duration:.2f}s, cost: £{estimated_cost:.3f}",
+                f"Claude execution completed in {duration:.2f}s, cost: £{cost:.4f}",
                 component="extraction_engine",
                 agent_id=agent_id,
                 duration=duration,
-                cost=estimated_cost
+                cost=cost,
+                input_tokens=usage.prompt_tokens,
+                cached_tokens=usage.cached_input_tokens,
+                output_tokens=usage.output_tokens
             )
             
-            return response, estimated_cost
+            return response, cost
             
         except Exception as e:
             logger.error(
@@ -803,72 +1334,67 @@ class ModularExtractionEngine:
             start_time = time.time()
             
             # Prepare content with multiple images
-            content = [{"type": "text", "text": prompt}]
-            
-            for img_name, img_data in images.items():
-                content.append({
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{base64.b64encode(img_data).decode()}",
-                        "detail": "high"
-                    }
-                })
-                # Limit to 2 images for cost management
-                if len(content) >= 3:  # 1 text + 2 images
-                    break
-            
+            content = self._build_openai_content(prompt, images, api_model)
             messages = [{"role": "user", "content": content}]
             
-            if output_schema == "List[ProductExtraction]":
-                response = self.openai_client.chat.completions.create(
-                    model=api_model,
-                    messages=messages,
-                    response_model=List[ProductExtraction],
-                    max_tokens=6000,
-                    temperature=self.temperature
-                )
-            elif output_schema == "CompleteShelfExtraction":
-                response = self.openai_client.chat.completions.create(
-                    model=api_model,
-                    messages=messages,
-                    response_model=CompleteShelfExtraction,
-                    max_tokens=8000,
-                    temperature=self.temperature
-                )
-            else:
-                # Generic response
-                response = self.openai_client.chat.completions.create(
-                    model=api_model,
-                    messages=messages,
-                    max_tokens=4000,
-                    temperature=self.temperature
-                )
+            max_tokens = self._max_tokens_for_schema(output_schema)
+            estimated_tokens = estimate_request_tokens(prompt, self._image_count(images), max_tokens)
+            async with self._provider_call("openai", api_model, estimated_tokens):
+                if output_schema == "List[ProductExtraction]":
+                    response, completion = await self.openai_client.chat.completions.create_with_completion(
+                        model=api_model,
+                        messages=messages,
+                        response_model=List[ProductExtraction],
+                        max_tokens=max_tokens,
+                        temperature=self.temperature
+                    )
+                elif output_schema == "CompleteShelfExtraction":
+                    response, completion = await self.openai_client.chat.completions.create_with_completion(
+                        model=api_model,
+                        messages=messages,
+                        response_model=CompleteShelfExtraction,
+                        max_tokens=max_tokens,
+                        temperature=self.temperature
+                    )
+                else:
+                    # Generic response
+                    response = await self.openai_client.chat.completions.create(
+                        model=api_model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=self.temperature
+                    )
+                    completion = response
             
-            # Estimate API cost and tokens
+            # Price the call from the usage the API reported
             duration = time.time() - start_time
-            estimated_cost = self._estimate_gpt4o_cost(len(prompt), 4000, len(images))
+            usage = usage_from_openai(completion)
+            self._record_usage("openai", api_model, estimated_tokens, usage)
+            cost = self._price_call("openai", api_model, usage)
             
             # Log model usage with the actual model name
             await self._log_model_usage(
                 model_id=api_model,
                 model_provider="openai",
-                prompt_length=len(prompt),
-                completion_length=4000,
+                usage=usage,
                 duration=duration,
-                cost=estimated_cost,
-                stage="products",
+                cost=cost,
+                stage=self._stage_for_schema(output_schema),
                 agent_id=agent_id
             )
             
             logger.debug(
-                f"GPT-4o execution completed in {duration:.2f}s, cost: £{estimated_cost:.3f}",
+                f"GPT-4o execution completed in {duration:.2f}s, cost: £{cost:.4f}",
                 component="extraction_engine",
                 agent_id=agent_id,
                 duration=duration,
-                cost=estimated_cost
+                cost=cost,
+                input_tokens=usage.prompt_tokens,
+                cached_tokens=usage.cached_input_tokens,
+                output_tokens=usage.output_tokens
             )
             
-            return response, estimated_cost
+            return response, cost
             
         except Exception as e:
             logger.error(
@@ -881,8 +1407,10 @@ class ModularExtractionEngine:
             raise
     
     @with_retry(RetryConfig(max_retries=2, base_delay=1.0))
-    async def _execute_with_gemini(self, prompt: str, images: Dict[str, bytes], output_schema: str, agent_id: str = None) -> tuple[Any, float]:
-        """Execute extraction step with Gemini"""
+    async def _execute_with_gemini(self, prompt: str, images: Dict[str, bytes], output_schema: str, agent_id: str = None, gemini_model=None) -> tuple[Any, float]:
+        """Execute extraction step with Gemini (the default Gemini model unless a pooled handle is given)"""
+        # Resolved per call so a changed engine temperature picks up a matching handle
+        gemini_model = gemini_model or self._get_gemini_model(AIModelType.GEMINI_2_FLASH.value)
         
         # Use primary image or first available
         if "overview" in images:
@@ -904,12 +1432,12 @@ class ModularExtractionEngine:
             start_time = time.time()
             
             # Prepare content (Gemini currently supports single image best)
-            content = [prompt, {
-                "mime_type": "image/jpeg",
-                "data": base64.b64encode(image_data).decode()
-            }]
+            content = [flatten_prompt(prompt), get_image_cache().gemini_inline(image_data, "image/jpeg")]
             
-            response = self.gemini_model.generate_content(content)
+            model_name = gemini_model.model_name.replace("models/", "")
+            estimated_tokens = estimate_request_tokens(prompt, 1, 8000)
+            async with self._provider_call("google", model_name, estimated_tokens):
+                response = await gemini_model.generate_content_async(content)
             
             # Parse Gemini response based on expected schema
             if output_schema == "Dict[str, float]":
@@ -918,31 +1446,37 @@ class ModularExtractionEngine:
             else:
                 parsed_response = response.text
             
-            # Estimate API cost (Gemini is typically cheaper)
+            # Price the call from the response's usage metadata
             duration = time.time() - start_time
-            estimated_cost = self._estimate_gemini_cost(len(prompt), len(response.text))
+            usage = usage_from_gemini(response)
+            if not usage.total_tokens:
+                usage = estimate_usage(len(prompt), 1, len(response.text))
+            self._record_usage("google", model_name, estimated_tokens, usage)
+            cost = self._price_call("google", model_name, usage)
             
             # Log model usage
             await self._log_model_usage(
-                model_id=self.gemini_model.model_name,
+                model_id=model_name,
                 model_provider="google",
-                prompt_length=len(prompt),
-                completion_length=len(response.text),
+                usage=usage,
                 duration=duration,
-                cost=estimated_cost,
-                stage="products",
+                cost=cost,
+                stage=self._stage_for_schema(output_schema),
                 agent_id=agent_id
             )
             
             logger.debug(
-                f"Gemini execution completed in {duration:.2f}s, cost: £{estimated_cost:.3f}",
+                f"Gemini execution completed in {duration:.2f}s, cost: £{cost:.4f}",
                 component="extraction_engine",
                 agent_id=agent_id,
                 duration=duration,
-                cost=estimated_cost
+                cost=cost,
+                input_tokens=usage.prompt_tokens,
+                cached_tokens=usage.cached_input_tokens,
+                output_tokens=usage.output_tokens
             )
             
-            return parsed_response, estimated_cost
+            return parsed_response, cost
                 
         except Exception as e:
             logger.error(
@@ -975,48 +1509,6 @@ class ModularExtractionEngine:
         
         return prices
     
-    def _estimate_claude_cost(self, input_chars: int, output_tokens: int, image_count: int = 1) -> float:
-        """Estimate Claude API cost with image pricing"""
-        # Claude 3 Sonnet pricing
-        input_cost_per_1k = 0.003
-        output_cost_per_1k = 0.015
-        image_cost = 0.004  # Per image
-        
-        input_tokens_est = input_chars // 4  # Rough token estimate
-        output_tokens_est = output_tokens // 4
-        
-        cost = (input_tokens_est / 1000 * input_cost_per_1k + 
-                output_tokens_est / 1000 * output_cost_per_1k +
-                image_count * image_cost)
-        
-        return round(cost, 4)
-    
-    def _estimate_gpt4o_cost(self, input_chars: int, output_tokens: int, image_count: int = 1) -> float:
-        """Estimate GPT-4o API cost with image pricing"""
-        # GPT-4o pricing
-        input_cost_per_1k = 0.005
-        output_cost_per_1k = 0.015
-        image_cost = 0.006  # Per image (high detail)
-        
-        input_tokens_est = input_chars // 4
-        output_tokens_est = output_tokens // 4
-        
-        cost = (input_tokens_est / 1000 * input_cost_per_1k + 
-                output_tokens_est / 1000 * output_cost_per_1k +
-                image_count * image_cost)
-        
-        return round(cost, 4)
-    
-    def _estimate_gemini_cost(self, input_chars: int, output_chars: int) -> float:
-        """Estimate Gemini API cost"""
-        # Gemini is typically cheaper
-        total_chars = input_chars + output_chars
-        cost_per_1k_chars = 0.00025
-        
-        cost = (total_chars / 1000) * cost_per_1k_chars
-        
-        return round(cost, 4)
-    
     async def _construct_complete_extraction(self,
                                            upload_id: str,
                                            step_outputs: Dict,
@@ -131,6 +131,13 @@ class NonProductElements(BaseModel):
     empty_spaces: List[Dict[str, int]] = Field(default_factory=list)
 
 
+class ShelfBand(BaseModel):
+    """Vertical extent of one shelf level's products"""
+    shelf_number: int = Field(description="Shelf number from bottom up (1=bottom)")
+    top: float = Field(description="Top edge as a fraction of image height (0.0=top of image)")
+    bottom: float = Field(description="Bottom edge (the price rail) as a fraction of image height (1.0=bottom)")
+
+
 class ShelfStructure(BaseModel):
     """Physical shelf layout"""
     picture_height: int
@@ -139,6 +146,7 @@ class ShelfStructure(BaseModel):
     estimated_width_meters: float
     estimated_height_meters: float
     shelf_coordinates: List[Dict[str, int]] = Field(description="Y coordinates per shelf")
+    shelf_bands: List[ShelfBand] = Field(default_factory=list, description="Vertical band of each shelf, used to crop per-shelf images")
     structure_confidence: ConfidenceLevel
 
 
@@ -20,6 +20,7 @@ CRITICAL TASKS:
 3. Estimate physical shelf width in meters (standard retail shelf sections are ~1m wide)
 4. Identify vertical section dividers if present
 5. Provide Y coordinates for each shelf level (pixel position from top)
+6. Provide each shelf's band: the top and bottom edge of its products as fractions of image height (0.0=top, 1.0=bottom)
 
 OUTPUT REQUIREMENTS:
 - Focus only on shelf structure, ignore products
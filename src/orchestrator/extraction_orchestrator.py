@@ -16,7 +16,9 @@ from ..extraction.models import (
     AIModelType, ConfidenceLevel
 )
 from ..models.shelf_structure import ShelfStructure
-from ..utils import logger
+from ..utils import (
+    logger, prompt_caching_enabled, cacheable_prompt, crop_shelves, ShelfCrops, ShelfCropReport
+)
 from ..utils.extraction_analytics import get_extraction_analytics
 
 
@@ -520,167 +522,300 @@ class ExtractionOrchestrator:
             total_shelves=context.structure.shelf_count
         )
         
-        # Extract products shelf by shelf
-        for shelf_num in range(1, context.structure.shelf_count + 1):
+        # Products are published to the stage's product stream (if any) as they arrive
+        product_stream = getattr(self, 'product_stream', None)
+        
+        # Cropping stage: one sub-image per shelf band from the structure stage
+        shelf_crops = None
+        crop_report = ShelfCropReport()  # vision-token and latency totals of this extraction's shelf calls
+        if self.config.shelf_cropping_enabled:
+            shelf_crops = await crop_shelves(image, context.structure, self.config.shelf_crop_margin)
+            if shelf_crops is None:
+                logger.warning(
+                    "Structure has no shelf bands - sending the full image for every shelf",
+                    component="extraction_orchestrator",
+                    agent_id=agent_id
+                )
+        
+        # Shelves are extracted concurrently, up to shelf_extraction_parallelism at a time;
+        # every call still waits on the provider rate limiter inside the engine
+        semaphore = asyncio.Semaphore(max(1, self.config.shelf_extraction_parallelism))
+        
+        async def extract_shelf(shelf_num: int) -> List[ProductExtraction]:
+            async with semaphore:
+                return await self._extract_shelf(
+                    image, context, model, agent_number, agent_id,
+                    shelf_num, shelf_prompt_template, product_stream, shelf_crops, crop_report
+                )
+        
+        shelf_results = await asyncio.gather(*[
+            extract_shelf(shelf_num) for shelf_num in range(1, context.structure.shelf_count + 1)
+        ])
+        
+        # Merge in shelf order
+        for shelf_products in shelf_results:
+            all_products.extend(shelf_products)
+        
+        # Sort products by shelf then position
+        all_products.sort(key=lambda p: (p.position.shelf_number, p.position.position_on_shelf))
+        
+        logger.info(
+            f"Shelf-by-shelf extraction complete: {len(all_products)} total products",
+            component="extraction_orchestrator",
+            agent_id=agent_id,
+            total_products=len(all_products),
+            shelves_processed=context.structure.shelf_count
+        )
+        
+        if shelf_crops is not None:
             logger.info(
-                f"Extracting shelf {shelf_num}/{context.structure.shelf_count}",
+                "Shelf crop savings",
                 component="extraction_orchestrator",
                 agent_id=agent_id,
-                shelf_number=shelf_num
+                queue_item_id=self.queue_item_id,
+                **crop_report.summary()
             )
-            
-            # Process {IF_RETRY} blocks based on agent number (which serves as attempt number for products)
-            # Build context for variable replacement
+        
+        return all_products
+    
+    async def _extract_shelf(self,
+                             image: bytes,
+                             context: CumulativeExtractionContext,
+                             model: AIModelType,
+                             agent_number: int,
+                             agent_id: str,
+                             shelf_num: int,
+                             shelf_prompt_template: str,
+                             product_stream: Optional[Any],
+                             shelf_crops: Optional[ShelfCrops] = None,
+                             crop_report: Optional[ShelfCropReport] = None) -> List[ProductExtraction]:
+        """Extract one shelf's products; a failed shelf yields no products"""
+        on_product = self._shelf_product_publisher(product_stream, shelf_num)
+        shelf_image = shelf_crops.images.get(shelf_num) if shelf_crops else None
+        shelf_images = {"main": shelf_image if shelf_image is not None else image}
+        
+        logger.info(
+            f"Extracting shelf {shelf_num}/{context.structure.shelf_count}",
+            component="extraction_orchestrator",
+            agent_id=agent_id,
+            shelf_number=shelf_num
+        )
+        
+        shelf_prompt = self._build_shelf_prompt(
+            shelf_prompt_template, agent_number, shelf_num, context.structure.shelf_count, context
+        )
+        if shelf_image is not None:
+            # Each shelf sends its own crop, so only the instructions can be a shared cached prefix
+            shelf_prompt = cacheable_prompt(
+                shelf_prompt,
+                f"The image is cropped to shelf {shelf_num}. Products cut off at the top or bottom edge "
+                "belong to the neighbouring shelves - ignore them.",
+                images_vary=True
+            )
+        
+        # Track iteration if analytics enabled
+        iteration_id = None
+        if self.analytics:
             retry_context = {
                 'shelf_number': shelf_num,
-                'total_shelves': context.structure.shelf_count
+                'agent_number': agent_number,
+                'existing_products': len([p for p in context.successful_extractions if p.get('shelf_level') == shelf_num])
             }
             
-            # Add previous extraction data if this is a retry
-            if agent_number > 1:
-                # Find products already extracted for this shelf
-                existing_products = [p for p in context.successful_extractions 
-                                   if p.get('shelf_level') == shelf_num]
-                if existing_products:
-                    retry_context['previous_shelf_products'] = '\n'.join(
-                        f"Position {p.get('position_on_shelf')}: {p.get('brand')} {p.get('name')}"
-                        for p in existing_products[:10]  # Limit to prevent overflow
-                    )
-                    retry_context['high_confidence_products'] = retry_context['previous_shelf_products']
-                
-                # Add any visual feedback
-                retry_context['planogram_feedback'] = "Check edges and promotional areas for missed products"
-                
-                # Add alias for consistency with prompt
-                retry_context['previous_extraction_data'] = retry_context.get('previous_shelf_products', 'No previous extraction data')
-            
-            shelf_prompt = self.process_retry_blocks(shelf_prompt_template, agent_number, retry_context)
-            
-            # Build shelf-specific prompt
-            shelf_prompt = shelf_prompt.format(
-                shelf_number=shelf_num,
-                total_shelves=context.structure.shelf_count
+            iteration_id = await self.analytics.track_products_extraction(
+                shelf_num=shelf_num,
+                model_id=model.value if hasattr(model, 'value') else str(model),
+                model_index=agent_number - 1,
+                attempt_number=1,  # Can be enhanced to track retries
+                prompt_template=context.prompts.get('products', ''),
+                processed_prompt=shelf_prompt,
+                retry_context=retry_context
             )
+        
+        try:
+            start_time = datetime.utcnow()
+            published = False
             
-            # Add cumulative context for subsequent agents
-            if agent_number > 1:
-                # Find products already extracted for this shelf
-                existing_products = [p for p in context.successful_extractions 
-                                   if p.get('shelf_level') == shelf_num]
-                if existing_products:
-                    shelf_prompt += f"\n\nPREVIOUSLY FOUND ON THIS SHELF (keep these):\n"
-                    for p in existing_products:
-                        shelf_prompt += f"- Position {p.get('position_on_shelf')}: {p.get('brand')} {p.get('name')}\n"
-            
-            # Track iteration if analytics enabled
-            iteration_id = None
-            if self.analytics:
-                retry_context = {
-                    'shelf_number': shelf_num,
-                    'agent_number': agent_number,
-                    'existing_products': len([p for p in context.successful_extractions if p.get('shelf_level') == shelf_num])
-                }
-                
-                iteration_id = await self.analytics.track_products_extraction(
-                    shelf_num=shelf_num,
-                    model_id=model.value if hasattr(model, 'value') else str(model),
-                    model_index=agent_number - 1,
-                    attempt_number=1,  # Can be enhanced to track retries
-                    prompt_template=context.prompts.get('products', ''),
-                    processed_prompt=shelf_prompt,
-                    retry_context=retry_context
-                )
-            
-            try:
-                start_time = datetime.utcnow()
-                
-                # Execute extraction for this shelf
-                # If we have a configured model from stage_models, use it
-                if context.structure and hasattr(self, 'stage_models') and 'products' in self.stage_models:
-                    models = self.stage_models['products']
-                    if models:
-                        # Select model based on agent number
-                        model_id = models[(agent_number - 1) % len(models)]
-                        shelf_result, api_cost = await self.extraction_engine.execute_with_model_id(
-                            model_id=model_id,
-                            prompt=shelf_prompt,
-                            images={"main": image},
-                            output_schema="List[ProductExtraction]",
-                            agent_id=f"{agent_id}_shelf_{shelf_num}"
-                        )
-                    else:
-                        # Fallback to default model
-                        shelf_result, api_cost = await self.extraction_engine._execute_with_fallback(
-                            primary_model=model,
-                            prompt=shelf_prompt,
-                            images={"main": image},
-                            output_schema="List[ProductExtraction]",
-                            agent_id=f"{agent_id}_shelf_{shelf_num}"
-                        )
+            # Execute extraction for this shelf
+            # If we have a configured model from stage_models, use it
+            if context.structure and hasattr(self, 'stage_models') and 'products' in self.stage_models:
+                models = self.stage_models['products']
+                if models:
+                    # Select model based on agent number
+                    model_id = models[(agent_number - 1) % len(models)]
+                    shelf_result, api_cost = await self.extraction_engine.execute_with_model_id(
+                        model_id=model_id,
+                        prompt=shelf_prompt,
+                        images=shelf_images,
+                        output_schema="List[ProductExtraction]",
+                        agent_id=f"{agent_id}_shelf_{shelf_num}",
+                        on_product=on_product
+                    )
+                    published = True
                 else:
-                    # Use default fallback
+                    # Fallback to default model
                     shelf_result, api_cost = await self.extraction_engine._execute_with_fallback(
                         primary_model=model,
                         prompt=shelf_prompt,
-                        images={"main": image},
+                        images=shelf_images,
                         output_schema="List[ProductExtraction]",
                         agent_id=f"{agent_id}_shelf_{shelf_num}"
                     )
-                
-                duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-                
-                # Update analytics with results if enabled
-                if self.analytics and iteration_id:
-                    await self.analytics.analytics.update_iteration_result(
-                        iteration_id=iteration_id,
-                        extraction_result={'products': [p.dict() if hasattr(p, 'dict') else p for p in shelf_result]},
-                        products_found=len(shelf_result),
-                        accuracy_score=0.0,  # Can be calculated based on confidence scores
-                        api_cost=api_cost,
-                        tokens_used=len(shelf_prompt) // 4,  # Rough estimate
-                        duration_ms=duration_ms
-                    )
-                
-                # Convert and add products from this shelf
-                shelf_products = self._convert_extraction_result(shelf_result, model)
-                
-                # Ensure all products have the correct shelf number
-                for product in shelf_products:
-                    product.position.shelf_number = shelf_num
-                
-                all_products.extend(shelf_products)
-                
-                logger.info(
-                    f"Extracted {len(shelf_products)} products from shelf {shelf_num}",
-                    component="extraction_orchestrator",
-                    agent_id=agent_id,
-                    shelf_number=shelf_num,
-                    product_count=len(shelf_products)
+            else:
+                # Use default fallback
+                shelf_result, api_cost = await self.extraction_engine._execute_with_fallback(
+                    primary_model=model,
+                    prompt=shelf_prompt,
+                    images=shelf_images,
+                    output_schema="List[ProductExtraction]",
+                    agent_id=f"{agent_id}_shelf_{shelf_num}"
                 )
-                
-            except Exception as e:
-                logger.error(
-                    f"Failed to extract shelf {shelf_num}: {e}",
-                    component="extraction_orchestrator",
-                    agent_id=agent_id,
-                    shelf_number=shelf_num,
-                    error=str(e)
+            
+            # The fallback chain isn't streamed - publish the shelf once it is complete
+            if on_product is not None and not published:
+                for product in shelf_result:
+                    await on_product(product)
+            
+            duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+            if shelf_crops is not None and crop_report is not None:
+                crop_report.record(
+                    shelf_crops.full_image_tokens,
+                    shelf_crops.crop_tokens.get(shelf_num, shelf_crops.full_image_tokens),
+                    duration_ms / 1000,
+                    cropped=shelf_image is not None
+                )
+            
+            # Update analytics with results if enabled
+            if self.analytics and iteration_id:
+                await self.analytics.analytics.update_iteration_result(
+                    iteration_id=iteration_id,
+                    extraction_result={'products': [p.dict() if hasattr(p, 'dict') else p for p in shelf_result]},
+                    products_found=len(shelf_result),
+                    accuracy_score=0.0,  # Can be calculated based on confidence scores
+                    api_cost=api_cost,
+                    tokens_used=len(shelf_prompt) // 4,  # Rough estimate
+                    duration_ms=duration_ms
                 )
-                # Continue with next shelf even if one fails
-                continue
+            
+            # Convert and add products from this shelf
+            shelf_products = self._convert_extraction_result(shelf_result, model)
+            
+            # Ensure all products have the correct shelf number
+            for product in shelf_products:
+                product.position.shelf_number = shelf_num
+            
+            logger.info(
+                f"Extracted {len(shelf_products)} products from shelf {shelf_num}",
+                component="extraction_orchestrator",
+                agent_id=agent_id,
+                shelf_number=shelf_num,
+                product_count=len(shelf_products)
+            )
+            
+            return shelf_products
+            
+        except Exception as e:
+            logger.error(
+                f"Failed to extract shelf {shelf_num}: {e}",
+                component="extraction_orchestrator",
+                agent_id=agent_id,
+                shelf_number=shelf_num,
+                error=str(e)
+            )
+            # The other shelves carry on even if one fails
+            return []
+    
+    def _build_shelf_prompt(self, template: str, agent_number: int, shelf_num: int, total_shelves: int,
+                            context: CumulativeExtractionContext) -> str:
+        """Products prompt for one shelf
         
-        # Sort products by shelf then position
-        all_products.sort(key=lambda p: (p.position.shelf_number, p.position.position_on_shelf))
+        With prompt caching on, the instructions are rendered once per attempt with the
+        shelf left as "N", and the shelf number and that shelf's earlier products go in a
+        short suffix, so every shelf (and every model) shares the same cacheable prefix.
+        """
+        # Products already extracted for this shelf
+        existing_products = []
+        if agent_number > 1:
+            existing_products = [p for p in context.successful_extractions 
+                               if p.get('shelf_level') == shelf_num]
         
-        logger.info(
-            f"Shelf-by-shelf extraction complete: {len(all_products)} total products",
-            component="extraction_orchestrator",
-            agent_id=agent_id,
-            total_products=len(all_products),
-            shelves_processed=context.structure.shelf_count
+        if prompt_caching_enabled():
+            return self._build_cacheable_shelf_prompt(template, agent_number, shelf_num, total_shelves, existing_products)
+        
+        # Process {IF_RETRY} blocks based on agent number (which serves as attempt number for products)
+        # Build context for variable replacement
+        retry_context = {
+            'shelf_number': shelf_num,
+            'total_shelves': total_shelves
+        }
+        
+        # Add previous extraction data if this is a retry
+        if agent_number > 1:
+            if existing_products:
+                retry_context['previous_shelf_products'] = '\n'.join(
+                    f"Position {p.get('position_on_shelf')}: {p.get('brand')} {p.get('name')}"
+                    for p in existing_products[:10]  # Limit to prevent overflow
+                )
+                retry_context['high_confidence_products'] = retry_context['previous_shelf_products']
+            
+            # Add any visual feedback
+            retry_context['planogram_feedback'] = "Check edges and promotional areas for missed products"
+            
+            # Add alias for consistency with prompt
+            retry_context['previous_extraction_data'] = retry_context.get('previous_shelf_products', 'No previous extraction data')
+        
+        shelf_prompt = self.process_retry_blocks(template, agent_number, retry_context)
+        
+        # Build shelf-specific prompt
+        shelf_prompt = shelf_prompt.format(
+            shelf_number=shelf_num,
+            total_shelves=total_shelves
         )
         
-        return all_products
+        # Add cumulative context for subsequent agents
+        if existing_products:
+            shelf_prompt += f"\n\nPREVIOUSLY FOUND ON THIS SHELF (keep these):\n"
+            for p in existing_products:
+                shelf_prompt += f"- Position {p.get('position_on_shelf')}: {p.get('brand')} {p.get('name')}\n"
+        
+        return shelf_prompt
+    
+    def _build_cacheable_shelf_prompt(self, template: str, agent_number: int, shelf_num: int,
+                                      total_shelves: int, existing_products: List[Dict]) -> str:
+        """Shelf prompt split into a per-attempt prefix and a per-shelf suffix"""
+        see_below = "(see SHELF CONTEXT at the end)"
+        shared_context = {
+            'shelf_number': 'N',
+            'total_shelves': total_shelves
+        }
+        if agent_number > 1:
+            shared_context['planogram_feedback'] = "Check edges and promotional areas for missed products"
+            shared_context['previous_shelf_products'] = see_below
+            shared_context['high_confidence_products'] = see_below
+            shared_context['previous_extraction_data'] = see_below
+        
+        prefix = self.process_retry_blocks(template, agent_number, shared_context)
+        prefix = prefix.format(shelf_number='N', total_shelves=total_shelves)
+        
+        suffix = f"SHELF CONTEXT:\nN = {shelf_num}. Extract shelf {shelf_num} of {total_shelves} only."
+        if existing_products:
+            suffix += "\n\nPREVIOUSLY FOUND ON THIS SHELF (keep these):\n"
+            for p in existing_products:
+                suffix += f"- Position {p.get('position_on_shelf')}: {p.get('brand')} {p.get('name')}\n"
+        
+        return cacheable_prompt(prefix, suffix)
+    
+    def _shelf_product_publisher(self, product_stream, shelf_num: int):
+        """Callback publishing one shelf's products to the product stream (None without a stream)"""
+        if product_stream is None:
+            return None
+        
+        async def on_product(product) -> None:
+            # Shelf numbers come from the loop, not the model
+            product.shelf_level = shelf_num
+            await product_stream.publish(product)
+        
+        return on_product
     
     def _convert_extraction_result(self, extraction_result: List[Any], model: AIModelType) -> List[ProductExtraction]:
         """Convert extraction engine results to our ProductExtraction format"""
@@ -111,6 +111,14 @@ class MonitoringHooks:
         }
         self.update_monitor(queue_item_id, updates)
     
+    async def update_products_progress(self, queue_item_id: int, product_count: int, latest_product: Dict[str, Any]):
+        """Update products found so far while the products stage is streaming"""
+        updates = {
+            "products_found": product_count,
+            "latest_product": latest_product
+        }
+        self.update_monitor(queue_item_id, updates)
+    
     async def update_stage_progress(self, queue_item_id: int, stage_name: str, 
                                   attempt: int, total_attempts: int, 
                                   model: str = None, complete: bool = False):
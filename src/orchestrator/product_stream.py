@@ -0,0 +1,160 @@
+"""
+Product Stream
+Fans products out to planogram previews and WebSocket progress while the products
+stage is still running, and keeps them for smart-iteration locking once it ends
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..utils import logger
+from ..websocket.manager import websocket_manager
+from .monitoring_hooks import monitoring_hooks
+
+
+ProductConsumer = Callable[[Any, "ProductStream"], Awaitable[None]]
+
+
+def _position_key(product: Any, fallback: int) -> Tuple[int, int]:
+    """(shelf, position) for an engine product or a product dict"""
+    if isinstance(product, dict):
+        return product.get('shelf_level', 0), product.get('position_on_shelf', fallback)
+    return getattr(product, 'shelf_level', 0), getattr(product, 'position_on_shelf', fallback)
+
+
+def _product_summary(product: Any) -> Dict[str, Any]:
+    if isinstance(product, dict):
+        get = product.get
+    else:
+        get = lambda name, default=None: getattr(product, name, default)
+    return {
+        'shelf': get('shelf_level', 0),
+        'position': get('position_on_shelf', 0),
+        'brand': get('brand', ''),
+        'name': get('name', ''),
+        'confidence': get('extraction_confidence', 0.0)
+    }
+
+
+class ProductStream:
+    """Products of one products-stage attempt, published to consumers as they arrive
+
+    A product re-emitted for the same (shelf, position) replaces the earlier one, so
+    retried calls don't duplicate products. Consumers are awaited in order and must
+    stay cheap - anything heavy should be scheduled, as the planogram preview is.
+    """
+
+    def __init__(self, agent_id: str, queue_item_id: Optional[int] = None, iteration: int = 1):
+        self.agent_id = agent_id
+        self.queue_item_id = queue_item_id
+        self.iteration = iteration
+        self.started = time.time()
+        self.first_product_seconds: Optional[float] = None
+        self.first_planogram_seconds: Optional[float] = None
+        self.latest_planogram: Optional[bytes] = None
+        self._products: Dict[Tuple[int, int], Any] = {}
+        self._consumers: List[ProductConsumer] = []
+        self._background: List[asyncio.Task] = []
+
+    @property
+    def product_count(self) -> int:
+        return len(self._products)
+
+    @property
+    def products(self) -> List[Any]:
+        return [self._products[key] for key in sorted(self._products)]
+
+    def subscribe(self, consumer: ProductConsumer) -> "ProductStream":
+        self._consumers.append(consumer)
+        return self
+
+    async def publish(self, product: Any) -> None:
+        """Record a product and hand it to every consumer"""
+        if self.first_product_seconds is None:
+            self.first_product_seconds = time.time() - self.started
+        self._products[_position_key(product, len(self._products) + 1)] = product
+
+        for consumer in self._consumers:
+            try:
+                await consumer(product, self)
+            except Exception as e:
+                logger.warning(
+                    f"Product stream consumer failed: {e}",
+                    component="product_stream",
+                    agent_id=self.agent_id
+                )
+
+    def run_in_background(self, coro: Awaitable[Any]) -> None:
+        """Run consumer work without holding up the stream; awaited by close()"""
+        self._background.append(asyncio.ensure_future(coro))
+
+    async def close(self) -> None:
+        """Wait for background consumer work and log stream timings"""
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+            self._background.clear()
+
+        logger.info(
+            f"Product stream closed: {len(self._products)} products",
+            component="product_stream",
+            agent_id=self.agent_id,
+            time_to_first_product=self.first_product_seconds,
+            time_to_first_planogram=self.first_planogram_seconds,
+            duration=time.time() - self.started
+        )
+
+
+async def websocket_progress(product: Any, stream: ProductStream) -> None:
+    """Push each product to dashboard clients watching the run"""
+    summary = _product_summary(product)
+    count = stream.product_count
+    await websocket_manager.broadcast_product_extracted(stream.agent_id, summary, count)
+    if stream.queue_item_id:
+        await monitoring_hooks.update_products_progress(stream.queue_item_id, count, summary)
+
+
+def lock_streamed_products(manager, stream: ProductStream) -> int:
+    """Lock the high-confidence positions of a finished attempt in the SmartIterationManager
+
+    Called only once the attempt's products have been validated, never while they stream.
+    """
+    return sum(
+        1 for product in stream.products
+        if not isinstance(product, dict) and manager.lock_streamed_product(stream.iteration, product)
+    )
+
+
+def planogram_preview(every: int = 5, abstraction_level: str = "product_view") -> ProductConsumer:
+    """Render a preview planogram for the first product and then every `every` products
+
+    Rendering runs in a worker thread; a preview is skipped while one is in flight.
+    """
+    state = {'rendering': False, 'rendered_at': 0}
+
+    async def render(stream: ProductStream, count: int) -> None:
+        from ..api.planogram_renderer import generate_png_from_real_data
+
+        planogram_data = {
+            'extraction_result': {'products': stream.products, 'structure': {}},
+            'accuracy': 0.0
+        }
+        try:
+            png = await asyncio.to_thread(generate_png_from_real_data, planogram_data, abstraction_level)
+        finally:
+            state['rendering'] = False
+
+        stream.latest_planogram = png
+        if stream.first_planogram_seconds is None:
+            stream.first_planogram_seconds = time.time() - stream.started
+        await websocket_manager.broadcast_planogram_update(stream.agent_id, f"{stream.agent_id}_preview_{count}")
+
+    async def consume(product: Any, stream: ProductStream) -> None:
+        count = stream.product_count
+        if state['rendering'] or (state['rendered_at'] and count - state['rendered_at'] < every):
+            return
+        state['rendering'] = True
+        state['rendered_at'] = count
+        stream.run_in_background(render(stream, count))
+
+    return consume
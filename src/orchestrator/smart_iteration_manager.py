@@ -12,6 +12,26 @@ from ..models.shelf_structure import ShelfStructure
 from ..utils import logger
 
 
+def product_slot(product: Any, default_confidence: float = 0.0) -> Optional[Tuple[int, int, float]]:
+    """(shelf, position, confidence) of a product dict, or None if it has no shelf
+    
+    Reads the engine's ProductExtraction fields (shelf_level, position_on_shelf,
+    extraction_confidence), falling back to consensus products whose `position`
+    is a {'shelf', 'position'} dict and whose confidence is `confidence`.
+    """
+    if not isinstance(product, dict):
+        return None
+    if product.get('shelf_level') is not None:
+        shelf, position = product['shelf_level'], product.get('position_on_shelf')
+    else:
+        location = product.get('position')
+        if not isinstance(location, dict) or location.get('shelf') is None:
+            return None
+        shelf, position = location['shelf'], location.get('position')
+    confidence = product.get('extraction_confidence', product.get('confidence'))
+    return int(shelf), int(position or 0), float(default_confidence if confidence is None else confidence)
+
+
 @dataclass
 class LockedPosition:
     """Represents a locked product position that shouldn't be re-extracted"""
@@ -106,7 +126,7 @@ class SmartIterationManager:
                         focus.enhancement_strategies[issue_type] = failure_info.enhancement_strategy
         
         # Check for missing positions (gaps)
-        self._identify_missing_positions(structure, products_by_position, focus)
+        self._identify_missing_positions(structure.shelf_count, products_by_position, focus)
         
         # Log iteration summary
         logger.info(
@@ -128,6 +148,90 @@ class SmartIterationManager:
         
         return focus
     
+    def analyze_consensus_products(
+        self,
+        iteration: int,
+        products: List[Dict],
+        shelf_count: int
+    ) -> ExtractionFocus:
+        """Lock and focus for consensus products given as dicts (see `product_slot`)
+        
+        Used by systems that have no accuracy analysis: positions are locked on
+        confidence alone, and the structure is locked after the first iteration.
+        Shelves with unlocked positions, gaps or no products at all are re-extracted.
+        """
+        if iteration == 1 and shelf_count > 0:
+            self.structure_locked = True
+        
+        focus = ExtractionFocus()
+        products_by_position = {}
+        for product in products:
+            slot = product_slot(product)
+            if slot is None:
+                continue
+            position_key, confidence = slot[:2], slot[2]
+            products_by_position[position_key] = product
+            
+            if position_key in self.locked_positions:
+                continue
+            if confidence >= 0.95:
+                self.locked_positions[position_key] = LockedPosition(
+                    shelf=position_key[0],
+                    position=position_key[1],
+                    product_data=dict(product),
+                    confidence=confidence,
+                    locked_at_iteration=iteration
+                )
+            else:
+                focus.positions_to_reextract.add(position_key)
+                focus.shelves_to_reextract.add(position_key[0])
+        
+        self._identify_missing_positions(shelf_count, products_by_position, focus)
+        for shelf in range(1, shelf_count + 1):
+            if not any(s == shelf for s, _ in products_by_position):
+                focus.shelves_to_reextract.add(shelf)
+        
+        logger.info(
+            f"Iteration {iteration} consensus locking summary",
+            component="smart_iteration",
+            locked_count=len(self.locked_positions),
+            reextract_positions=len(focus.positions_to_reextract),
+            reextract_shelves=sorted(focus.shelves_to_reextract)
+        )
+        
+        self.extraction_history.append({
+            "iteration": iteration,
+            "locked_count": len(self.locked_positions),
+            "focus": focus,
+            "timestamp": datetime.utcnow()
+        })
+        
+        return focus
+    
+    def lock_streamed_product(self, iteration: int, product: ProductExtraction) -> bool:
+        """Lock a streamed product once its products-stage attempt has been accepted
+        
+        Only the confidence rule is applied here; locks that need the accuracy
+        analysis are decided by analyze_iteration_results once the iteration ends.
+        """
+        position_key = (product.shelf_level, product.position_on_shelf)
+        if position_key in self.locked_positions or product.extraction_confidence < 0.95:
+            return False
+        
+        self.locked_positions[position_key] = LockedPosition(
+            shelf=position_key[0],
+            position=position_key[1],
+            product_data=self._serialize_product(product),
+            confidence=product.extraction_confidence,
+            locked_at_iteration=iteration,
+            reason="high_confidence"
+        )
+        logger.debug(
+            f"Locked streamed position {position_key[0]}-{position_key[1]}: {product.name}",
+            component="smart_iteration"
+        )
+        return True
+    
     def get_locked_products(self) -> List[ProductExtraction]:
         """Get all locked products to preserve in next iteration"""
         locked_products = []
@@ -238,12 +342,12 @@ class SmartIterationManager:
     
     def _identify_missing_positions(
         self,
-        structure: ShelfStructure,
+        shelf_count: int,
         products_by_position: Dict,
         focus: ExtractionFocus
     ):
         """Identify gaps where products might be missing"""
-        for shelf in range(1, structure.shelf_count + 1):
+        for shelf in range(1, shelf_count + 1):
             # Get all positions on this shelf
             shelf_positions = [p for (s, p) in products_by_position.keys() if s == shelf]
             
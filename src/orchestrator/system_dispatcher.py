@@ -5,7 +5,8 @@ Simple router that dispatches extraction requests to the appropriate system
 
 import asyncio
 import time
-from typing import Dict, List, Optional, Any
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Any
 from datetime import datetime
 import uuid
 from PIL import Image, ImageDraw, ImageFont
@@ -19,12 +20,13 @@ from ..comparison.image_comparison_agent import ImageComparisonAgent
 from ..evaluation.human_evaluation import HumanEvaluationSystem
 from ..models.extraction_models import ExtractionResult
 from ..models.shelf_structure import ShelfStructure
-from ..utils import logger
+from ..utils import logger, image_cache_scope, get_provider_cassette
 from .models import MasterResult
 from ..extraction.state_tracker import get_state_tracker, ExtractionStage, ExtractionStatus
 from ..planogram.models import VisualPlanogram
 from .monitoring_hooks import monitoring_hooks
 from .smart_iteration_manager import SmartIterationManager
+from .product_stream import ProductStream, websocket_progress, lock_streamed_products, planogram_preview
 
 
 class SystemDispatcher:
@@ -38,6 +40,7 @@ class SystemDispatcher:
         self.planogram_orchestrator = PlanogramOrchestrator(config)
         self.feedback_manager = CumulativeFeedbackManager()
         self.comparison_agent = ImageComparisonAgent(config)
+        self.comparison_agent.reset_run_state(queue_item_id)
         self.human_evaluation = HumanEvaluationSystem(config)
         self.state_tracker = get_state_tracker(supabase_client)
         self.smart_iteration_manager = SmartIterationManager()
@@ -74,9 +77,6 @@ class SystemDispatcher:
         # Get images
         images = await self._get_images(upload_id)
         
-        # Initialize the appropriate extraction system based on selection
-        from ..systems.base_system import ExtractionSystemFactory
-        
         # Map UI system names to factory system names
         system_type_map = {
             'custom_consensus': 'custom',
@@ -94,74 +94,116 @@ class SystemDispatcher:
             mapped_system=system_type
         )
         
-        # Create the selected extraction system
-        self.extraction_system = ExtractionSystemFactory.get_system(
-            system_type=system_type,
-            config=self.config
-        )
-        
-        # Pass configuration to the system
-        if configuration:
-            self.extraction_system.configuration = configuration
-            self.extraction_system.temperature = configuration.get('temperature', 0.7)
-            self.extraction_system.stage_models = configuration.get('stage_models', {})
-            self.extraction_system.stage_prompts = configuration.get('stage_prompts', {})
-        
-        # Log configuration usage
-        if configuration and queue_item_id:
-            from ..utils.model_usage_tracker import get_model_usage_tracker
-            tracker = get_model_usage_tracker()
-            
-            # Create configuration name from settings
-            config_name = f"{system}_{configuration.get('temperature', 0.7)}_{configuration.get('orchestrator_model', 'default')}"
-            
-            await tracker.log_configuration_usage(
-                configuration_name=config_name,
-                configuration_id=f"config_{queue_item_id}_{run_id}",
-                system=system,
-                orchestrator_model=configuration.get('orchestrator_model', 'claude-4-opus'),
-                orchestrator_prompt=configuration.get('orchestrator_prompt', ''),
-                temperature=configuration.get('temperature', 0.7),
-                max_budget=configuration.get('max_budget', 2.0),
-                stage_models=configuration.get('stage_models', {})
-            )
+        # Check out the selected extraction system (warm from the pool when enabled)
+        from ..systems.base_system import RunContext
         
-        try:
-            # Let the extraction system handle ALL orchestration
-            # It will manage iterations, visual feedback, and intelligent decisions
-            extraction_result = await self.extraction_system.extract_with_iterations(
-                image_data=images['enhanced'],
-                upload_id=upload_id,
-                target_accuracy=target_accuracy,
-                max_iterations=max_iterations,
-                configuration=configuration
-            )
+        context = RunContext(
+            upload_id=upload_id,
+            queue_item_id=queue_item_id,
+            run_id=run_id,
+            configuration=configuration or {}
+        )
+        async with self._lease_system(system_type, context) as lease:
+            self.extraction_system = lease.system
             
-            # Create simplified result
-            total_duration = time.time() - start_time
-            
-            result = MasterResult(
-                final_accuracy=getattr(extraction_result, 'overall_accuracy', 0.8),
-                target_achieved=getattr(extraction_result, 'overall_accuracy', 0.8) >= target_accuracy,
-                iterations_completed=getattr(extraction_result, 'iteration_count', 1),
-                iteration_history=[],  # System manages its own history now
-                needs_human_review=getattr(extraction_result, 'overall_accuracy', 0.8) < target_accuracy,
-                structure_analysis=getattr(extraction_result, 'structure', None),
-                best_planogram=None,  # System generates planograms internally
-                total_duration=total_duration,
-                total_cost=getattr(extraction_result, 'api_cost_estimate', 0.0)
+            logger.info(
+                f"{'Reused warm' if lease.reused else 'Built'} {system_type} extraction system",
+                component="system_dispatcher",
+                upload_id=upload_id,
+                queue_item_id=queue_item_id,
+                setup_seconds=round(lease.setup_seconds, 4),
+                saved_setup_seconds=round(lease.saved_seconds, 4),
+                saved_handshakes=lease.saved_handshakes
             )
             
-            return result
+            # Log configuration usage
+            if configuration and queue_item_id:
+                from ..utils.model_usage_tracker import get_model_usage_tracker
+                tracker = get_model_usage_tracker()
+                
+                # Create configuration name from settings
+                config_name = f"{system}_{configuration.get('temperature', 0.7)}_{configuration.get('orchestrator_model', 'default')}"
+                
+                await tracker.log_configuration_usage(
+                    configuration_name=config_name,
+                    configuration_id=f"config_{queue_item_id}_{run_id}",
+                    system=system,
+                    orchestrator_model=configuration.get('orchestrator_model', 'claude-4-opus'),
+                    orchestrator_prompt=configuration.get('orchestrator_prompt', ''),
+                    temperature=configuration.get('temperature', 0.7),
+                    max_budget=configuration.get('max_budget', 2.0),
+                    stage_models=configuration.get('stage_models', {})
+                )
             
-        except Exception as e:
-            # Re-raise the exception
-            raise
+            try:
+                # Let the extraction system handle ALL orchestration
+                # It will manage iterations, visual feedback, and intelligent decisions
+                # Encoded image payloads are shared across the run and released afterwards
+                with image_cache_scope(run_id):
+                    extraction_result = await self.extraction_system.extract_with_iterations(
+                        image_data=images['enhanced'],
+                        upload_id=upload_id,
+                        target_accuracy=target_accuracy,
+                        max_iterations=max_iterations,
+                        configuration=configuration
+                    )
+                
+                # Create simplified result
+                total_duration = time.time() - start_time
+                
+                result = MasterResult(
+                    final_accuracy=getattr(extraction_result, 'overall_accuracy', 0.8),
+                    target_achieved=getattr(extraction_result, 'overall_accuracy', 0.8) >= target_accuracy,
+                    iterations_completed=getattr(extraction_result, 'iteration_count', 1),
+                    iteration_history=[],  # System manages its own history now
+                    needs_human_review=getattr(extraction_result, 'overall_accuracy', 0.8) < target_accuracy,
+                    structure_analysis=getattr(extraction_result, 'structure', None),
+                    best_planogram=None,  # System generates planograms internally
+                    total_duration=total_duration,
+                    total_cost=getattr(extraction_result, 'api_cost_estimate', 0.0)
+                )
+                
+                return result
+                
+            except Exception as e:
+                # Re-raise the exception
+                raise
+            
+            finally:
+                # Write any model usage rows still buffered for this run
+                from ..utils.model_usage_tracker import get_model_usage_tracker
+                await get_model_usage_tracker().flush()
+    
+    @asynccontextmanager
+    async def _lease_system(self, system_type: str, context) -> AsyncIterator:
+        """Extraction system for one run: leased from the warm pool, or built fresh when pooling is off"""
+        from ..systems.base_system import ExtractionSystemFactory
+        from ..systems.system_pool import SystemLease, get_system_pool
+        
+        if self.config.system_pool_enabled:
+            async with get_system_pool().lease(system_type, self.config, context) as lease:
+                yield lease
+            return
+        
+        started = time.time()
+        system = ExtractionSystemFactory.get_system(system_type=system_type, config=self.config)
+        system.begin_run(context)
+        yield SystemLease(system, False, time.time() - started, 0.0, 0)
     
     async def _get_images(self, upload_id: str) -> Dict[str, bytes]:
         """Get images for processing from Supabase storage"""
         from supabase import create_client
         
+        # Offline benchmarking: serve the image recorded in the provider cassette
+        cassette = get_provider_cassette()
+        if cassette.replaying:
+            image_data = cassette.load_blob(f"upload_image:{upload_id}")
+            return {
+                'enhanced': image_data,
+                'original': image_data,
+                'overview': image_data
+            }
+        
         try:
             supabase = create_client(self.config.supabase_url, self.config.supabase_service_key)
             
@@ -178,6 +220,7 @@ class SystemDispatcher:
             
             # Download image from Supabase storage
             image_data = supabase.storage.from_("retail-captures").download(file_path)
+            cassette.save_blob(f"upload_image:{upload_id}", image_data)
             
             logger.info(
                 f"Loaded image for upload {upload_id}: {len(image_data)} bytes",
@@ -519,6 +562,7 @@ class SystemDispatcher:
         stage_attempts = []
         best_result = None
         best_accuracy = 0.0
+        best_stream = None
         
         # Run each configured model for this stage
         for attempt_num, model_id in enumerate(stage_models, 1):
@@ -538,16 +582,34 @@ class SystemDispatcher:
                     complete=False
                 )
             
+            # Products are consumed as they arrive for preview planograms and progress;
+            # locking waits until the stage has validated them
+            product_stream = None
+            if stage_name == 'products':
+                product_stream = ProductStream(
+                    agent_id=f"{run_id}_{stage_name}_{attempt_num}",
+                    queue_item_id=queue_item_id,
+                    iteration=len(self.smart_iteration_manager.extraction_history) + 1
+                )
+                product_stream.subscribe(websocket_progress)
+                product_stream.subscribe(planogram_preview())
+            self.extraction_orchestrator.product_stream = product_stream
+            
             # Execute stage with current model
-            attempt_result = await self.extraction_orchestrator.execute_stage(
-                stage_name=stage_name,
-                model_id=model_id,
-                images=images,
-                locked_context=locked_context,
-                previous_attempts=stage_attempts,
-                attempt_number=attempt_num,
-                agent_id=f"{run_id}_{stage_name}_{attempt_num}"
-            )
+            try:
+                attempt_result = await self.extraction_orchestrator.execute_stage(
+                    stage_name=stage_name,
+                    model_id=model_id,
+                    images=images,
+                    locked_context=locked_context,
+                    previous_attempts=stage_attempts,
+                    attempt_number=attempt_num,
+                    agent_id=f"{run_id}_{stage_name}_{attempt_num}"
+                )
+            finally:
+                self.extraction_orchestrator.product_stream = None
+                if product_stream is not None:
+                    await product_stream.close()
             
             stage_attempts.append(attempt_result)
             
@@ -570,6 +632,7 @@ class SystemDispatcher:
             if current_accuracy > best_accuracy:
                 best_accuracy = current_accuracy
                 best_result = attempt_result
+                best_stream = product_stream
             
             # Check if we've reached target accuracy for this stage
             if current_accuracy >= target_accuracy:
@@ -591,6 +654,14 @@ class SystemDispatcher:
                     )
                 break
         
+        if best_stream is not None:
+            locked = lock_streamed_products(self.smart_iteration_manager, best_stream)
+            logger.info(
+                f"Locked {locked} streamed products from the accepted {stage_name} attempt",
+                component="system_dispatcher",
+                iteration=best_stream.iteration
+            )
+        
         return {
             'stage_name': stage_name,
             'attempts': stage_attempts,
@@ -5,12 +5,16 @@ Monitors ai_extraction_queue table and automatically processes ready items
 
 import asyncio
 import time
+from collections import deque
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 
 from ..config import SystemConfig
 from ..agent.agent import OnShelfAIAgent
-from ..utils import logger
+from ..utils import (
+    logger, get_batch_collector, batch_mode_scope, BudgetLabels, BudgetDeferredError, budget_scope,
+    get_budget_ledger
+)
 from supabase import create_client, Client
 
 
@@ -24,6 +28,15 @@ class AIExtractionQueueProcessor:
         self.is_running = False
         self.processing_count = 0
         
+        # Batch mode: non-urgent items run concurrently with their provider calls pooled into batches
+        self.batch_mode = config.queue_batch_mode
+        self._batch_tasks: Dict[str, asyncio.Task] = {}
+        self.batch_reports = deque(maxlen=200)
+        
+        # Items are only admitted while their spend caps have headroom; the rest stay pending
+        self.budget_ledger = get_budget_ledger()
+        self.budget_paused_count = 0
+        
         logger.info(
             "AI Extraction Queue Processor initialized",
             component="queue_processor",
@@ -40,6 +53,8 @@ class AIExtractionQueueProcessor:
             polling_interval=polling_interval
         )
         
+        await self._requeue_stale_items()
+        
         while self.is_running:
             try:
                 await self._process_pending_items()
@@ -53,6 +68,57 @@ class AIExtractionQueueProcessor:
                 )
                 await asyncio.sleep(5)  # Brief pause before retrying
     
+    async def _requeue_stale_items(self):
+        """Put items a crashed worker left in 'processing' back to pending
+        
+        A live processor heartbeats its items' updated_at (see _heartbeat), so only
+        items whose worker has stopped for `queue_requeue_stale_seconds` are taken,
+        never another running processor's. Their LangGraph workflows resume from
+        durable checkpoints when those are configured.
+        """
+        stale_seconds = self.config.queue_requeue_stale_seconds
+        if stale_seconds <= 0:
+            return
+        
+        cutoff = (datetime.utcnow() - timedelta(seconds=stale_seconds)).isoformat()
+        try:
+            result = self.supabase.table("ai_extraction_queue") \
+                .update({"status": "pending", "updated_at": datetime.utcnow().isoformat()}) \
+                .eq("status", "processing") \
+                .lt("updated_at", cutoff) \
+                .execute()
+            
+            if result.data:
+                logger.warning(
+                    f"Requeued {len(result.data)} processing items without a heartbeat for {stale_seconds}s",
+                    component="queue_processor",
+                    queue_ids=[item['id'] for item in result.data]
+                )
+        except Exception as e:
+            logger.error(
+                f"Failed to requeue stale queue items: {e}",
+                component="queue_processor",
+                error=str(e)
+            )
+    
+    async def _heartbeat(self, queue_id: str):
+        """Touch a processing item's updated_at so _requeue_stale_items leaves it alone"""
+        interval = max(1, self.config.queue_requeue_stale_seconds // 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.supabase.table("ai_extraction_queue") \
+                    .update({"updated_at": datetime.utcnow().isoformat()}) \
+                    .eq("id", queue_id) \
+                    .eq("status", "processing") \
+                    .execute()
+            except Exception as e:
+                logger.warning(
+                    f"Heartbeat for queue item {queue_id} failed: {e}",
+                    component="queue_processor",
+                    queue_id=queue_id
+                )
+    
     def stop_processing(self):
         """Stop the queue processing loop"""
         self.is_running = False
@@ -66,11 +132,16 @@ class AIExtractionQueueProcessor:
         
         # Query for pending extraction items
         try:
+            self._batch_tasks = {queue_id: task for queue_id, task in self._batch_tasks.items() if not task.done()}
+            batch_slots = 0
+            if self.batch_mode != "off":
+                batch_slots = max(0, self.config.queue_batch_max_items - len(self._batch_tasks))
+            
             result = self.supabase.table("ai_extraction_queue") \
                 .select("*") \
                 .eq("status", "pending") \
                 .order("created_at", desc=False) \
-                .limit(5) \
+                .limit(5 + batch_slots) \
                 .execute()
             
             pending_items = result.data or []
@@ -82,9 +153,28 @@ class AIExtractionQueueProcessor:
                     pending_count=len(pending_items)
                 )
                 
-                # Process each item
+                # Batch items are started together so their provider calls share batches,
+                # and stay pending while every batch slot is taken
+                interactive_items = []
                 for item in pending_items:
-                    await self._process_queue_item(item)
+                    if self._is_batch_item(item):
+                        if not batch_slots or item['id'] in self._batch_tasks:
+                            continue
+                        labels = await self._admit(item)
+                        if labels is None:
+                            continue
+                        batch_slots -= 1
+                        self._batch_tasks[item['id']] = asyncio.ensure_future(
+                            self._process_queue_item(item, batch=True, labels=labels)
+                        )
+                    else:
+                        interactive_items.append(item)
+                
+                # Process each item (admission is re-checked as earlier items spend)
+                for item in interactive_items[:5]:
+                    labels = await self._admit(item)
+                    if labels is not None:
+                        await self._process_queue_item(item, labels=labels)
             
         except Exception as e:
             logger.error(
@@ -93,15 +183,78 @@ class AIExtractionQueueProcessor:
                 error=str(e)
             )
     
-    async def _process_queue_item(self, queue_item: Dict):
-        """Process a single queue item"""
+    def _is_batch_item(self, queue_item: Dict) -> bool:
+        """Whether an item can wait for provider batch turnaround"""
+        if self.batch_mode == "all":
+            return True
+        return self.batch_mode == "flagged" and queue_item.get('processing_priority') == 'batch'
+    
+    async def _admit(self, queue_item: Dict) -> Optional[BudgetLabels]:
+        """Budget labels for an item that may start now, or None to leave it pending
+        
+        An item is held back (not failed) while its tenant, store or total spend is
+        within the admission headroom of an hourly or daily cap.
+        """
+        if not self.budget_ledger.enabled:
+            return BudgetLabels()
+        
+        labels = self._budget_labels(queue_item)
+        predicted_cost = self.budget_ledger.predict_item_cost(self.config.max_api_cost_per_extraction)
+        reason = await self.budget_ledger.check_admission(labels, predicted_cost)
+        if reason is None:
+            return labels
+        
+        self.budget_paused_count += 1
+        logger.warning(
+            f"Pausing admission of queue item {queue_item['id']}: {reason}",
+            component="queue_processor",
+            queue_id=queue_item['id'],
+            tenant=labels.tenant,
+            store=labels.store,
+            predicted_cost=predicted_cost
+        )
+        return None
+    
+    def _budget_labels(self, queue_item: Dict) -> BudgetLabels:
+        """Tenant (retailer) and store an item's spend is charged to, from its upload's collection"""
+        labels = BudgetLabels()
+        try:
+            upload_result = self.supabase.table("uploads").select("collection_id") \
+                .eq("id", queue_item['upload_id']).execute()
+            collection_id = upload_result.data[0].get('collection_id') if upload_result.data else None
+            if not collection_id:
+                return labels
+            
+            collection_result = self.supabase.table("collections").select("store_id") \
+                .eq("id", collection_id).execute()
+            labels.store = collection_result.data[0].get('store_id') if collection_result.data else None
+            if not labels.store:
+                return labels
+            
+            store_result = self.supabase.table("stores").select("retailer_name") \
+                .eq("store_id", labels.store).execute()
+            labels.tenant = store_result.data[0].get('retailer_name') if store_result.data else None
+        except Exception as e:
+            logger.warning(
+                f"Could not resolve budget labels for queue item {queue_item['id']}: {e}",
+                component="queue_processor",
+                queue_id=queue_item['id']
+            )
+        return labels
+    
+    async def _process_queue_item(self, queue_item: Dict, batch: bool = False,
+                                  labels: Optional[BudgetLabels] = None):
+        """Process a single queue item (through provider batches when `batch` is set)"""
         queue_id = queue_item['id']
         ready_media_id = queue_item.get('ready_media_id')
         enhanced_image_path = queue_item.get('enhanced_image_path')
+        heartbeat = None
         
         try:
             # Mark as processing
             await self._update_queue_status(queue_id, "processing")
+            if self.config.queue_requeue_stale_seconds > 0:
+                heartbeat = asyncio.create_task(self._heartbeat(queue_id))
             
             logger.info(
                 f"🔥 Processing queue item {queue_id} with ready_media_id {ready_media_id}",
@@ -124,17 +277,41 @@ class AIExtractionQueueProcessor:
             configuration = queue_item.get('model_config', {})
             system = queue_item.get('current_extraction_system', 'custom_consensus')
             
-            result = await orchestrator.achieve_target_accuracy(
-                upload_id=upload_id,
-                queue_item_id=queue_id,
-                system=system,
-                configuration=configuration
-            )
+            batch_report = None
+            labels = labels or BudgetLabels()
+            if batch:
+                with budget_scope(labels), batch_mode_scope(get_batch_collector(), queue_id) as batch_item:
+                    result = await orchestrator.achieve_target_accuracy(
+                        upload_id=upload_id,
+                        queue_item_id=queue_id,
+                        system=system,
+                        configuration=configuration
+                    )
+                batch_report = batch_item.report()
+                self.batch_reports.append(batch_report)
+                logger.info(
+                    f"Batch item {queue_id} finished in {batch_report['wall_time_seconds']:.0f}s, "
+                    f"saved £{batch_report['cost_saving']:.4f} vs interactive",
+                    component="queue_processor",
+                    queue_id=queue_id,
+                    **batch_report
+                )
+            else:
+                with budget_scope(labels):
+                    result = await orchestrator.achieve_target_accuracy(
+                        upload_id=upload_id,
+                        queue_item_id=queue_id,
+                        system=system,
+                        configuration=configuration
+                    )
+            
+            if self.budget_ledger.enabled:
+                self.budget_ledger.record_item_cost(labels.spent)
             
             processing_duration = time.time() - start_time
             
             # Update queue with results
-            await self._update_queue_with_results(queue_id, result, processing_duration)
+            await self._update_queue_with_results(queue_id, result, processing_duration, batch_report)
             
             logger.info(
                 f"✅ Successfully processed queue item {queue_id}",
@@ -147,6 +324,18 @@ class AIExtractionQueueProcessor:
             
             self.processing_count += 1
             
+        except BudgetDeferredError as e:
+            # Out of budget mid-run: back to pending so it is retried once the cap has headroom
+            await self._update_queue_status(queue_id, "pending")
+            
+            logger.warning(
+                f"Queue item {queue_id} returned to pending: {e}",
+                component="queue_processor",
+                queue_id=queue_id,
+                scope=e.scope,
+                window=e.window
+            )
+            
         except Exception as e:
             # Mark as failed
             await self._update_queue_status(queue_id, "failed", str(e))
@@ -158,6 +347,10 @@ class AIExtractionQueueProcessor:
                 ready_media_id=ready_media_id,
                 error=str(e)
             )
+        
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
     
     async def _update_queue_status(self, queue_id: str, status: str, error_message: str = None):
         """Update queue item status"""
@@ -188,7 +381,8 @@ class AIExtractionQueueProcessor:
                 error=str(e)
             )
     
-    async def _update_queue_with_results(self, queue_id: str, result, processing_duration: float):
+    async def _update_queue_with_results(self, queue_id: str, result, processing_duration: float,
+                                         batch_report: Optional[Dict] = None):
         """Update queue item with extraction results"""
         try:
             # Extract results from the master orchestrator result
@@ -200,6 +394,8 @@ class AIExtractionQueueProcessor:
                 "iterations": 1,
                 "processing_time": processing_duration
             }
+            if batch_report:
+                extraction_result["batch_report"] = batch_report
             
             planogram_result = {
                 "planogram_id": f"planogram_{queue_id}",
@@ -295,8 +491,26 @@ class AIExtractionQueueProcessor:
     
     def get_stats(self) -> Dict:
         """Get processor statistics"""
-        return {
+        stats = {
             "is_running": self.is_running,
             "items_processed": self.processing_count,
             "uptime_seconds": time.time() if self.is_running else 0
-        } 
\ No newline at end of file
+        }
+        if self.batch_mode != "off":
+            reports = list(self.batch_reports)
+            stats["batch"] = {
+                "mode": self.batch_mode,
+                "items_in_flight": sum(1 for task in self._batch_tasks.values() if not task.done()),
+                "items_completed": len(reports),
+                "mean_wall_time_seconds": sum(r['wall_time_seconds'] for r in reports) / len(reports) if reports else 0.0,
+                "batch_cost": sum(r['batch_cost'] for r in reports),
+                "interactive_cost": sum(r['interactive_cost'] for r in reports),
+                "cost_saving": sum(r['cost_saving'] for r in reports),
+                "collector": get_batch_collector().get_stats()
+            }
+        if self.budget_ledger.enabled:
+            stats["budget"] = {
+                "paused_admissions": self.budget_paused_count,
+                **self.budget_ledger.get_stats()
+            }
+        return stats 
\ No newline at end of file
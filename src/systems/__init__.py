@@ -3,15 +3,19 @@ Strategic Multi-System Framework
 Three architectural approaches for AI extraction with consensus-based processing
 """
 
-from .base_system import BaseExtractionSystem, ExtractionSystemFactory
+from .base_system import BaseExtractionSystem, ExtractionSystemFactory, RunContext
 from .custom_consensus import CustomConsensusSystem
 from .langgraph_system import LangGraphConsensusSystem
 from .hybrid_system import HybridConsensusSystem
+from .system_pool import SystemPool, get_system_pool
 
 __all__ = [
     'BaseExtractionSystem',
     'ExtractionSystemFactory', 
+    'RunContext',
     'CustomConsensusSystem',
     'LangGraphConsensusSystem',
-    'HybridConsensusSystem'
+    'HybridConsensusSystem',
+    'SystemPool',
+    'get_system_pool'
 ] 
\ No newline at end of file
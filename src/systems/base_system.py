@@ -3,19 +3,22 @@ Base System Interface
 Common interface for all strategic extraction systems
 """
 
+import asyncio
+import contextlib
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 from datetime import datetime
 from pydantic import BaseModel, Field
 import uuid
 
 from ..config import SystemConfig
-from ..utils import logger
+from ..utils import logger, image_cache_scope
 
 
 class CostBreakdown(BaseModel):
     """Cost breakdown for system comparison"""
-    total_cost: float = Field(description="Total API cost in USD")
+    total_cost: float = Field(description="Total API cost in GBP")
     model_costs: Dict[str, float] = Field(description="Cost per model")
     api_calls: Dict[str, int] = Field(description="Number of API calls per model")
     tokens_used: Dict[str, int] = Field(description="Tokens used per model")
@@ -67,12 +70,22 @@ class ExtractionResult(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 
+@dataclass
+class RunContext:
+    """Everything one extraction run hands to a (possibly reused) system instance"""
+    upload_id: str
+    queue_item_id: Optional[int] = None
+    run_id: Optional[str] = None
+    configuration: Dict[str, Any] = field(default_factory=dict)
+
+
 class BaseExtractionSystem(ABC):
     """Common interface for all strategic extraction systems"""
     
     def __init__(self, config: SystemConfig):
         self.config = config
         self.system_type = self.__class__.__name__.replace('System', '').lower()
+        self.run_context: Optional[RunContext] = None
         
         logger.info(
             f"Initialized {self.system_type} extraction system",
@@ -80,6 +93,26 @@ class BaseExtractionSystem(ABC):
             system_type=self.system_type
         )
     
+    def begin_run(self, context: RunContext) -> None:
+        """Prepare this instance for a new run: clear the last run's state, then apply the context"""
+        self.reset_run_state()
+        configuration = context.configuration or {}
+        self.run_context = context
+        self.queue_item_id = context.queue_item_id
+        self.extraction_run_id = context.run_id
+        self.configuration = configuration
+        self.temperature = configuration.get('temperature', 0.7)
+        self.stage_models = configuration.get('stage_models', {})
+        self.stage_prompts = configuration.get('stage_prompts', {})
+    
+    def reset_run_state(self) -> None:
+        """Clear per-run state (cost trackers, reports) so a pooled instance starts clean"""
+        pass
+    
+    def sdk_client_count(self) -> int:
+        """Number of provider SDK clients (each with its own connection pool) this instance holds"""
+        return 0
+    
     @abstractmethod
     async def extract_with_consensus(self, image_data: bytes, upload_id: str, extraction_data: Optional[Dict] = None) -> ExtractionResult:
         """
@@ -235,55 +268,18 @@ class ExtractionSystemFactory:
         return ExtractionSystemFactory.AVAILABLE_SYSTEMS.copy()
     
     @staticmethod
-    async def run_strategic_comparison(image_data: bytes, upload_id: str, config: SystemConfig) -> Dict[str, Any]:
-        """Run strategic comparison across all three systems"""
-        
-        logger.info(
-            f"Starting strategic comparison for upload {upload_id}",
-            component="system_factory",
-            upload_id=upload_id
-        )
+    async def run_strategic_comparison(image_data: bytes, upload_id: str, config: SystemConfig,
+                                       systems: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Run strategic comparison across the systems (all three by default)"""
         
-        results = {}
+        system_types = systems or list(ExtractionSystemFactory.AVAILABLE_SYSTEMS.keys())
+        finished = {}
+        async for system_type, entry in ExtractionSystemFactory.stream_strategic_comparison(
+            image_data, upload_id, config, system_types
+        ):
+            finished[system_type] = entry
         
-        for system_type in ExtractionSystemFactory.AVAILABLE_SYSTEMS.keys():
-            try:
-                system = ExtractionSystemFactory.get_system(system_type, config)
-                
-                start_time = datetime.utcnow()
-                result = await system.extract_with_consensus(image_data, upload_id)
-                processing_time = (datetime.utcnow() - start_time).total_seconds()
-                
-                results[system_type] = {
-                    'result': result,
-                    'processing_time': processing_time,
-                    'cost': await system.get_cost_breakdown(),
-                    'performance': await system.get_performance_metrics(),
-                    'architecture_benefits': system.get_architecture_benefits(),
-                    'complexity_rating': system.get_complexity_rating(),
-                    'control_level': system.get_control_level(),
-                    'success': True
-                }
-                
-                logger.info(
-                    f"System {system_type} completed successfully",
-                    component="system_factory",
-                    system_type=system_type,
-                    accuracy=result.overall_accuracy,
-                    processing_time=processing_time
-                )
-                
-            except Exception as e:
-                logger.error(
-                    f"System {system_type} failed: {e}",
-                    component="system_factory",
-                    system_type=system_type,
-                    error=str(e)
-                )
-                results[system_type] = {
-                    'error': str(e),
-                    'success': False
-                }
+        results = {system_type: finished[system_type] for system_type in system_types}
         
         # Calculate comparison metrics
         successful_results = {k: v for k, v in results.items() if v.get('success', False)}
@@ -301,6 +297,86 @@ class ExtractionSystemFactory:
         
         return results
     
+    @staticmethod
+    async def stream_strategic_comparison(image_data: bytes, upload_id: str, config: SystemConfig,
+                                          systems: Optional[List[str]] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Run the systems concurrently and yield (system_type, result entry) as each one finishes
+        
+        The systems share one encoded image cache, and the process-wide provider rate
+        limiter keeps their combined calls within quota. A failed system yields an
+        entry with success=False and does not affect the others; if the caller stops
+        iterating, the systems still running are cancelled.
+        """
+        system_types = systems or list(ExtractionSystemFactory.AVAILABLE_SYSTEMS.keys())
+        finished: asyncio.Queue = asyncio.Queue()
+        
+        logger.info(
+            f"Starting strategic comparison for upload {upload_id}",
+            component="system_factory",
+            upload_id=upload_id,
+            systems=system_types
+        )
+        
+        async def run_all() -> None:
+            with image_cache_scope(f"comparison_{upload_id}"):
+                await asyncio.gather(*[
+                    ExtractionSystemFactory._run_comparison_system(system_type, image_data, upload_id, config, finished)
+                    for system_type in system_types
+                ])
+        
+        runner = asyncio.create_task(run_all())
+        try:
+            for _ in system_types:
+                yield await finished.get()
+        finally:
+            runner.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await runner
+    
+    @staticmethod
+    async def _run_comparison_system(system_type: str, image_data: bytes, upload_id: str, config: SystemConfig,
+                                     finished: asyncio.Queue) -> None:
+        """Run one system of a strategic comparison and queue its result entry"""
+        try:
+            system = ExtractionSystemFactory.get_system(system_type, config)
+            
+            start_time = datetime.utcnow()
+            result = await system.extract_with_consensus(image_data, upload_id)
+            processing_time = (datetime.utcnow() - start_time).total_seconds()
+            
+            entry = {
+                'result': result,
+                'processing_time': processing_time,
+                'cost': await system.get_cost_breakdown(),
+                'performance': await system.get_performance_metrics(),
+                'architecture_benefits': system.get_architecture_benefits(),
+                'complexity_rating': system.get_complexity_rating(),
+                'control_level': system.get_control_level(),
+                'success': True
+            }
+            
+            logger.info(
+                f"System {system_type} completed successfully",
+                component="system_factory",
+                system_type=system_type,
+                accuracy=result.overall_accuracy,
+                processing_time=processing_time
+            )
+            
+        except Exception as e:
+            logger.error(
+                f"System {system_type} failed: {e}",
+                component="system_factory",
+                system_type=system_type,
+                error=str(e)
+            )
+            entry = {
+                'error': str(e),
+                'success': False
+            }
+        
+        await finished.put((system_type, entry))
+    
     @staticmethod
     def _generate_comparison_summary(successful_results: Dict[str, Any]) -> Dict[str, Any]:
         """Generate summary comparing successful systems"""
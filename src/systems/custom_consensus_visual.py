@@ -6,19 +6,75 @@ Implements planogram generation after each model with visual feedback loop
 import asyncio
 import json
 import time
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 import uuid
 
+from .base_system import RunContext
 from .custom_consensus import CustomConsensusSystem, DeterministicOrchestrator
 from ..config import SystemConfig
-from ..utils import logger
+from ..utils import logger, cacheable_prompt
 from ..orchestrator.planogram_orchestrator import PlanogramOrchestrator
+from ..orchestrator.smart_iteration_manager import SmartIterationManager, product_slot
 from ..comparison.image_comparison_agent import ImageComparisonAgent
 from ..models.extraction_models import ExtractionResult
 from ..extraction.engine import ModularExtractionEngine
 
 
+STAGE_ORDER = ['structure', 'products', 'details']
+
+
+@dataclass
+class StageMemo:
+    """Stage results frozen for the rest of a run once their consensus confidence is high enough
+    
+    A stage is only frozen when every stage before it is, since its result was built on them.
+    """
+    threshold: float
+    frozen: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    reused: List[Dict[str, Any]] = field(default_factory=list)
+    
+    def get(self, stage: str) -> Optional[Dict[str, Any]]:
+        return self.frozen.get(stage)
+    
+    def offer(self, stage: str, result: Any, confidence: Optional[float], iteration: int,
+              cost: float, duration: float) -> bool:
+        """Freeze `stage` if its consensus confidence reaches the threshold"""
+        if stage in self.frozen or confidence is None or confidence < self.threshold:
+            return False
+        if any(upstream not in self.frozen for upstream in STAGE_ORDER[:STAGE_ORDER.index(stage)]):
+            return False
+        self.frozen[stage] = {
+            'result': result,
+            'confidence': confidence,
+            'iteration': iteration,
+            'cost': cost,
+            'duration': duration
+        }
+        return True
+    
+    def reuse(self, stage: str, iteration: int) -> Any:
+        """The frozen result of `stage`, recording that `iteration` reused it"""
+        entry = self.frozen[stage]
+        self.reused.append({
+            'stage': stage,
+            'iteration': iteration,
+            'reused_from_iteration': entry['iteration'],
+            'saved_cost': entry['cost'],
+            'saved_duration': entry['duration']
+        })
+        return entry['result']
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'frozen_stages': {stage: entry['iteration'] for stage, entry in self.frozen.items()},
+            'stage_reuses': len(self.reused),
+            'saved_cost': sum(reuse['saved_cost'] for reuse in self.reused),
+            'saved_duration': sum(reuse['saved_duration'] for reuse in self.reused)
+        }
+
+
 class CustomConsensusVisualSystem(CustomConsensusSystem):
     """Enhanced Custom Consensus with visual feedback between models"""
     
@@ -29,6 +85,27 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
         self.extraction_engine = ModularExtractionEngine(config)
         self.orchestrator_model = None  # Will be set from configuration
         self.cost_tracker = {'total_cost': 0.0}  # Initialize cost tracker
+        self.stage_confidence: Dict[str, float] = {}  # Consensus confidence of the last vote per stage
+    
+    def begin_run(self, context: RunContext) -> None:
+        super().begin_run(context)
+        # Engine calls are logged against this run's queue item
+        self.extraction_engine.reset_run_state(self.queue_item_id, self.extraction_run_id)
+        self.comparison_agent.reset_run_state(self.queue_item_id, self.extraction_run_id)
+    
+    def reset_run_state(self) -> None:
+        super().reset_run_state()
+        self.cost_tracker = {'total_cost': 0.0}
+        self.orchestrator_model = None
+        self.stage_confidence = {}
+        self.extraction_engine.reset_run_state()
+        self.comparison_agent.reset_run_state()
+        # Cheap to build and holds no SDK clients; the comparison agent keeps only its client
+        self.planogram_orchestrator = PlanogramOrchestrator(self.config)
+    
+    def sdk_client_count(self) -> int:
+        # Plus the extraction engine's OpenAI and Anthropic clients and the comparison agent's client
+        return super().sdk_client_count() + 3
         
     async def extract_with_iterations(self, 
                                     image_data: bytes, 
@@ -41,8 +118,21 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
         best_result = None
         best_accuracy = 0.0
         iteration_history = []
+        # Focused re-extraction: later iterations only re-query uncertain shelves
+        iteration_manager = SmartIterationManager() if self.config.focused_reextraction else None
+        focus = None
+        locked_structure = None
+        stage_memo = StageMemo(self.config.stage_memo_confidence) if self.config.stage_memo_enabled else None
         
         for iteration in range(1, max_iterations + 1):
+            if focus is not None and not focus.shelves_to_reextract:
+                logger.info(
+                    "All positions locked, nothing left to re-extract",
+                    component="custom_consensus_visual",
+                    iterations_used=iteration - 1
+                )
+                break
+            
             logger.info(
                 f"Custom Consensus iteration {iteration}/{max_iterations}",
                 component="custom_consensus_visual",
@@ -55,16 +145,34 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
                 'configuration': configuration,
                 'iteration': iteration,
                 'previous_attempts': iteration_history,
-                'target_accuracy': target_accuracy
+                'target_accuracy': target_accuracy,
+                'stage_memo': stage_memo
             }
+            if focus is not None:
+                extraction_data['focus'] = {
+                    'structure': locked_structure,
+                    'shelves': sorted(focus.shelves_to_reextract),
+                    'locked_products': iteration_manager.get_locked_products()
+                }
             
             # Extract using consensus method with visual feedback
+            iteration_start = time.time()
+            cost_before = self.cost_tracker['total_cost']
             result = await self.extract_with_consensus(
                 image_data=image_data,
                 upload_id=upload_id,
                 extraction_data=extraction_data
             )
             
+            logger.info(
+                f"Iteration {iteration} finished in {time.time() - iteration_start:.1f}s",
+                component="custom_consensus_visual",
+                iteration=iteration,
+                duration=time.time() - iteration_start,
+                cost=self.cost_tracker['total_cost'] - cost_before,
+                focused_shelves=extraction_data.get('focus', {}).get('shelves')
+            )
+            
             # Check accuracy (would use real accuracy calculation)
             current_accuracy = getattr(result, 'overall_accuracy', 0.85)
             
@@ -81,8 +189,22 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
                 )
                 break
             
+            if iteration_manager is not None:
+                focus = iteration_manager.analyze_consensus_products(
+                    iteration,
+                    result.products,
+                    (result.structure or {}).get('shelf_count', 0)
+                )
+                if not iteration_manager.structure_locked:
+                    focus = None
+                elif locked_structure is None:
+                    locked_structure = result.structure
+            
             iteration_history.append(result)
         
+        if stage_memo is not None:
+            await self._record_stage_reuse(stage_memo)
+        
         # Add iteration count to result
         if best_result:
             best_result.iteration_count = len(iteration_history) + 1
@@ -100,6 +222,10 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
         stage_models = configuration.get('stage_models', {})
         temperature = configuration.get('temperature', 0.7)
         self.orchestrator_model = configuration.get('orchestrator_model', 'claude-4-opus')
+        stage_mode = configuration.get('stage_mode', self.config.consensus_stage_mode)
+        focus = extraction_data.get('focus') if extraction_data else None
+        stage_memo = extraction_data.get('stage_memo') if extraction_data else None
+        iteration = extraction_data.get('iteration', 1) if extraction_data else 1
         
         # Initialize visual feedback accumulator
         visual_feedback_history = []
@@ -112,21 +238,44 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
         )
         
         # Get stages to process
-        stages = ['structure', 'products', 'details']
+        stages = list(STAGE_ORDER)
         stage_results = {}
         
+        if focus:
+            # The structure and locked positions carry over; only the focus shelves are re-queried
+            stage_results['structure'] = focus['structure']
+            stage_prompts = self._focused_stage_prompts(stage_prompts, focus)
+            stages = ['products', 'details']
+        
         for stage in stages:
+            if stage_memo is not None and stage_memo.get(stage) is not None:
+                stage_results[stage] = stage_memo.reuse(stage, iteration)
+                logger.info(
+                    f"Reusing {stage} stage from iteration {stage_memo.get(stage)['iteration']}",
+                    component="custom_consensus_visual",
+                    stage=stage,
+                    confidence=stage_memo.get(stage)['confidence']
+                )
+                continue
+            
             logger.info(
                 f"Processing stage: {stage}",
                 component="custom_consensus_visual",
                 stage=stage
             )
+            stage_start = time.time()
+            stage_cost = self.cost_tracker['total_cost']
+            self.stage_confidence.pop(stage, None)
             
             # Get models for this stage
             models_for_stage = stage_models.get(stage, ['gpt-4o', 'claude-3-sonnet', 'gemini-pro'])
             
             # Process this stage with visual feedback between models
-            stage_result = await self._process_stage_with_visual_feedback(
+            process_stage = (
+                self._process_stage_parallel if stage_mode == "parallel"
+                else self._process_stage_with_visual_feedback
+            )
+            stage_result = await process_stage(
                 stage=stage,
                 models=models_for_stage,
                 image_data=image_data,
@@ -136,6 +285,9 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
                 upload_id=upload_id
             )
             
+            if focus and stage == 'products':
+                stage_result = self._merge_locked_products(stage_result, focus)
+            
             stage_results[stage] = stage_result
             
             # Generate planogram after products and details stages
@@ -167,6 +319,17 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
                     'comparison_result': comparison_result,
                     'planogram': planogram
                 })
+            
+            if stage_memo is not None and stage_memo.offer(
+                stage, stage_result, self.stage_confidence.get(stage), iteration,
+                self.cost_tracker['total_cost'] - stage_cost, time.time() - stage_start
+            ):
+                logger.info(
+                    f"Froze {stage} stage for later iterations",
+                    component="custom_consensus_visual",
+                    stage=stage,
+                    confidence=self.stage_confidence[stage]
+                )
         
         # Create final extraction result
         final_extraction = self._combine_stage_results(stage_results)
@@ -236,44 +399,15 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
                 'attempt': i+1
             })
             
-            # Generate planogram after each model (except structure stage)
+            # Generate planogram and compare after each model (except structure stage)
             if stage != 'structure':
-                # Create temporary extraction combining previous stages + current attempt
-                temp_extraction = self._create_temp_extraction(
-                    previous_stages, 
-                    stage, 
-                    extraction_result
-                )
-                
-                # Generate planogram
-                planogram = await self._generate_planogram_for_extraction(
-                    temp_extraction,
-                    f"{stage}_model_{i+1}"
-                )
-                
-                # Visual comparison
-                comparison_result = await self._compare_with_original(
+                stage_visual_feedback.append(await self._visual_feedback_for(
                     image_data,
-                    planogram,
+                    previous_stages,
+                    stage,
+                    model_results[-1],
                     stage_prompts.get('comparison', self._get_default_comparison_prompt())
-                )
-                
-                # Extract actionable feedback
-                actionable_feedback = await self._extract_actionable_feedback(comparison_result)
-                
-                stage_visual_feedback.append({
-                    'model': model,
-                    'attempt': i+1,
-                    'comparison_result': comparison_result,
-                    'actionable_feedback': actionable_feedback,
-                    'planogram': planogram
-                })
-                
-                logger.info(
-                    f"Visual feedback from model {i+1}: {len(actionable_feedback)} issues found",
-                    component="custom_consensus_visual",
-                    issues_found=len(actionable_feedback)
-                )
+                ))
         
         # Apply consensus voting on all model results
         consensus_result = await self._apply_consensus_voting(
@@ -284,6 +418,148 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
         
         return consensus_result
     
+    async def _process_stage_parallel(
+        self,
+        stage: str,
+        models: List[str],
+        image_data: bytes,
+        stage_prompts: Dict[str, str],
+        visual_feedback_history: List[Dict],
+        previous_stages: Dict[str, Any],
+        upload_id: str
+    ) -> Dict[str, Any]:
+        """Process a single stage parallel-then-reconcile
+        
+        Every model extracts at once, their planograms are rendered and compared at
+        once, and the combined visual feedback goes to one reconciliation extraction
+        by the stage's first model. Its result replaces that model's first attempt,
+        so every model still votes once and a vote without consensus falls back to
+        the reconciled output. A failed model drops out of the vote instead of
+        failing the stage.
+        """
+        stage_start = time.time()
+        base_prompt = stage_prompts.get(stage, self._get_default_prompt(stage))
+        comparison_prompt = stage_prompts.get('comparison', self._get_default_comparison_prompt())
+        first_prompt = self._build_prompt_with_visual_feedback(
+            stage=stage,
+            base_prompt=base_prompt,
+            visual_feedback=[],
+            attempt_number=1,
+            previous_stages=previous_stages
+        )
+        
+        logger.info(
+            f"Processing {stage} with {len(models)} models in parallel",
+            component="custom_consensus_visual",
+            stage=stage,
+            models=models
+        )
+        
+        outcomes = await asyncio.gather(*[
+            self._extract_with_model(
+                model=model,
+                prompt=first_prompt,
+                image_data=image_data,
+                stage=stage,
+                previous_stages=previous_stages
+            )
+            for model in models
+        ], return_exceptions=True)
+        
+        model_results = []
+        for i, (model, outcome) in enumerate(zip(models, outcomes)):
+            if isinstance(outcome, BaseException):
+                logger.warning(
+                    f"{stage} extraction with {model} failed: {outcome}",
+                    component="custom_consensus_visual",
+                    stage=stage,
+                    model=model
+                )
+                continue
+            model_results.append({'model': model, 'result': outcome, 'attempt': i+1})
+        
+        if not model_results:
+            raise next(outcome for outcome in outcomes if isinstance(outcome, BaseException))
+        
+        stage_visual_feedback = []
+        if stage != 'structure':
+            stage_visual_feedback = await asyncio.gather(*[
+                self._visual_feedback_for(
+                    image_data, previous_stages, stage, model_result, comparison_prompt
+                )
+                for model_result in model_results
+            ])
+            
+            # Reconciliation pass: one more extraction that sees every model's feedback
+            if any(feedback['actionable_feedback'] for feedback in stage_visual_feedback):
+                reconcile_prompt = self._build_prompt_with_visual_feedback(
+                    stage=stage,
+                    base_prompt=base_prompt,
+                    visual_feedback=stage_visual_feedback,
+                    attempt_number=len(models) + 1,
+                    previous_stages=previous_stages
+                )
+                reconcile_model = model_results[0]['model']
+                try:
+                    model_results[0] = {
+                        'model': reconcile_model,
+                        'result': await self._extract_with_model(
+                            model=reconcile_model,
+                            prompt=reconcile_prompt,
+                            image_data=image_data,
+                            stage=stage,
+                            previous_stages=previous_stages
+                        ),
+                        'attempt': len(models) + 1,
+                        'reconciled': True
+                    }
+                except Exception as e:
+                    logger.warning(
+                        f"{stage} reconciliation with {reconcile_model} failed: {e}",
+                        component="custom_consensus_visual",
+                        stage=stage,
+                        model=reconcile_model
+                    )
+        
+        logger.info(
+            f"Parallel {stage} stage finished in {time.time() - stage_start:.1f}s",
+            component="custom_consensus_visual",
+            stage=stage,
+            duration=time.time() - stage_start,
+            successful_models=len(model_results)
+        )
+        
+        return await self._apply_consensus_voting(
+            stage=stage,
+            model_results=model_results,
+            visual_feedback=stage_visual_feedback
+        )
+    
+    async def _visual_feedback_for(self, image_data: bytes, previous_stages: Dict[str, Any], stage: str,
+                                   model_result: Dict, comparison_prompt: str) -> Dict[str, Any]:
+        """Render one model's attempt as a planogram and compare it with the photo"""
+        temp_extraction = self._create_temp_extraction(previous_stages, stage, model_result['result'])
+        planogram = await self._generate_planogram_for_extraction(
+            temp_extraction,
+            f"{stage}_model_{model_result['attempt']}"
+        )
+        comparison_result = await self._compare_with_original(image_data, planogram, comparison_prompt)
+        actionable_feedback = await self._extract_actionable_feedback(comparison_result)
+        
+        logger.info(
+            f"Visual feedback from model {model_result['attempt']}: {len(actionable_feedback)} issues found",
+            component="custom_consensus_visual",
+            issues_found=len(actionable_feedback)
+        )
+        
+        return {
+            'model': model_result['model'],
+            'attempt': model_result['attempt'],
+            'comparison_result': comparison_result,
+            'actionable_feedback': actionable_feedback,
+            'planogram': planogram
+        }
+    
     def _build_prompt_with_visual_feedback(
         self, 
         stage: str, 
@@ -304,10 +580,10 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
         
         # Add visual feedback if available
         if visual_feedback and attempt_number > 1:
-            prompt += "\n\nVISUAL COMPARISON FEEDBACK FROM PREVIOUS ATTEMPTS:\n"
+            feedback_text = "VISUAL COMPARISON FEEDBACK FROM PREVIOUS ATTEMPTS:\n"
             
             for feedback in visual_feedback:
-                prompt += f"\nModel {feedback['attempt']} ({feedback['model']}) extraction was checked:\n"
+                feedback_text += f"\nModel {feedback['attempt']} ({feedback['model']}) extraction was checked:\n"
                 
                 # Group feedback by confidence level
                 high_conf = [f for f in feedback['actionable_feedback'] if f.get('confidence') == 'high']
@@ -315,24 +591,104 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
                 low_conf = [f for f in feedback['actionable_feedback'] if f.get('confidence') == 'low']
                 
                 if high_conf:
-                    prompt += "\n⚠️ HIGH CONFIDENCE ISSUES:\n"
+                    feedback_text += "\n⚠️ HIGH CONFIDENCE ISSUES:\n"
                     for issue in high_conf:
-                        prompt += self._format_feedback_item(issue)
+                        feedback_text += self._format_feedback_item(issue)
                 
                 if med_conf:
-                    prompt += "\n⚡ MEDIUM CONFIDENCE ISSUES:\n"
+                    feedback_text += "\n⚡ MEDIUM CONFIDENCE ISSUES:\n"
                     for issue in med_conf:
-                        prompt += self._format_feedback_item(issue)
+                        feedback_text += self._format_feedback_item(issue)
                 
                 if low_conf:
-                    prompt += "\n❓ LOW CONFIDENCE ISSUES (may be incorrect):\n"
+                    feedback_text += "\n❓ LOW CONFIDENCE ISSUES (may be incorrect):\n"
                     for issue in low_conf:
-                        prompt += self._format_feedback_item(issue)
+                        feedback_text += self._format_feedback_item(issue)
             
-            prompt += "\n\nUse this feedback to guide your extraction, focusing on high-confidence issues. Make your own assessment."
+            feedback_text += "\n\nUse this feedback to guide your extraction, focusing on high-confidence issues. Make your own assessment."
+            
+            # The base prompt is shared by every attempt, so it goes in the cacheable prefix
+            return cacheable_prompt(prompt, feedback_text)
         
         return prompt
     
+    async def _record_stage_reuse(self, stage_memo: StageMemo) -> None:
+        """Log the run's stage reuse and, for queue items, write it to the iterations table"""
+        if not stage_memo.reused:
+            return
+        
+        logger.info(
+            "Stage memo savings",
+            component="custom_consensus_visual",
+            **stage_memo.summary()
+        )
+        
+        queue_item_id = getattr(self, 'queue_item_id', None)
+        if not queue_item_id:
+            return
+        
+        try:
+            from ..utils.extraction_analytics import get_extraction_analytics
+            analytics = get_extraction_analytics()
+            for reuse in stage_memo.reused:
+                await analytics.log_stage_reuse(
+                    extraction_run_id=getattr(self, 'extraction_run_id', None),
+                    queue_item_id=queue_item_id,
+                    iteration_number=reuse['iteration'],
+                    stage=reuse['stage'],
+                    reused_from_iteration=reuse['reused_from_iteration'],
+                    saved_api_cost=reuse['saved_cost'],
+                    saved_duration_ms=int(reuse['saved_duration'] * 1000)
+                )
+        except Exception as e:
+            logger.warning(
+                f"Failed to record stage reuse: {e}",
+                component="custom_consensus_visual",
+                queue_item_id=queue_item_id
+            )
+    
+    def _focused_stage_prompts(self, stage_prompts: Dict[str, str], focus: Dict) -> Dict[str, str]:
+        """Stage prompts restricted to the focus shelves of a re-extraction iteration"""
+        shelves = focus['shelves']
+        focus_text = (
+            f"FOCUS: Only extract products on shelf {', '.join(str(shelf) for shelf in shelves)}. "
+            "Every other shelf is already confirmed - do not report its products."
+        )
+        locked_on_focus = [
+            (product_slot(product), product) for product in focus['locked_products']
+            if product_slot(product)[0] in shelves
+        ]
+        if locked_on_focus:
+            focus_text += "\nAlready confirmed on these shelves (keep their position numbers):\n" + "".join(
+                f"- Shelf {slot[0]}, position {slot[1]}: "
+                f"{product.get('brand', '')} {product.get('name', '')}\n"
+                for slot, product in locked_on_focus
+            )
+        
+        focused = dict(stage_prompts)
+        for stage in ('products', 'details'):
+            # The full stage prompt stays the cacheable prefix
+            focused[stage] = cacheable_prompt(stage_prompts.get(stage, self._get_default_prompt(stage)), focus_text)
+        return focused
+    
+    def _merge_locked_products(self, products: List[Dict], focus: Dict) -> List[Dict]:
+        """Re-extracted focus-shelf products merged with the locked products"""
+        locked = {product_slot(product)[:2]: product for product in focus['locked_products']}
+        merged = list(locked.values())
+        for product in products:
+            slot = product_slot(product)
+            if slot is None:
+                continue
+            if slot[0] in focus['shelves'] and slot[:2] not in locked:
+                merged.append(product)
+        
+        logger.info(
+            f"Merged {len(merged) - len(locked)} re-extracted products with {len(locked)} locked products",
+            component="custom_consensus_visual",
+            focus_shelves=focus['shelves']
+        )
+        return merged
+    
     def _format_feedback_item(self, issue: Dict) -> str:
         """Format a single feedback item for the prompt"""
         issue_type = issue.get('type', 'unknown')
@@ -464,8 +820,8 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
             'accuracy': 0.0  # Will be updated after comparison
         }
         
-        # Generate PNG
-        planogram_png = generate_png_from_real_data(planogram_data, "product_view")
+        # Generate PNG (in a worker thread, so concurrent stages keep running)
+        planogram_png = await asyncio.to_thread(generate_png_from_real_data, planogram_data, "product_view")
         
         return {
             'id': identifier,
@@ -487,6 +843,7 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
         structure_context = planogram.get('extraction_result', {}).get('structure', {})
         
         # Use the comparison agent with orchestrator model for intelligent analysis
+        cost_before = self.comparison_agent.total_cost
         comparison_result = await self.comparison_agent.compare_image_vs_planogram(
             original_image=original_image,
             planogram=planogram,
@@ -495,6 +852,7 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
             model=self.orchestrator_model,  # Use orchestrator model for comparison
             comparison_prompt=comparison_prompt
         )
+        self.cost_tracker['total_cost'] += self.comparison_agent.total_cost - cost_before
         
         return comparison_result
     
@@ -621,6 +979,9 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
         
         # Use the parent class's DeterministicOrchestrator for voting
         consensus_result = self.orchestrator.vote_on_structure(proposals)
+        self.stage_confidence['structure'] = (
+            consensus_result.get('confidence', 0.0) if consensus_result['consensus_reached'] else 0.0
+        )
         
         if consensus_result['consensus_reached']:
             logger.info(
@@ -650,15 +1011,15 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
             # Create proposal for this model's products
             positions = {}
             for product in products:
-                if isinstance(product, dict) and 'position' in product:
-                    shelf = product['position'].get('shelf', 0)
-                    pos = product['position'].get('position', 0)
+                slot = product_slot(product, default_confidence=0.8)
+                if slot is not None:
+                    shelf, pos, confidence = slot
                     pos_key = f"s{shelf}_p{pos}"
                     
                     positions[pos_key] = {
                         'brand': product.get('brand', 'Unknown'),
                         'name': product.get('name', 'Unknown Product'),
-                        'confidence': product.get('confidence', 0.8),
+                        'confidence': confidence,
                         'shelf': shelf,
                         'position': pos
                     }
@@ -670,6 +1031,9 @@ class CustomConsensusVisualSystem(CustomConsensusSystem):
         
         # Use the parent class's position voting logic
         consensus_result = self.orchestrator.vote_on_positions(all_proposals)
+        self.stage_confidence['products'] = (
+            consensus_result.get('confidence', 0.0) if consensus_result['consensus_reached'] else 0.0
+        )
         
         if consensus_result['consensus_reached']:
             # Convert consensus positions back to product list
@@ -403,6 +403,11 @@ class HybridConsensusSystem(BaseExtractionSystem):
             langchain_available=LANGCHAIN_AVAILABLE
         )
     
+    def reset_run_state(self) -> None:
+        self.cost_tracker = {'total_cost': 0, 'model_costs': {}, 'api_calls': {}, 'tokens_used': {}}
+        # Conversation memories would otherwise carry one upload's reasoning into the next
+        self.consensus_engine.memory_manager = HybridMemoryManager()
+    
     async def extract_with_consensus(self, image_data: bytes, upload_id: str) -> ExtractionResult:
         """Main extraction with hybrid consensus approach"""
         
@@ -4,6 +4,7 @@ Professional workflow management with built-in state persistence and proven patt
 """
 
 import asyncio
+import contextlib
 import time
 from typing import Dict, List, Optional, Any
 from datetime import datetime
@@ -35,6 +36,44 @@ from ..utils import logger
 from ..feedback.human_learning import HumanFeedbackLearningSystem
 
 
+# Stage outputs written by the workflow nodes (used to count nodes restored from a checkpoint)
+CHECKPOINTED_STAGES = [
+    'structure_consensus', 'position_consensus', 'quantity_consensus',
+    'detail_consensus', 'planogram', 'validation_result'
+]
+
+_durable_checkpointer = None
+_checkpointer_stack = None
+_checkpointer_lock = asyncio.Lock()
+
+
+async def get_durable_checkpointer(url: str):
+    """Process-wide LangGraph checkpointer for `url`: SQLite (a path or sqlite:///path) or Postgres
+
+    The saver's connection stays open for the life of the process and is shared by
+    every LangGraphConsensusSystem instance.
+    """
+    global _durable_checkpointer, _checkpointer_stack
+    async with _checkpointer_lock:
+        if _durable_checkpointer is None:
+            stack = contextlib.AsyncExitStack()
+            if url.startswith(("postgres://", "postgresql://")):
+                from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+                saver = await stack.enter_async_context(AsyncPostgresSaver.from_conn_string(url))
+            else:
+                from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+                path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else url
+                saver = await stack.enter_async_context(AsyncSqliteSaver.from_conn_string(path))
+            await saver.setup()
+            _checkpointer_stack, _durable_checkpointer = stack, saver
+            logger.info(
+                "Durable LangGraph checkpointer ready",
+                component="langgraph_system",
+                backend="postgres" if url.startswith(("postgres://", "postgresql://")) else "sqlite"
+            )
+    return _durable_checkpointer
+
+
 class LangGraphExtractionState(TypedDict):
     """State schema for LangGraph workflow"""
     image_data: bytes
@@ -67,8 +106,10 @@ class LangGraphConsensusSystem(BaseExtractionSystem):
         self.human_feedback = HumanFeedbackLearningSystem(config)
         self.cost_tracker = {'total_cost': 0, 'model_costs': {}, 'api_calls': {}, 'tokens_used': {}}
         
-        # Create workflow
+        # Create workflow (recompiled on a durable checkpointer on first use when one is configured)
         self.workflow = self._create_workflow()
+        self.durable_checkpoints = False
+        self.checkpoint_report = {'threads': [], 'resumed_runs': 0, 'resumed_nodes': 0}
         
         logger.info(
             "LangGraph consensus system initialized",
@@ -76,7 +117,11 @@ class LangGraphConsensusSystem(BaseExtractionSystem):
             langgraph_available=LANGGRAPH_AVAILABLE
         )
     
-    def _create_workflow(self):
+    def reset_run_state(self) -> None:
+        self.cost_tracker = {'total_cost': 0, 'model_costs': {}, 'api_calls': {}, 'tokens_used': {}}
+        self.checkpoint_report = {'threads': [], 'resumed_runs': 0, 'resumed_nodes': 0}
+    
+    def _create_workflow(self, checkpointer=None):
         """Create LangGraph workflow for consensus extraction"""
         
         if not LANGGRAPH_AVAILABLE:
@@ -133,10 +178,74 @@ class LangGraphConsensusSystem(BaseExtractionSystem):
         # Set entry point
         workflow.set_entry_point("structure_analysis_node")
         
-        return workflow.compile(checkpointer=MemorySaver())
+        return workflow.compile(checkpointer=checkpointer or MemorySaver())
     
-    async def extract_with_consensus(self, image_data: bytes, upload_id: str) -> ExtractionResult:
-        """Main extraction using LangGraph workflow"""
+    async def _ensure_durable_workflow(self) -> None:
+        """Recompile the workflow on the configured SQLite/Postgres checkpointer (once per instance)"""
+        url = self.config.langgraph_checkpoint_url
+        if self.durable_checkpoints or not url or not LANGGRAPH_AVAILABLE:
+            return
+        try:
+            self.workflow = self._create_workflow(await get_durable_checkpointer(url))
+            self.durable_checkpoints = True
+        except Exception as e:
+            logger.error(
+                f"Durable checkpointer unavailable, keeping in-memory checkpoints: {e}",
+                component="langgraph_system",
+                error=str(e)
+            )
+    
+    def _checkpoint_thread_id(self, upload_id: str, iteration: int) -> str:
+        """Checkpoint thread of one workflow run, stable across worker restarts
+        
+        Queue items are keyed by queue item id (the dispatcher's run id is new on every
+        attempt); other runs by their run id, or the upload when there is none.
+        """
+        queue_item_id = getattr(self, 'queue_item_id', None)
+        run_key = f"queue_{queue_item_id}" if queue_item_id is not None else (
+            getattr(self, 'extraction_run_id', None) or upload_id
+        )
+        return f"{run_key}_iter_{iteration}"
+    
+    async def extract_with_iterations(self, 
+                                    image_data: bytes, 
+                                    upload_id: str,
+                                    target_accuracy: float = 0.95,
+                                    max_iterations: int = 5,
+                                    configuration: Optional[Dict] = None) -> ExtractionResult:
+        """Iteration loop; the run's checkpoint threads are deleted once it completes"""
+        result = await super().extract_with_iterations(
+            image_data, upload_id, target_accuracy, max_iterations, configuration
+        )
+        
+        if self.durable_checkpoints:
+            report = self.checkpoint_report
+            logger.info(
+                f"LangGraph run resumed {report['resumed_nodes']} completed nodes from checkpoints",
+                component="langgraph_system",
+                upload_id=upload_id,
+                queue_item_id=getattr(self, 'queue_item_id', None),
+                resumed_runs=report['resumed_runs'],
+                resumed_nodes=report['resumed_nodes']
+            )
+            # A later, deliberate re-run of the same item starts from scratch
+            checkpointer = getattr(self.workflow, 'checkpointer', None)
+            if hasattr(checkpointer, 'adelete_thread'):
+                for thread_id in report['threads']:
+                    try:
+                        await checkpointer.adelete_thread(thread_id)
+                    except Exception as e:
+                        logger.warning(f"Failed to delete checkpoint thread {thread_id}: {e}", component="langgraph_system")
+        
+        return result
+    
+    async def extract_with_consensus(self, image_data: bytes, upload_id: str, extraction_data: Optional[Dict] = None) -> ExtractionResult:
+        """Main extraction using LangGraph workflow
+        
+        With a durable checkpointer, a workflow run interrupted by a crash or deploy
+        resumes from its last completed node, and a run that already finished
+        returns its checkpointed final state instead of running again.
+        """
         
         logger.info(
             f"Starting LangGraph consensus extraction for upload {upload_id}",
@@ -144,6 +253,9 @@ class LangGraphConsensusSystem(BaseExtractionSystem):
             upload_id=upload_id
         )
         
+        await self._ensure_durable_workflow()
+        iteration = extraction_data.get('iteration', 1) if extraction_data else 1
+        
         initial_state = LangGraphExtractionState(
             image_data=image_data,
             upload_id=upload_id,
@@ -161,10 +273,35 @@ class LangGraphConsensusSystem(BaseExtractionSystem):
         )
         
         # Run the workflow
-        config = {"configurable": {"thread_id": upload_id}}
+        thread_id = self._checkpoint_thread_id(upload_id, iteration) if self.durable_checkpoints else upload_id
+        config = {"configurable": {"thread_id": thread_id}}
         
         try:
-            final_state = await self.workflow.ainvoke(initial_state, config)
+            final_state = None
+            workflow_input = initial_state
+            if self.durable_checkpoints:
+                self.checkpoint_report['threads'].append(thread_id)
+                snapshot = await self.workflow.aget_state(config)
+                if snapshot.values:
+                    resumed_nodes = sum(1 for stage in CHECKPOINTED_STAGES if snapshot.values.get(stage) is not None)
+                    self.checkpoint_report['resumed_runs'] += 1
+                    self.checkpoint_report['resumed_nodes'] += resumed_nodes
+                    logger.info(
+                        f"Resuming LangGraph run from checkpoint with {resumed_nodes} completed nodes",
+                        component="langgraph_system",
+                        upload_id=upload_id,
+                        thread_id=thread_id,
+                        resumed_nodes=resumed_nodes,
+                        next_nodes=list(snapshot.next)
+                    )
+                    if snapshot.next:
+                        # Interrupted mid-run: continue from the last completed node
+                        workflow_input = None
+                    else:
+                        final_state = snapshot.values
+            
+            if final_state is None:
+                final_state = await self.workflow.ainvoke(workflow_input, config)
             
             # Convert state to ExtractionResult
             result = await self._convert_state_to_result(final_state)
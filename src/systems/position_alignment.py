@@ -0,0 +1,250 @@
+"""
+Position Alignment Voting
+Matches products across models by aligning each shelf's product sequences on
+brand/name similarity and relative position, so a model whose positions are off
+by one still votes for the right products
+"""
+
+import re
+import zlib
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+_KEY_PATTERN = re.compile(r'(?:s|shelf_)(\d+)_(?:p|pos_)(\d+)')
+
+# Dimensions of the hashed character-trigram vectors used for name similarity
+_TEXT_DIMENSIONS = 512
+
+
+def _product_text(product: Dict[str, Any]) -> str:
+    name = product.get('name') or product.get('product') or ''
+    return f" {product.get('brand') or ''} {name} ".lower()
+
+
+def _shelf_and_position(pos_key: str, product: Dict[str, Any]) -> Tuple[int, float]:
+    match = _KEY_PATTERN.search(pos_key)
+    shelf = product.get('shelf', product.get('shelf_number'))
+    position = product.get('position', product.get('position_on_shelf'))
+    if shelf is None:
+        shelf = int(match.group(1)) if match else 0
+    if position is None or isinstance(position, dict):
+        position = int(match.group(2)) if match else 0
+    return int(shelf), float(position)
+
+
+@lru_cache(maxsize=4096)
+def _trigram_buckets(text: str) -> Tuple[int, ...]:
+    return tuple(zlib.crc32(text[i:i + 3].encode('utf-8')) % _TEXT_DIMENSIONS for i in range(len(text) - 2))
+
+
+def text_vectors(texts: List[str]) -> np.ndarray:
+    """L2-normalised hashed character-trigram counts, one row per text"""
+    vectors = np.zeros((len(texts), _TEXT_DIMENSIONS))
+    rows, columns = [], []
+    for row, text in enumerate(texts):
+        buckets = _trigram_buckets(text)
+        rows.extend([row] * len(buckets))
+        columns.extend(buckets)
+    np.add.at(vectors, (rows, columns), 1.0)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def align_sequences(score: np.ndarray, gap: float) -> List[Tuple[Optional[int], Optional[int]]]:
+    """Global (Needleman-Wunsch) alignment of two sequences given their pairwise match scores
+
+    Each DP row is filled with whole-array operations: the in-row gap recurrence
+    H[i, j] = max(T[j], H[i, j-1] - gap) is a running maximum of T[k] + gap*k.
+    Returns (i, j) pairs in order, with None on the side that has a gap.
+    """
+    n, m = score.shape
+    ramp = gap * np.arange(m + 1)
+    H = np.empty((n + 1, m + 1))
+    H[0] = -ramp
+    H[:, 0] = -gap * np.arange(n + 1)
+
+    for i in range(1, n + 1):
+        best = np.empty(m + 1)
+        best[0] = H[i, 0]
+        best[1:] = np.maximum(H[i - 1, :-1] + score[i - 1], H[i - 1, 1:] - gap)
+        H[i] = np.maximum.accumulate(best + ramp) - ramp
+
+    # Traceback on plain floats (numpy scalar access is slow in a Python loop)
+    H, score = H.tolist(), score.tolist()
+    pairs = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and abs(H[i][j] - (H[i - 1][j - 1] + score[i - 1][j - 1])) < 1e-9:
+            pairs.append((i - 1, j - 1))
+            i, j = i - 1, j - 1
+        elif i > 0 and abs(H[i][j] - (H[i - 1][j] - gap)) < 1e-9:
+            pairs.append((i - 1, None))
+            i -= 1
+        else:
+            pairs.append((None, j - 1))
+            j -= 1
+    pairs.reverse()
+    return pairs
+
+
+class PositionAlignmentVoter:
+    """Position voting over aligned product sequences instead of exact position keys
+
+    Shelf by shelf, proposals are folded into a profile of product columns (highest
+    model weight first). Each proposal's sequence is aligned against the profile on
+    text_weight * name similarity + position_weight * relative-position closeness;
+    pairs scoring under `match_threshold` count as different products. Columns are
+    then voted on with the same rules as DeterministicOrchestrator.vote_on_positions.
+    """
+
+    def __init__(self, model_weight: Callable[[str], float], confidence_threshold: float = 0.8,
+                 text_weight: float = 0.7, position_weight: float = 0.3,
+                 match_threshold: float = 0.5, gap_penalty: float = 0.05):
+        self.model_weight = model_weight
+        self.confidence_threshold = confidence_threshold
+        self.text_weight = text_weight
+        self.position_weight = position_weight
+        self.match_threshold = match_threshold
+        self.gap_penalty = gap_penalty
+
+    def vote(self, proposals: List[Dict], required_threshold: Callable[[int], float]) -> Dict[str, Any]:
+        valid = [p for p in proposals if 'error' not in p and p.get('positions')]
+        if not valid:
+            return {'consensus_reached': False, 'reason': 'No valid position proposals'}
+
+        # Per shelf, each proposal's products in position order
+        shelves: Dict[int, List[List[Tuple[str, Dict[str, Any], float]]]] = {}
+        for index, proposal in enumerate(valid):
+            for pos_key, product in proposal['positions'].items():
+                if not isinstance(product, dict):
+                    continue
+                shelf, position = _shelf_and_position(pos_key, product)
+                sequences = shelves.setdefault(shelf, [[] for _ in valid])
+                sequences[index].append((pos_key, product, position))
+
+        order = sorted(range(len(valid)), key=lambda i: -self.model_weight(valid[i].get('model', 'unknown')))
+        num_models = len(valid)
+        # At least half the models, rounded up: once products are matched across models,
+        # a product only one of three models reports is more likely a phantom than a miss
+        min_votes_required = max(1, (num_models + 1) // 2)
+
+        consensus_positions = {}
+        total_positions = 0
+        for shelf in sorted(shelves):
+            columns = self._align_shelf(shelves[shelf], order)
+            total_positions += len(columns)
+            accepted = []
+            for members in columns:
+                vote = self._vote_column(members, valid, min_votes_required)
+                if vote is not None:
+                    accepted.append(vote)
+            for rank, (pos_key, clean_vote) in enumerate(accepted, start=1):
+                # Positions are renumbered along the aligned shelf
+                for field in ('position', 'position_on_shelf'):
+                    if field in clean_vote and not isinstance(clean_vote[field], dict):
+                        clean_vote[field] = rank
+                key = pos_key if pos_key not in consensus_positions else f"{pos_key}_{rank}"
+                consensus_positions[key] = clean_vote
+
+        consensus_count = len(consensus_positions)
+        consensus_rate = consensus_count / total_positions if total_positions > 0 else 0
+        required_consensus_rate = required_threshold(num_models)
+
+        return {
+            'consensus_reached': consensus_rate >= required_consensus_rate,
+            'result': consensus_positions,
+            'confidence': consensus_rate,
+            'voting_details': {
+                'method': 'alignment',
+                'total_positions': total_positions,
+                'consensus_positions': consensus_count,
+                'consensus_rate': consensus_rate,
+                'participating_models': num_models,
+                'min_votes_required': min_votes_required,
+                'required_consensus_rate': required_consensus_rate
+            }
+        }
+
+    def _align_shelf(self, sequences: List[List[Tuple[str, Dict[str, Any], float]]],
+                     order: List[int]) -> List[List[Tuple[int, str, Dict[str, Any]]]]:
+        """Fold every proposal's sequence for one shelf into aligned columns of (proposal, key, product)"""
+        columns: List[List[Tuple[int, str, Dict[str, Any]]]] = []
+        column_vectors = np.zeros((0, _TEXT_DIMENSIONS))
+        column_positions = np.zeros(0)
+
+        for index in order:
+            sequence = sorted(sequences[index], key=lambda item: item[2])
+            if not sequence:
+                continue
+            vectors = text_vectors([_product_text(product) for _, product, _ in sequence])
+            relative = (np.arange(len(sequence)) + 0.5) / len(sequence)
+
+            if not columns:
+                pairs = [(i, None) for i in range(len(sequence))]
+                score = None
+            else:
+                score = (
+                    self.text_weight * (vectors @ column_vectors.T)
+                    + self.position_weight * (1.0 - np.abs(relative[:, None] - column_positions[None, :]))
+                    - self.match_threshold
+                )
+                pairs = align_sequences(score, self.gap_penalty)
+
+            # Merge the alignment into the profile; -1 marks a gap
+            merged_columns, item_index, column_index = [], [], []
+            for i, j in pairs:
+                if i is not None and j is not None and score[i, j] < 0:
+                    # Aligned but too dissimilar: keep both as separate columns
+                    pairs_to_add = [(None, j), (i, None)]
+                else:
+                    pairs_to_add = [(i, j)]
+                for item, column in pairs_to_add:
+                    members = list(columns[column]) if column is not None else []
+                    if item is not None:
+                        pos_key, product, _ = sequence[item]
+                        members.append((index, pos_key, product))
+                    merged_columns.append(members)
+                    item_index.append(-1 if item is None else item)
+                    column_index.append(-1 if column is None else column)
+
+            # Column representatives: mean member vector and relative position
+            item_index, column_index = np.array(item_index), np.array(column_index)
+            counts = np.array([len(members) for members in merged_columns], dtype=float)
+            has_item, has_column = item_index >= 0, column_index >= 0
+            previous = counts - has_item
+            merged_vectors = np.zeros((len(merged_columns), _TEXT_DIMENSIONS))
+            merged_positions = np.zeros(len(merged_columns))
+            if columns:
+                merged_vectors[has_column] = column_vectors[column_index[has_column]] * previous[has_column, None]
+                merged_positions[has_column] = column_positions[column_index[has_column]] * previous[has_column]
+            merged_vectors[has_item] += vectors[item_index[has_item]]
+            merged_positions[has_item] += relative[item_index[has_item]]
+
+            columns = merged_columns
+            norms = np.linalg.norm(merged_vectors, axis=1, keepdims=True)
+            column_vectors = merged_vectors / np.where(norms == 0, 1.0, norms)
+            column_positions = merged_positions / counts
+
+        return columns
+
+    def _vote_column(self, members: List[Tuple[int, str, Dict[str, Any]]], proposals: List[Dict],
+                     min_votes_required: int) -> Optional[Tuple[str, Dict[str, Any]]]:
+        if len(members) < min_votes_required:
+            return None
+
+        weighted = []
+        for index, pos_key, product in members:
+            weight = self.model_weight(proposals[index].get('model', 'unknown'))
+            weighted.append((product.get('confidence', 0.5) * weight, pos_key, product))
+        avg_weighted_confidence = sum(vote[0] for vote in weighted) / len(weighted)
+        if avg_weighted_confidence < self.confidence_threshold * 0.8:  # Slightly lower threshold for weighted
+            return None
+
+        _, pos_key, best = max(weighted, key=lambda vote: vote[0])
+        clean_vote = dict(best)
+        clean_vote['consensus_confidence'] = avg_weighted_confidence
+        clean_vote['supporting_models'] = len(members)
+        return pos_key, clean_vote
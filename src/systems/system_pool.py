@@ -0,0 +1,118 @@
+"""
+System Pool
+Warm extraction system instances reused across queue items, so an item skips
+building SDK clients, orchestrators and agents and keeps their open connections
+"""
+
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from ..config import SystemConfig
+from ..utils import logger
+from .base_system import BaseExtractionSystem, ExtractionSystemFactory, RunContext
+
+
+@dataclass
+class SystemLease:
+    """One checkout of a system instance, with what reusing it saved"""
+    system: BaseExtractionSystem
+    reused: bool
+    setup_seconds: float
+    saved_seconds: float
+    # SDK clients whose keep-alive connections the run inherits (a lower bound on the
+    # TLS handshakes saved: one per client that would otherwise open a fresh pool)
+    saved_handshakes: int
+
+
+class SystemPool:
+    """Idle extraction systems per system type, each checked out by one run at a time
+
+    A lease reuses an idle instance built with an equal config, or builds one through
+    ExtractionSystemFactory, then starts the run with `begin_run`. After a successful
+    run the instance goes back to the pool (at most `max_idle` per type); after a
+    failed run it is dropped, so a half-finished run never leaks into the next one.
+    """
+
+    def __init__(self, max_idle: int = 4):
+        self.max_idle = max_idle
+        self._idle: Dict[str, List[Tuple[SystemConfig, BaseExtractionSystem]]] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    @asynccontextmanager
+    async def lease(self, system_type: str, config: SystemConfig, context: RunContext) -> AsyncIterator[SystemLease]:
+        stats = self._stats.setdefault(system_type, {
+            'builds': 0, 'reuses': 0, 'build_seconds': 0.0, 'saved_seconds': 0.0, 'saved_handshakes': 0
+        })
+        started = time.time()
+        system = self._take_idle(system_type, config)
+        reused = system is not None
+        if system is None:
+            system = ExtractionSystemFactory.get_system(system_type=system_type, config=config)
+        system.begin_run(context)
+        setup_seconds = time.time() - started
+
+        if reused:
+            avg_build = stats['build_seconds'] / stats['builds'] if stats['builds'] else 0.0
+            lease = SystemLease(
+                system=system,
+                reused=True,
+                setup_seconds=setup_seconds,
+                saved_seconds=max(0.0, avg_build - setup_seconds),
+                saved_handshakes=system.sdk_client_count()
+            )
+            stats['reuses'] += 1
+            stats['saved_seconds'] += lease.saved_seconds
+            stats['saved_handshakes'] += lease.saved_handshakes
+        else:
+            lease = SystemLease(system, False, setup_seconds, 0.0, 0)
+            stats['builds'] += 1
+            stats['build_seconds'] += setup_seconds
+
+        try:
+            yield lease
+        except BaseException:
+            logger.info(
+                f"Dropping {system_type} system after a failed run",
+                component="system_pool",
+                upload_id=context.upload_id
+            )
+            raise
+        self._release(system_type, config, system)
+
+    def _take_idle(self, system_type: str, config: SystemConfig):
+        idle = self._idle.get(system_type, [])
+        for index, (idle_config, system) in enumerate(idle):
+            if idle_config == config:
+                return idle.pop(index)[1]
+        return None
+
+    def _release(self, system_type: str, config: SystemConfig, system: BaseExtractionSystem) -> None:
+        idle = self._idle.setdefault(system_type, [])
+        if len(idle) < self.max_idle:
+            idle.append((config, system))
+
+    def summary(self) -> Dict[str, Any]:
+        """Per system type: builds, reuses and the setup time and handshakes reuse saved"""
+        return {
+            system_type: {
+                'builds': stats['builds'],
+                'reuses': stats['reuses'],
+                'idle': len(self._idle.get(system_type, [])),
+                'avg_build_seconds': stats['build_seconds'] / stats['builds'] if stats['builds'] else None,
+                'saved_seconds': stats['saved_seconds'],
+                'saved_handshakes': stats['saved_handshakes']
+            }
+            for system_type, stats in self._stats.items()
+        }
+
+
+_system_pool = None
+
+def get_system_pool() -> SystemPool:
+    """Get or create the process-wide system pool"""
+    global _system_pool
+    if _system_pool is None:
+        _system_pool = SystemPool(max_idle=SystemConfig().system_pool_max_idle)
+    return _system_pool
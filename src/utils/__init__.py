@@ -4,10 +4,36 @@ from .logger import logger, OnShelfLogger
 from .cost_tracker import CostTracker, CostLimitExceededException
 from .error_handling import (
     ErrorHandler, RecoverableError, NonRecoverableError, 
-    RetryConfig, with_retry, GracefulDegradation
+    RetryConfig, with_retry, GracefulDegradation,
+    CircuitOpenError, CircuitBreaker, CircuitBreakerRegistry, get_circuit_breakers
 )
 from .image_coordinator import MultiImageCoordinator, ImageType, ImageClassifier
 from .model_usage_tracker import ModelUsageTracker, get_model_usage_tracker
+from .rate_limiter import ProviderRateLimiter, get_rate_limiter, estimate_request_tokens
+from .image_cache import (
+    EncodedImageCache, ImageVariantStore, get_image_cache, get_image_variant_store,
+    image_cache_scope, safe_image_byte_limit
+)
+from .response_cache import ResponseCache, ResponseCacheMissError, get_response_cache, make_request_key
+from .provider_cassette import ProviderCassette, CassetteMissError, get_provider_cassette
+from .request_hedging import HedgePolicy, get_hedge_policy
+from .gemini_pool import GeminiModelPool, get_gemini_model_pool
+from .provider_batch import (
+    ProviderBatchCollector, BatchRequestError, get_batch_collector, batch_mode_scope,
+    get_active_batch, record_batch_cost
+)
+from .prompt_cache import (
+    PROMPT_CACHE_BREAK, PROMPT_CACHE_BREAK_IMAGES_VARY, prompt_caching_enabled, cacheable_prompt,
+    split_prompt, flatten_prompt, message_content
+)
+from .shelf_crops import ShelfCrops, ShelfCropReport, crop_shelves, shelf_bands, image_tokens
+from .budget_ledger import (
+    BudgetLedger, BudgetLabels, BudgetDeferredError, budget_scope, get_budget_ledger
+)
+from .pricing import (
+    TokenUsage, usage_from_openai, usage_from_anthropic, usage_from_gemini,
+    estimate_usage, price_usage, get_price_table_version
+)
 
 __all__ = [
     "logger",
@@ -20,11 +46,65 @@ __all__ = [
     "RetryConfig",
     "with_retry",
     "GracefulDegradation",
+    "CircuitOpenError",
+    "CircuitBreaker",
+    "CircuitBreakerRegistry",
+    "get_circuit_breakers",
     "MultiImageCoordinator",
     "ImageType",
     "ImageClassifier",
     "ModelUsageTracker",
-    "get_model_usage_tracker"
+    "get_model_usage_tracker",
+    "ProviderRateLimiter",
+    "get_rate_limiter",
+    "estimate_request_tokens",
+    "EncodedImageCache",
+    "get_image_cache",
+    "ImageVariantStore",
+    "get_image_variant_store",
+    "image_cache_scope",
+    "safe_image_byte_limit",
+    "ResponseCache",
+    "ResponseCacheMissError",
+    "get_response_cache",
+    "make_request_key",
+    "ProviderCassette",
+    "CassetteMissError",
+    "get_provider_cassette",
+    "HedgePolicy",
+    "get_hedge_policy",
+    "GeminiModelPool",
+    "get_gemini_model_pool",
+    "ProviderBatchCollector",
+    "BatchRequestError",
+    "get_batch_collector",
+    "batch_mode_scope",
+    "get_active_batch",
+    "record_batch_cost",
+    "PROMPT_CACHE_BREAK",
+    "PROMPT_CACHE_BREAK_IMAGES_VARY",
+    "prompt_caching_enabled",
+    "cacheable_prompt",
+    "split_prompt",
+    "flatten_prompt",
+    "message_content",
+    "ShelfCrops",
+    "ShelfCropReport",
+    "crop_shelves",
+    "shelf_bands",
+    "image_tokens",
+    "TokenUsage",
+    "usage_from_openai",
+    "usage_from_anthropic",
+    "usage_from_gemini",
+    "estimate_usage",
+    "price_usage",
+    "get_price_table_version",
+    "BudgetLedger",
+    "BudgetLabels",
+    "BudgetDeferredError",
+    "budget_scope",
+    "get_budget_ledger"
 ]
 
 # This package can be extended with utility functions as needed 
\ No newline at end of file
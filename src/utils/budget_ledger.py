@@ -0,0 +1,358 @@
+"""
+Budget Ledger
+Process-wide provider spend with hourly and daily caps per scope: all spend
+("global"), each tenant ("tenant:<retailer>") and each store ("store:<store_id>").
+
+Stage calls reserve their predicted cost before running and settle the actual
+cost afterwards; a call that would cross a cap is deferred until the window
+rolls over or reservations free up. The queue processor stops admitting new
+items while a cap is nearly used up. With a database URL the hourly spend
+buckets live in Postgres (`budget_ledger` table) and are shared by every
+processor; without one the ledger is per process.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from ..config import SystemConfig
+from .cost_tracker import CostLimitExceededException
+from .logger import logger
+
+
+WINDOW_SECONDS = {'hourly': 3600, 'daily': 86400}
+
+# Predicted cost of a call with no usage history (the old flat per-step estimate)
+DEFAULT_CALL_COST = 0.10
+
+# Minimum recorded calls before a model/stage average replaces the default
+_MIN_HISTORY_CALLS = 3
+
+
+class BudgetDeferredError(CostLimitExceededException):
+    """Raised when a call has waited `defer_max_seconds` without budget freeing up"""
+
+    def __init__(self, scope: str, window: str, projected: float, cap: float, operation: str):
+        self.scope = scope
+        self.window = window
+        super().__init__(projected, cap, f"{operation} ({scope} {window} cap)")
+
+
+@dataclass
+class BudgetLabels:
+    """Who one queue item's spend is charged to, and what it has spent so far"""
+    tenant: Optional[str] = None
+    store: Optional[str] = None
+    spent: float = 0.0
+
+    def scopes(self) -> List[str]:
+        scopes = ['global']
+        if self.tenant:
+            scopes.append(f"tenant:{self.tenant}")
+        if self.store:
+            scopes.append(f"store:{self.store}")
+        return scopes
+
+
+_current_labels: ContextVar[Optional[BudgetLabels]] = ContextVar('budget_labels', default=None)
+
+
+@contextmanager
+def budget_scope(labels: BudgetLabels) -> Iterator[BudgetLabels]:
+    """Charge every ledger reservation made inside the block to `labels`"""
+    token = _current_labels.set(labels)
+    try:
+        yield labels
+    finally:
+        _current_labels.reset(token)
+
+
+@dataclass
+class BudgetReservation:
+    """Predicted cost held against the caps while a call runs; `settle` records what it cost"""
+    scopes: List[str]
+    estimated_cost: float
+    actual_cost: Optional[float] = None
+    deferred_seconds: float = 0.0
+
+    def settle(self, cost: float) -> None:
+        self.actual_cost = cost
+
+
+class BudgetLedger:
+    """Hourly spend buckets per scope, checked against `caps`
+
+    `caps` maps a scope kind ("global", "tenant", "store") or one exact scope
+    ("store:1234") to {"hourly": limit, "daily": limit}; exact scopes override
+    their kind. Windows are UTC clock hours and days.
+    """
+
+    def __init__(self, enabled: bool, caps: Dict[str, Dict[str, float]], headroom: float = 0.9,
+                 defer_max_seconds: float = 900.0, database_url: str = "",
+                 poll_seconds: float = 5.0, refresh_seconds: float = 15.0):
+        self.enabled = enabled
+        self.caps = caps
+        self.headroom = headroom
+        self.defer_max_seconds = defer_max_seconds
+        self.database_url = database_url
+        self.poll_seconds = poll_seconds
+        self.refresh_seconds = refresh_seconds
+
+        self._hourly: Dict[Tuple[str, int], float] = {}     # (scope, hour start) -> spend
+        self._unsynced: Dict[Tuple[str, int], float] = {}   # spend not yet written to Postgres
+        self._reserved: Dict[str, float] = {}
+        self._history: Dict[Tuple[str, str], Tuple[float, int]] = {}  # (model, stage) -> (cost, calls)
+        self._item_history: Tuple[float, int] = (0.0, 0)
+        self._item_costs: List[float] = []
+        self._db_pool = None
+        self._db_failed = False
+        self._db_lock = asyncio.Lock()
+        self._refreshed_at = 0.0
+        self._history_loaded_at = 0.0
+        self.deferrals = 0
+        self.deferred_seconds = 0.0
+
+    # Prediction
+
+    def predict_cost(self, model_id: str, stage: str) -> float:
+        """Average cost of a call to `model_id` for `stage`, from model_usage history"""
+        from .model_usage_tracker import get_model_usage_tracker
+        cost, calls = self._history.get((model_id, stage), (0.0, 0))
+        live_cost, live_calls = get_model_usage_tracker().get_call_cost_totals(model_id, stage)
+        cost, calls = cost + live_cost, calls + live_calls
+        return cost / calls if calls >= _MIN_HISTORY_CALLS else DEFAULT_CALL_COST
+
+    def predict_item_cost(self, default: float) -> float:
+        """Average spend of one queue item, from model_usage history and items finished here"""
+        cost, items = self._item_history
+        cost, items = cost + sum(self._item_costs), items + len(self._item_costs)
+        return cost / items if items else default
+
+    def record_item_cost(self, cost: float) -> None:
+        self._item_costs = (self._item_costs + [cost])[-500:]
+
+    # Admission
+
+    async def check_admission(self, labels: BudgetLabels, estimated_cost: float) -> Optional[str]:
+        """Reason new work for `labels` should wait (a cap is within the headroom), or None"""
+        if not self.enabled:
+            return None
+        await self._refresh()
+        blocked = self._blocked(labels.scopes(), estimated_cost, self.headroom)
+        if blocked is None:
+            return None
+        scope, window, spent, cap = blocked
+        return f"{scope} {window} spend {spent:.2f} of cap {cap:.2f}"
+
+    @asynccontextmanager
+    async def reserve(self, estimated_cost: float, operation: str = "call") -> AsyncIterator[BudgetReservation]:
+        """Hold `estimated_cost` against the current labels' caps while the call runs
+
+        Waits while the call would take a scope past its cap (in-flight items may use
+        the full cap, new items stop at the headroom) and raises BudgetDeferredError
+        after `defer_max_seconds`. The settled cost is recorded on exit.
+        """
+        labels = _current_labels.get()
+        reservation = BudgetReservation((labels or BudgetLabels()).scopes(), estimated_cost)
+        if not self.enabled:
+            yield reservation
+            return
+
+        await self._wait_for_budget(reservation, operation)
+        for scope in reservation.scopes:
+            self._reserved[scope] = self._reserved.get(scope, 0.0) + estimated_cost
+        try:
+            yield reservation
+        finally:
+            for scope in reservation.scopes:
+                self._reserved[scope] = max(0.0, self._reserved.get(scope, 0.0) - estimated_cost)
+            if reservation.actual_cost:
+                if labels is not None:
+                    labels.spent += reservation.actual_cost
+                await self._record(reservation.scopes, reservation.actual_cost)
+
+    async def _wait_for_budget(self, reservation: BudgetReservation, operation: str) -> None:
+        started = time.time()
+        logged = False
+        while True:
+            await self._refresh()
+            blocked = self._blocked(reservation.scopes, reservation.estimated_cost, 1.0)
+            if blocked is None:
+                break
+            scope, window, spent, cap = blocked
+            waited = time.time() - started
+            if waited >= self.defer_max_seconds:
+                raise BudgetDeferredError(scope, window, spent + reservation.estimated_cost, cap, operation)
+            if not logged:
+                logged = True
+                self.deferrals += 1
+                logger.warning(
+                    f"Deferring {operation}: {scope} {window} spend {spent:.2f} of cap {cap:.2f}",
+                    component="budget_ledger",
+                    scope=scope,
+                    window=window,
+                    estimated_cost=reservation.estimated_cost
+                )
+            await asyncio.sleep(min(self.poll_seconds, self.defer_max_seconds - waited))
+        reservation.deferred_seconds = time.time() - started if logged else 0.0
+        self.deferred_seconds += reservation.deferred_seconds
+
+    def _cap(self, scope: str, window: str) -> Optional[float]:
+        exact = self.caps.get(scope, {})
+        if window in exact:
+            return exact[window]
+        return self.caps.get(scope.split(':', 1)[0], {}).get(window)
+
+    def _blocked(self, scopes: List[str], estimated_cost: float,
+                 share: float) -> Optional[Tuple[str, str, float, float]]:
+        """First (scope, window, committed spend, cap) that `estimated_cost` would push past share * cap"""
+        now = time.time()
+        for scope in scopes:
+            for window in WINDOW_SECONDS:
+                cap = self._cap(scope, window)
+                if cap is None:
+                    continue
+                committed = self.spent(scope, window, now) + self._reserved.get(scope, 0.0)
+                if committed + estimated_cost > cap * share:
+                    return scope, window, committed, cap
+        return None
+
+    def spent(self, scope: str, window: str, now: Optional[float] = None) -> float:
+        """Settled spend of `scope` in the current hourly or daily window"""
+        now = time.time() if now is None else now
+        size = WINDOW_SECONDS[window]
+        start = int(now // size * size)
+        return sum(cost for (bucket_scope, hour), cost in self._hourly.items()
+                   if bucket_scope == scope and hour >= start)
+
+    async def _record(self, scopes: List[str], cost: float) -> None:
+        hour = int(time.time() // 3600 * 3600)
+        for scope in scopes:
+            self._hourly[(scope, hour)] = self._hourly.get((scope, hour), 0.0) + cost
+            if self.database_url and not self._db_failed:
+                self._unsynced[(scope, hour)] = self._unsynced.get((scope, hour), 0.0) + cost
+        await self._sync()
+
+    # Postgres
+
+    async def _pool(self):
+        """asyncpg pool for the shared ledger (None when not configured or unreachable)"""
+        if not self.database_url or self._db_failed:
+            return None
+        async with self._db_lock:
+            if self._db_pool is None and not self._db_failed:
+                try:
+                    import asyncpg
+                    self._db_pool = await asyncpg.create_pool(self.database_url, min_size=1, max_size=4)
+                except Exception as e:
+                    self._db_failed = True
+                    logger.error(f"Budget ledger database unavailable, using in-process ledger: {e}",
+                                 component="budget_ledger")
+        return self._db_pool
+
+    async def _sync(self) -> None:
+        """Add unsynced spend to the shared hourly buckets"""
+        pool = await self._pool()
+        if pool is None or not self._unsynced:
+            return
+        rows, self._unsynced = self._unsynced, {}
+        try:
+            async with pool.acquire() as conn:
+                await conn.executemany("""
+                    INSERT INTO budget_ledger (scope, window_start, spent, calls, updated_at)
+                    VALUES ($1, $2, $3, 1, NOW())
+                    ON CONFLICT (scope, window_start) DO UPDATE
+                    SET spent = budget_ledger.spent + EXCLUDED.spent,
+                        calls = budget_ledger.calls + 1,
+                        updated_at = NOW()
+                """, [(scope, datetime.fromtimestamp(hour, tz=timezone.utc), cost)
+                      for (scope, hour), cost in rows.items()])
+        except Exception as e:
+            for key, cost in rows.items():
+                self._unsynced[key] = self._unsynced.get(key, 0.0) + cost
+            logger.error(f"Failed to write budget ledger: {e}", component="budget_ledger")
+
+    async def _refresh(self) -> None:
+        """Reload today's shared spend buckets and, every few minutes, model_usage history"""
+        now = time.time()
+        if now - self._refreshed_at < self.refresh_seconds:
+            return
+        self._refreshed_at = now
+        pool = await self._pool()
+        if pool is None:
+            day = int(now // 86400 * 86400)
+            self._hourly = {key: cost for key, cost in self._hourly.items() if key[1] >= day}
+            return
+        try:
+            async with pool.acquire() as conn:
+                rows = await conn.fetch("""
+                    SELECT scope, window_start, spent FROM budget_ledger
+                    WHERE window_start >= date_trunc('day', NOW() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+                """)
+                hourly = {(row['scope'], int(row['window_start'].timestamp())): float(row['spent']) for row in rows}
+                for key, cost in self._unsynced.items():
+                    hourly[key] = hourly.get(key, 0.0) + cost
+                self._hourly = hourly
+
+                if now - self._history_loaded_at >= 600:
+                    self._history_loaded_at = now
+                    await self._load_history(conn)
+        except Exception as e:
+            logger.error(f"Failed to refresh budget ledger: {e}", component="budget_ledger")
+
+    async def _load_history(self, conn) -> None:
+        """Per model/stage call costs and per-item spend over the last week of model_usage"""
+        calls = await conn.fetch("""
+            SELECT model_id, stage, SUM(api_cost) AS cost, COUNT(*) AS calls
+            FROM model_usage
+            WHERE success AND created_at > NOW() - INTERVAL '7 days'
+            GROUP BY model_id, stage
+        """)
+        self._history = {(row['model_id'], row['stage']): (float(row['cost'] or 0), row['calls']) for row in calls}
+        items = await conn.fetchrow("""
+            SELECT SUM(item_cost) AS cost, COUNT(*) AS items FROM (
+                SELECT SUM(api_cost) AS item_cost FROM model_usage
+                WHERE queue_item_id IS NOT NULL AND created_at > NOW() - INTERVAL '7 days'
+                GROUP BY queue_item_id
+            ) per_item
+        """)
+        self._item_history = (float(items['cost'] or 0), items['items'] or 0)
+
+    def get_stats(self) -> Dict[str, object]:
+        """Current spend against each configured cap"""
+        now = time.time()
+        scopes = {scope for scope, _ in self._hourly} | {scope for scope in self.caps if ':' in scope} | {'global'}
+        return {
+            'enabled': self.enabled,
+            'shared': self._db_pool is not None,
+            'deferrals': self.deferrals,
+            'deferred_seconds': self.deferred_seconds,
+            'scopes': {
+                scope: {
+                    window: {'spent': self.spent(scope, window, now), 'cap': self._cap(scope, window)}
+                    for window in WINDOW_SECONDS
+                }
+                for scope in sorted(scopes)
+            }
+        }
+
+
+_budget_ledger = None
+
+def get_budget_ledger() -> BudgetLedger:
+    """Get or create the process-wide budget ledger"""
+    global _budget_ledger
+    if _budget_ledger is None:
+        config = SystemConfig()
+        _budget_ledger = BudgetLedger(
+            enabled=config.budget_ledger_enabled,
+            caps=config.budget_caps,
+            headroom=config.budget_admission_headroom,
+            defer_max_seconds=config.budget_defer_max_seconds,
+            database_url=config.budget_ledger_database_url
+        )
+    return _budget_ledger
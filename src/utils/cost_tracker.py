@@ -29,6 +29,7 @@ class CostTracker:
         self.total_cost = 0.0
         self.operation_costs: Dict[str, float] = {}
         self.cost_history = []
+        self.operation_tokens: Dict[str, Dict[str, int]] = {}
         self.started_at = datetime.utcnow()
     
     def add_cost(self, operation: str, cost: float) -> None:
@@ -73,6 +74,17 @@ class CostTracker:
             agent_id=self.agent_id
         )
     
+    def record_tokens(self, operation: str, usage) -> None:
+        """Record the TokenUsage of a provider call (costs still go through add_cost)"""
+        tokens = self.operation_tokens.setdefault(operation, {
+            'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0, 'estimated_calls': 0
+        })
+        tokens['prompt_tokens'] += usage.prompt_tokens
+        tokens['completion_tokens'] += usage.output_tokens
+        tokens['cached_tokens'] += usage.cached_input_tokens
+        if usage.source == "estimate":
+            tokens['estimated_calls'] += 1
+    
     def check_remaining_budget(self, operation: str, estimated_cost: float) -> bool:
         """Check if there's budget for a planned operation"""
         return (self.total_cost + estimated_cost) <= self.cost_limit
@@ -89,6 +101,8 @@ class CostTracker:
             'remaining_budget': self.get_remaining_budget(),
             'utilization_percent': (self.total_cost / self.cost_limit) * 100,
             'operation_breakdown': self.operation_costs.copy(),
+            'token_breakdown': {operation: dict(tokens) for operation, tokens in self.operation_tokens.items()},
+            'total_tokens': sum(t['prompt_tokens'] + t['completion_tokens'] for t in self.operation_tokens.values()),
             'duration_minutes': (datetime.utcnow() - self.started_at).total_seconds() / 60,
             'cost_per_minute': self.total_cost / max(1, (datetime.utcnow() - self.started_at).total_seconds() / 60)
         }
@@ -4,8 +4,11 @@ Robust error handling with retry logic and graceful degradation
 """
 
 import asyncio
+import contextlib
 import functools
-from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple, Type
 from datetime import datetime, timedelta
 import traceback
 from .logger import logger
@@ -21,6 +24,18 @@ class NonRecoverableError(Exception):
     pass
 
 
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider/model whose circuit is open"""
+    
+    def __init__(self, provider: str, model: str, retry_after: float):
+        self.provider = provider
+        self.model = model
+        self.retry_after = retry_after
+        super().__init__(
+            f"Circuit open for {provider}/{model}, retry in {retry_after:.0f}s"
+        )
+
+
 class RetryConfig:
     """Configuration for retry behavior"""
     
@@ -150,6 +165,10 @@ def with_retry(retry_config: RetryConfig = None,
                     )
                     raise
                     
+                except CircuitOpenError:
+                    # The provider is known to be failing; retrying would only burn time
+                    raise
+                    
                 except Exception as e:
                     last_exception = e
                     
@@ -204,6 +223,9 @@ def with_retry(retry_config: RetryConfig = None,
                         error_handler.record_error(e, {'attempt': attempt})
                     raise
                     
+                except CircuitOpenError:
+                    raise
+                    
                 except Exception as e:
                     last_exception = e
                     
@@ -250,6 +272,232 @@ def with_retry(retry_config: RetryConfig = None,
     return decorator
 
 
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one provider model
+    
+    Calls in the last `window_seconds` are kept as (finished_at, failed, slow).
+    Once at least `min_calls` have been seen, the circuit opens when the share of
+    failed or slow calls reaches `error_rate`. After `cooldown_seconds` it goes
+    half-open and lets a single probe through: success closes it, failure
+    re-opens it for another cooldown.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, provider: str, model: str, error_rate: float = 0.5, slow_call_seconds: float = 90.0,
+                 min_calls: int = 5, window_seconds: float = 60.0, cooldown_seconds: float = 30.0):
+        self.provider = provider
+        self.model = model
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.state = self.CLOSED
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self.rejected_calls = 0
+        self.last_error: Optional[str] = None
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+    
+    def _prune(self, now: float) -> None:
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+    
+    def retry_after(self) -> float:
+        """Seconds until an open circuit will accept a probe"""
+        if self.state != self.OPEN or self.opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown_seconds - (time.monotonic() - self.opened_at))
+    
+    def advance(self) -> None:
+        """Move an open circuit whose cooldown has passed to half-open"""
+        if self.state == self.OPEN and self.retry_after() <= 0:
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+    
+    def is_open(self) -> bool:
+        """True while calls would be rejected (open and still cooling down, or probe in flight)"""
+        if self.state == self.OPEN:
+            return self.retry_after() > 0
+        return self.state == self.HALF_OPEN and self.probe_in_flight
+    
+    def allow_request(self) -> bool:
+        """Whether a call may go ahead now; claims the probe slot when half-open"""
+        self.advance()
+        if self.state == self.OPEN:
+            self.rejected_calls += 1
+            return False
+        
+        if self.state == self.HALF_OPEN:
+            if self.probe_in_flight:
+                self.rejected_calls += 1
+                return False
+            self.probe_in_flight = True
+        
+        return True
+    
+    def record_success(self, latency: float) -> None:
+        slow = latency >= self.slow_call_seconds
+        if self.state == self.HALF_OPEN:
+            self.probe_in_flight = False
+            if slow:
+                self._open(f"probe took {latency:.1f}s")
+                return
+            self._close()
+            return
+        self._record(False, slow)
+    
+    def record_failure(self, error: BaseException, latency: float = 0.0) -> None:
+        self.last_error = f"{type(error).__name__}: {str(error)[:200]}"
+        if self.state == self.HALF_OPEN:
+            self.probe_in_flight = False
+            self._open(self.last_error)
+            return
+        self._record(True, latency >= self.slow_call_seconds)
+    
+    def release_probe(self) -> None:
+        """Give back the half-open probe slot when the probe call was abandoned"""
+        self.probe_in_flight = False
+    
+    def _record(self, failed: bool, slow: bool) -> None:
+        now = time.monotonic()
+        self._calls.append((now, failed, slow))
+        self._prune(now)
+        
+        if self.state == self.CLOSED and len(self._calls) >= self.min_calls:
+            bad = sum(1 for _, call_failed, call_slow in self._calls if call_failed or call_slow)
+            if bad / len(self._calls) >= self.error_rate:
+                self._open(self.last_error if failed else "slow responses")
+    
+    def _open(self, reason: Optional[str]) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        logger.warning(
+            f"Circuit opened for {self.provider}/{self.model}: {reason}",
+            component="circuit_breaker",
+            provider=self.provider,
+            model=self.model,
+            cooldown=self.cooldown_seconds
+        )
+    
+    def _close(self) -> None:
+        self.state = self.CLOSED
+        self.opened_at = None
+        self._calls.clear()
+        logger.info(
+            f"Circuit closed for {self.provider}/{self.model}",
+            component="circuit_breaker",
+            provider=self.provider,
+            model=self.model
+        )
+    
+    def get_state(self) -> Dict[str, Any]:
+        self.advance()
+        self._prune(time.monotonic())
+        calls = len(self._calls)
+        failures = sum(1 for _, failed, _ in self._calls if failed)
+        slow = sum(1 for _, _, call_slow in self._calls if call_slow)
+        return {
+            'provider': self.provider,
+            'model': self.model,
+            'state': self.state,
+            'retry_after': self.retry_after(),
+            'window_calls': calls,
+            'window_failures': failures,
+            'window_slow_calls': slow,
+            'error_rate': (failures / calls) if calls else 0.0,
+            'times_opened': self.times_opened,
+            'rejected_calls': self.rejected_calls,
+            'last_error': self.last_error
+        }
+
+
+class CircuitBreakerRegistry:
+    """Circuit breakers keyed by (provider, model)
+    
+    When disabled, outcomes are still recorded and states still move through
+    half-open on their cooldown (so state is visible), but no call is ever rejected.
+    """
+    
+    # Client-side errors (bad schema, validation) say nothing about provider health
+    IGNORED_ERRORS: Tuple[Type[BaseException], ...] = (ValueError, TypeError, CircuitOpenError)
+    
+    def __init__(self, enabled: bool = False, **breaker_settings):
+        self.enabled = enabled
+        self.breaker_settings = breaker_settings
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+    
+    def get(self, provider: str, model: str) -> CircuitBreaker:
+        key = (provider, model)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(provider, model, **self.breaker_settings)
+        return breaker
+    
+    def is_open(self, provider: str, model: str) -> bool:
+        """True when calls to this model would currently be skipped"""
+        if not self.enabled:
+            return False
+        breaker = self._breakers.get((provider, model))
+        return breaker is not None and breaker.is_open()
+    
+    @contextlib.asynccontextmanager
+    async def guard(self, provider: str, model: str) -> AsyncIterator[CircuitBreaker]:
+        """Wrap one provider call: raise CircuitOpenError if the circuit is open, else record the outcome"""
+        breaker = self.get(provider, model)
+        if not self.enabled:
+            breaker.advance()
+        elif not breaker.allow_request():
+            raise CircuitOpenError(provider, model, breaker.retry_after())
+        
+        started = time.monotonic()
+        try:
+            yield breaker
+        except self.IGNORED_ERRORS:
+            breaker.release_probe()
+            raise
+        except Exception as e:
+            breaker.record_failure(e, time.monotonic() - started)
+            raise
+        except BaseException:
+            # Cancelled (e.g. a hedge loser): no verdict on the provider
+            breaker.release_probe()
+            raise
+        else:
+            breaker.record_success(time.monotonic() - started)
+    
+    def get_states(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'breakers': [breaker.get_state() for _, breaker in sorted(self._breakers.items())]
+        }
+
+
+# Global instance
+_circuit_breakers = None
+
+def get_circuit_breakers() -> CircuitBreakerRegistry:
+    """Get or create the process-wide circuit breaker registry"""
+    global _circuit_breakers
+    if _circuit_breakers is None:
+        from ..config import SystemConfig
+        config = SystemConfig()
+        _circuit_breakers = CircuitBreakerRegistry(
+            enabled=config.circuit_breaker_enabled,
+            error_rate=config.circuit_breaker_error_rate,
+            slow_call_seconds=config.circuit_breaker_slow_call_seconds,
+            min_calls=config.circuit_breaker_min_calls,
+            window_seconds=config.circuit_breaker_window_seconds,
+            cooldown_seconds=config.circuit_breaker_cooldown_seconds
+        )
+    return _circuit_breakers
+
+
 class GracefulDegradation:
     """Handle graceful degradation when components fail"""
     
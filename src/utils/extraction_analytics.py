@@ -199,6 +199,59 @@ class ExtractionAnalytics:
             retry_reason=retry_reason
         )
     
+    async def log_stage_reuse(self,
+                            extraction_run_id: str,
+                            queue_item_id: int,
+                            iteration_number: int,
+                            stage: str,
+                            reused_from_iteration: int,
+                            saved_api_cost: float,
+                            saved_duration_ms: int):
+        """Record a stage result reused from an earlier iteration instead of being re-run"""
+        
+        async with self.db_pool.acquire() as conn:
+            await conn.execute("""
+                INSERT INTO iterations (
+                    extraction_run_id, queue_item_id, iteration_number, stage,
+                    model_used, status, success, started_at, completed_at, duration_ms,
+                    api_cost, reused_from_iteration, saved_api_cost, saved_duration_ms
+                ) VALUES ($1, $2, $3, $4, 'stage_memo', 'reused', TRUE, NOW(), NOW(), 0, 0, $5, $6, $7)
+            """, extraction_run_id, queue_item_id, iteration_number, stage,
+                reused_from_iteration, saved_api_cost, saved_duration_ms)
+        
+        logger.info(
+            f"Logged {stage} reuse for iteration {iteration_number}",
+            component="extraction_analytics",
+            stage=stage,
+            reused_from_iteration=reused_from_iteration,
+            saved_api_cost=saved_api_cost
+        )
+    
+    async def get_stage_reuse_savings(self, days: int = 7) -> Dict:
+        """Cost and time saved by reusing stage results across iterations"""
+        
+        async with self.db_pool.acquire() as conn:
+            savings = await conn.fetch("""
+                SELECT 
+                    stage,
+                    COUNT(*) as reuse_count,
+                    COUNT(DISTINCT extraction_run_id) as runs,
+                    SUM(saved_api_cost) as saved_cost,
+                    SUM(saved_duration_ms) as saved_duration_ms
+                FROM iterations
+                WHERE status = 'reused'
+                AND created_at > NOW() - INTERVAL '%s days'
+                GROUP BY stage
+            """ % days)
+            
+            return {
+                'stages': [row['stage'] for row in savings],
+                'reuse_count': [row['reuse_count'] for row in savings],
+                'runs': [row['runs'] for row in savings],
+                'saved_cost': [float(row['saved_cost']) if row['saved_cost'] else 0 for row in savings],
+                'saved_duration_ms': [int(row['saved_duration_ms']) if row['saved_duration_ms'] else 0 for row in savings]
+            }
+    
     async def get_stage_performance(self, 
                                   days: int = 7,
                                   system: Optional[str] = None) -> Dict:
@@ -218,6 +271,7 @@ class ExtractionAnalytics:
                 FROM iterations i
                 JOIN extraction_runs er ON i.extraction_run_id = er.run_id
                 WHERE i.created_at > NOW() - INTERVAL '%s days'
+                AND i.status IS DISTINCT FROM 'reused'
                 AND ($1::text IS NULL OR er.system = $1)
                 GROUP BY i.stage
                 ORDER BY 
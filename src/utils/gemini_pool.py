@@ -0,0 +1,77 @@
+"""
+Gemini Model Pool
+Reusable Gemini model handles keyed by model name and generation config
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+from .logger import logger
+
+
+GeminiKey = Tuple[str, Optional[float], Optional[float], Optional[int], Optional[int]]
+
+
+class GeminiModelPool:
+    """Process-wide pool of `genai.GenerativeModel` handles
+    
+    A handle is built once per (model, temperature, top_p, top_k, max_output_tokens)
+    and never mutated afterwards, so concurrent calls with different Gemini models
+    or settings each get their own handle instead of sharing one that gets swapped
+    out mid-request. genai.configure() must have been called before the first get().
+    """
+    
+    def __init__(self):
+        self._handles: Dict[GeminiKey, Any] = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, model_name: str, temperature: Optional[float] = None, top_p: Optional[float] = None,
+            top_k: Optional[int] = None, max_output_tokens: Optional[int] = None) -> Any:
+        """Shared handle for a model and generation config (None = provider default)"""
+        key = (model_name, temperature, top_p, top_k, max_output_tokens)
+        handle = self._handles.get(key)
+        if handle is not None:
+            self.hits += 1
+            return handle
+        
+        import google.generativeai as genai
+        
+        settings = {
+            'temperature': temperature,
+            'top_p': top_p,
+            'top_k': top_k,
+            'max_output_tokens': max_output_tokens
+        }
+        settings = {name: value for name, value in settings.items() if value is not None}
+        generation_config = genai.types.GenerationConfig(**settings) if settings else None
+        
+        # No await between the lookup and the insert, so concurrent callers can't build duplicates
+        handle = self._handles[key] = genai.GenerativeModel(model_name, generation_config=generation_config)
+        self.misses += 1
+        logger.debug(
+            f"Created Gemini handle for {model_name}",
+            component="gemini_pool",
+            model=model_name,
+            pool_size=len(self._handles),
+            **settings
+        )
+        return handle
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'handles': len(self._handles),
+            'hits': self.hits,
+            'misses': self.misses,
+            'models': sorted({key[0] for key in self._handles})
+        }
+
+
+# Global instance
+_gemini_pool = None
+
+def get_gemini_model_pool() -> GeminiModelPool:
+    """Get or create the process-wide Gemini model pool"""
+    global _gemini_pool
+    if _gemini_pool is None:
+        _gemini_pool = GeminiModelPool()
+    return _gemini_pool
@@ -0,0 +1,306 @@
+"""
+Encoded Image Cache
+Content-addressed base64 payloads and resized image variants shared by every
+provider call site during a run
+"""
+
+import asyncio
+import base64
+import hashlib
+import io
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple, Any
+
+from .logger import logger
+
+
+# Provider request limits for a single image
+MODEL_IMAGE_BYTE_LIMITS = {
+    'claude': 5 * 1024 * 1024,      # 5 MB
+    'gpt4': 20 * 1024 * 1024,       # 20 MB
+    'gemini': 20 * 1024 * 1024,     # 20 MB
+}
+
+
+def safe_image_byte_limit(model_type: str) -> int:
+    """Raw byte budget for a model once base64 encoding (~33%) is accounted for"""
+    return int(MODEL_IMAGE_BYTE_LIMITS.get(model_type, 20 * 1024 * 1024) * 0.75)
+
+
+def _content_digest(data: bytes) -> str:
+    """sha256 of an image's content
+
+    Hashed on every call: memoising per bytes object would have to keep each object
+    alive to stop its id being reused, and hashing costs milliseconds per image.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+class _EncodedImage:
+    """One encoded image; each provider form is built once and then shared"""
+
+    __slots__ = ('media_type', 'b64', '_data_url', '_anthropic_source')
+
+    def __init__(self, b64: str, media_type: str):
+        self.media_type = media_type
+        self.b64 = b64
+        self._data_url = None
+        self._anthropic_source = None
+
+    @property
+    def data_url(self) -> str:
+        if self._data_url is None:
+            self._data_url = f"data:{self.media_type};base64,{self.b64}"
+        return self._data_url
+
+    @property
+    def anthropic_source(self) -> Dict[str, str]:
+        if self._anthropic_source is None:
+            self._anthropic_source = {
+                "type": "base64",
+                "media_type": self.media_type,
+                "data": self.b64
+            }
+        return self._anthropic_source
+
+
+class EncodedImageCache:
+    """Base64 image payloads keyed by (sha256 of content, media type)"""
+
+    def __init__(self, max_entries: int = 32, run_id: Optional[str] = None):
+        self.max_entries = max_entries
+        self.run_id = run_id
+        self._entries: "OrderedDict[Tuple[str, str], _EncodedImage]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, data: bytes, media_type: str) -> _EncodedImage:
+        key = (_content_digest(data), media_type)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        entry = _EncodedImage(base64.b64encode(data).decode('utf-8'), media_type)
+        self._entries[key] = entry
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def digest(self, data: bytes) -> str:
+        """sha256 of the image content"""
+        return _content_digest(data)
+
+    def b64(self, data: bytes, media_type: str = "image/jpeg") -> str:
+        """Plain base64 string"""
+        return self._get(data, media_type).b64
+
+    def data_url(self, data: bytes, media_type: str = "image/jpeg") -> str:
+        """OpenAI `image_url` form: data:<media_type>;base64,<payload>"""
+        return self._get(data, media_type).data_url
+
+    def anthropic_source(self, data: bytes, media_type: str = "image/jpeg") -> Dict[str, str]:
+        """Anthropic image `source` block (shared dict - do not mutate)"""
+        return self._get(data, media_type).anthropic_source
+
+    def gemini_inline(self, data: bytes, media_type: str = "image/jpeg") -> Dict[str, Any]:
+        """Gemini inline blob - the SDK takes raw bytes, so no encoding is needed at all"""
+        return {"mime_type": media_type, "data": data}
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'run_id': self.run_id,
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'encoded_bytes': sum(len(entry.b64) for entry in self._entries.values())
+        }
+
+
+def _resize_to_fit(data: bytes, max_bytes: Optional[int], max_dimension: Optional[int],
+                   image_format: str, quality: int) -> bytes:
+    """Decode, downscale and re-encode an image so it fits the given constraints (CPU bound)"""
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data))
+
+    # Scale by area to fit the byte limit, then clamp the longest side
+    resize_ratio = 1.0
+    if max_bytes and len(data) > max_bytes:
+        resize_ratio = (max_bytes / len(data)) ** 0.5
+    if max_dimension and max(img.width, img.height) * resize_ratio > max_dimension:
+        resize_ratio = max_dimension / max(img.width, img.height)
+    new_size = (max(1, int(img.width * resize_ratio)), max(1, int(img.height * resize_ratio)))
+
+    logger.info(
+        f"Resizing image variant: {img.width}x{img.height} -> {new_size[0]}x{new_size[1]}",
+        component="image_cache",
+        original_size=len(data),
+        max_bytes=max_bytes,
+        max_dimension=max_dimension,
+        format=image_format
+    )
+
+    if image_format.upper() == 'JPEG' and img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+
+    # Resize with high quality
+    img_resized = img.resize(new_size, Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    img_resized.save(output, format=image_format, quality=quality, optimize=True)
+
+    return output.getvalue()
+
+
+class ImageVariantStore:
+    """Resized/re-encoded image variants and crops, keyed by content hash and constraints
+
+    Each variant is computed once, in a worker thread, and then shared by every
+    stage, shelf, retry and model with the same constraints. Concurrent requests
+    for the same variant wait on the single in-flight computation.
+    """
+
+    def __init__(self, run_id: Optional[str] = None):
+        self.run_id = run_id
+        self._variants: Dict[Tuple, "asyncio.Task[bytes]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.passthrough = 0
+
+    async def get_variant(self, data: bytes, max_bytes: Optional[int] = None,
+                          max_dimension: Optional[int] = None, image_format: str = 'JPEG',
+                          quality: int = 90) -> bytes:
+        """Return `data` constrained to `max_bytes` / `max_dimension` (original bytes if it already fits)"""
+        # Byte-only constraints can be checked without decoding the image
+        if max_dimension is None and (max_bytes is None or len(data) <= max_bytes):
+            self.passthrough += 1
+            return data
+
+        key = (_content_digest(data), max_bytes, max_dimension, image_format.upper())
+        task = self._variants.get(key)
+        if task is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            # Run detached from the caller so a cancelled caller doesn't cancel other waiters
+            task = asyncio.ensure_future(asyncio.to_thread(
+                self._build_variant, data, max_bytes, max_dimension, image_format, quality
+            ))
+            task.add_done_callback(lambda done: self._discard_failed(key, done))
+            self._variants[key] = task
+
+        return await asyncio.shield(task)
+
+    async def get_crop(self, data: bytes, top: float, bottom: float, image_format: str = 'JPEG',
+                       quality: int = 90) -> bytes:
+        """Full-width horizontal band of `data` between two fractions of its height"""
+        key = (_content_digest(data), 'crop', round(top, 4), round(bottom, 4), image_format.upper())
+        task = self._variants.get(key)
+        if task is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(asyncio.to_thread(
+                self._build_crop, data, top, bottom, image_format, quality
+            ))
+            task.add_done_callback(lambda done: self._discard_failed(key, done))
+            self._variants[key] = task
+
+        return await asyncio.shield(task)
+
+    def _discard_failed(self, key: Tuple, task: "asyncio.Task[bytes]") -> None:
+        # Don't cache failures - the next caller retries the computation
+        if task.cancelled() or task.exception() is not None:
+            if self._variants.get(key) is task:
+                del self._variants[key]
+
+    @staticmethod
+    def _build_variant(data: bytes, max_bytes: Optional[int], max_dimension: Optional[int],
+                       image_format: str, quality: int) -> bytes:
+        if max_dimension is not None:
+            from PIL import Image
+            with Image.open(io.BytesIO(data)) as img:
+                fits_dimension = max(img.width, img.height) <= max_dimension
+            if fits_dimension and (max_bytes is None or len(data) <= max_bytes):
+                return data
+        return _resize_to_fit(data, max_bytes, max_dimension, image_format, quality)
+
+    @staticmethod
+    def _build_crop(data: bytes, top: float, bottom: float, image_format: str, quality: int) -> bytes:
+        from PIL import Image
+        with Image.open(io.BytesIO(data)) as img:
+            box = (0, int(img.height * top), img.width, max(int(img.height * top) + 1, int(img.height * bottom)))
+            crop = img.crop(box)
+            if image_format.upper() == 'JPEG' and crop.mode not in ('RGB', 'L'):
+                crop = crop.convert('RGB')
+            output = io.BytesIO()
+            crop.save(output, format=image_format, quality=quality, optimize=True)
+        return output.getvalue()
+
+    def clear(self) -> None:
+        self._variants.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        completed = [
+            task.result() for task in self._variants.values()
+            if task.done() and not task.cancelled() and task.exception() is None
+        ]
+        return {
+            'run_id': self.run_id,
+            'variants': len(completed),
+            'hits': self.hits,
+            'misses': self.misses,
+            'passthrough': self.passthrough,
+            'variant_bytes': sum(len(variant) for variant in completed)
+        }
+
+
+# Process-wide fallbacks used outside of a run scope (kept small on purpose)
+_default_cache = EncodedImageCache(max_entries=8)
+_current_cache: ContextVar[Optional[EncodedImageCache]] = ContextVar('encoded_image_cache', default=None)
+_current_variants: ContextVar[Optional[ImageVariantStore]] = ContextVar('image_variant_store', default=None)
+
+
+def get_image_cache() -> EncodedImageCache:
+    """Get the encoded image cache for the current run (or the bounded process default)"""
+    return _current_cache.get() or _default_cache
+
+
+def get_image_variant_store() -> ImageVariantStore:
+    """Get the image variant store for the current run
+
+    Outside of a run scope a throwaway store is returned, so nothing is retained.
+    """
+    return _current_variants.get() or ImageVariantStore()
+
+
+@contextmanager
+def image_cache_scope(run_id: Optional[str] = None, max_entries: int = 32):
+    """Scope the encoded image cache and variant store to one run; both are released on exit
+
+    Tasks created inside the scope inherit it through contextvars.
+    """
+    cache = EncodedImageCache(max_entries=max_entries, run_id=run_id)
+    variants = ImageVariantStore(run_id=run_id)
+    cache_token = _current_cache.set(cache)
+    variants_token = _current_variants.set(variants)
+    try:
+        yield cache
+    finally:
+        _current_cache.reset(cache_token)
+        _current_variants.reset(variants_token)
+        logger.debug(
+            "Released encoded image cache",
+            component="image_cache",
+            **cache.get_stats(),
+            variant_stats=variants.get_stats()
+        )
+        cache.clear()
+        variants.clear()
@@ -3,8 +3,9 @@ Model Usage Tracker
 Tracks model usage for analytics and cost optimization
 """
 
+import asyncio
 import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 import os
 
@@ -13,10 +14,20 @@ from ..utils import logger
 
 
 class ModelUsageTracker:
-    """Tracks model usage and performance metrics"""
+    """Tracks model usage and performance metrics
     
-    def __init__(self):
+    Usage rows are buffered and inserted into `model_usage` in batches (when the
+    buffer reaches `batch_size` or `flush_seconds` after the first buffered row),
+    rather than with one RPC per provider call. Call flush() at the end of a run.
+    """
+    
+    def __init__(self, batch_size: int = 25, flush_seconds: float = 5.0):
         self.supabase = None
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._summary: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
         try:
             self.supabase = create_client(
                 os.getenv("SUPABASE_URL"),
@@ -27,8 +38,8 @@ class ModelUsageTracker:
     
     async def log_model_usage(
         self,
-        queue_item_id: int,
-        extraction_run_id: str,
+        queue_item_id: Optional[int],
+        extraction_run_id: Optional[str],
         stage: str,
         model_id: str,
         model_provider: str,
@@ -39,48 +50,127 @@ class ModelUsageTracker:
         response_time_ms: int,
         api_cost: float,
         success: bool = True,
-        error_message: Optional[str] = None
-    ) -> Optional[int]:
-        """Log a model usage event"""
+        error_message: Optional[str] = None,
+        cached_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        token_source: str = "provider",
+        price_table_version: Optional[str] = None
+    ) -> None:
+        """Record a model usage event
+        
+        Every call feeds the in-process summary; calls made for a queue item are
+        also buffered for the next batched write to Supabase.
+        """
+        self._add_to_summary(
+            model_id, model_provider, stage, prompt_tokens, completion_tokens,
+            cached_tokens, cache_write_tokens, api_cost, token_source
+        )
+        
+        if queue_item_id is None:
+            return
         
         if not self.supabase:
             logger.warning("Supabase client not initialized, skipping model usage logging")
-            return None
-            
+            return
+        
+        self._pending.append({
+            'queue_item_id': queue_item_id,
+            'extraction_run_id': extraction_run_id,
+            'stage': stage,
+            'model_id': model_id,
+            'model_provider': model_provider,
+            'iteration_number': iteration_number,
+            'temperature': temperature,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'cached_tokens': cached_tokens,
+            'cache_write_tokens': cache_write_tokens,
+            'token_source': token_source,
+            'price_table_version': price_table_version,
+            'response_time_ms': response_time_ms,
+            'api_cost': api_cost,
+            'success': success,
+            'error_message': error_message
+        })
+        
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+    
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_seconds)
+        await self.flush()
+    
+    async def flush(self) -> int:
+        """Write buffered usage rows in one insert; returns the number of rows written"""
+        if not self._pending or not self.supabase:
+            return 0
+        
+        rows, self._pending = self._pending, []
         try:
-            result = self.supabase.rpc(
-                'log_model_usage',
-                {
-                    'p_queue_item_id': queue_item_id,
-                    'p_extraction_run_id': extraction_run_id,
-                    'p_stage': stage,
-                    'p_model_id': model_id,
-                    'p_model_provider': model_provider,
-                    'p_iteration_number': iteration_number,
-                    'p_temperature': temperature,
-                    'p_prompt_tokens': prompt_tokens,
-                    'p_completion_tokens': completion_tokens,
-                    'p_response_time_ms': response_time_ms,
-                    'p_api_cost': api_cost,
-                    'p_success': success,
-                    'p_error_message': error_message
-                }
-            ).execute()
-            
-            logger.info(
-                f"Logged model usage for {model_id} in stage {stage}",
-                component="model_usage_tracker",
-                queue_item_id=queue_item_id,
-                model_id=model_id,
-                stage=stage,
-                cost=api_cost
-            )
-            
-            return result.data
-            
+            await asyncio.to_thread(lambda: self.supabase.table("model_usage").insert(rows).execute())
         except Exception as e:
-            logger.error(f"Failed to log model usage: {e}", component="model_usage_tracker")
-            return None
+            logger.error(f"Failed to write {len(rows)} model usage rows: {e}", component="model_usage_tracker")
+            # Keep the rows for the next flush, bounded so a dead database can't grow the buffer forever
+            self._pending = (rows + self._pending)[-self.batch_size * 20:]
+            return 0
+        
+        logger.info(
+            f"Logged {len(rows)} model usage rows",
+            component="model_usage_tracker",
+            total_cost=sum(row['api_cost'] for row in rows)
+        )
+        return len(rows)
+    
+    def _add_to_summary(self, model_id: str, model_provider: str, stage: str, prompt_tokens: int,
+                        completion_tokens: int, cached_tokens: int, cache_write_tokens: int,
+                        api_cost: float, token_source: str) -> None:
+        summary = self._summary.setdefault((model_provider, model_id, stage), {
+            'calls': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'cached_tokens': 0,
+            'cache_write_tokens': 0,
+            'api_cost': 0.0,
+            'estimated_calls': 0
+        })
+        summary['calls'] += 1
+        summary['prompt_tokens'] += prompt_tokens
+        summary['completion_tokens'] += completion_tokens
+        summary['cached_tokens'] += cached_tokens
+        summary['cache_write_tokens'] += cache_write_tokens
+        summary['api_cost'] += api_cost
+        if token_source == "estimate":
+            summary['estimated_calls'] += 1
+    
+    def get_call_cost_totals(self, model_id: str, stage: str) -> Tuple[float, int]:
+        """(total cost, calls) of `model_id` for `stage` since process start"""
+        cost, calls = 0.0, 0
+        for (_, summary_model, summary_stage), totals in self._summary.items():
+            if summary_model == model_id and summary_stage == stage:
+                cost += totals['api_cost']
+                calls += totals['calls']
+        return cost, calls
+    
+    def get_usage_summary(self) -> Dict[str, Any]:
+        """Token and cost totals per provider, model and stage since process start"""
+        models = [
+            {'model_provider': provider, 'model_id': model_id, 'stage': stage, **totals}
+            for (provider, model_id, stage), totals in sorted(self._summary.items())
+        ]
+        prompt_tokens = sum(entry['prompt_tokens'] for entry in models)
+        cached_tokens = sum(entry['cached_tokens'] for entry in models)
+        return {
+            'models': models,
+            'total_cost': sum(entry['api_cost'] for entry in models),
+            'total_tokens': prompt_tokens + sum(entry['completion_tokens'] for entry in models),
+            'cached_tokens': cached_tokens,
+            # Share of prompt tokens read from provider prompt caches
+            'prompt_cache_hit_rate': cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+            'pending_rows': len(self._pending)
+        }
     
     async def log_configuration_usage(
         self,
@@ -189,5 +279,10 @@ def get_model_usage_tracker() -> ModelUsageTracker:
     """Get or create the global model usage tracker"""
     global _tracker
     if _tracker is None:
-        _tracker = ModelUsageTracker()
+        from ..config import SystemConfig
+        config = SystemConfig()
+        _tracker = ModelUsageTracker(
+            batch_size=config.model_usage_batch_size,
+            flush_seconds=config.model_usage_flush_seconds
+        )
     return _tracker
\ No newline at end of file
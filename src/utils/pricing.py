@@ -0,0 +1,200 @@
+"""
+Model Pricing
+Token usage read from provider responses, priced from a versioned price table.
+Provider prices are kept in USD; every cost this module returns is converted to
+GBP, the currency of CostTracker limits, budget caps and the cost logs.
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+
+from .logger import logger
+from ..config import SystemConfig
+
+
+# USD per 1M tokens. Add a new version rather than editing a published one, so
+# historical costs stay reproducible; the active version is MODEL_PRICE_TABLE_VERSION.
+_PRICES_2024_12_01: Dict[str, Dict[str, float]] = {
+    # OpenAI: cached input is billed at half the input rate
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+    "gpt-4o-2024-05-13": {"input": 5.00, "cached_input": 5.00, "output": 15.00},
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+    "gpt-4-turbo": {"input": 10.00, "cached_input": 10.00, "output": 30.00},
+    "gpt-4-vision-preview": {"input": 10.00, "cached_input": 10.00, "output": 30.00},
+    # Anthropic: cache reads at 10%, cache writes at 125% of the input rate
+    "claude-3-5-sonnet": {"input": 3.00, "cached_input": 0.30, "cache_write": 3.75, "output": 15.00},
+    "claude-3-5-haiku": {"input": 0.80, "cached_input": 0.08, "cache_write": 1.00, "output": 4.00},
+    "claude-3-sonnet": {"input": 3.00, "cached_input": 0.30, "cache_write": 3.75, "output": 15.00},
+    "claude-3-opus": {"input": 15.00, "cached_input": 1.50, "cache_write": 18.75, "output": 75.00},
+    "claude-3-haiku": {"input": 0.25, "cached_input": 0.03, "cache_write": 0.30, "output": 1.25},
+    # Google (prompts up to 128k tokens)
+    "gemini-2.0-flash": {"input": 0.10, "cached_input": 0.025, "output": 0.40},
+    "gemini-1.5-flash": {"input": 0.075, "cached_input": 0.01875, "output": 0.30},
+    "gemini-1.5-pro": {"input": 1.25, "cached_input": 0.3125, "output": 5.00},
+    "gemini-pro-vision": {"input": 0.50, "cached_input": 0.50, "output": 1.50},
+}
+
+PRICE_TABLES: Dict[str, Dict[str, Dict[str, float]]] = {
+    "2024-12-01": _PRICES_2024_12_01,
+    "2025-06-01": {
+        **_PRICES_2024_12_01,
+        # Gemini 2.5 (prompts up to 200k tokens). The engine's gemini-2.5-pro stage model
+        # calls gemini-2.0-pro-exp, billed here at the 2.5 Pro rate.
+        "gemini-2.5-pro": {"input": 1.25, "cached_input": 0.31, "output": 10.00},
+        "gemini-2.5-flash": {"input": 0.30, "cached_input": 0.075, "output": 2.50},
+        "gemini-2.0-pro": {"input": 1.25, "cached_input": 0.31, "output": 10.00},
+    },
+}
+
+LATEST_PRICE_TABLE_VERSION = max(PRICE_TABLES)
+
+# OpenAI Batch and Anthropic Message Batches bill at half the interactive rates
+BATCH_DISCOUNT = 0.5
+
+# Used for models missing from the table (priced high on purpose, so budgets stay safe)
+_UNKNOWN_MODEL_PRICE = {"input": 15.00, "cached_input": 15.00, "output": 75.00}
+_warned_models = set()
+_active_version: Optional[str] = None
+_usd_to_gbp: Optional[float] = None
+
+
+@dataclass
+class TokenUsage:
+    """Token counts for one provider call
+
+    `input_tokens` is the uncached input billed at the full rate; prompt-cache
+    reads and writes are counted separately.
+    """
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_input_tokens: int = 0
+    cache_write_tokens: int = 0
+    source: str = "provider"  # "provider" (usage metadata) or "estimate"
+
+    @property
+    def prompt_tokens(self) -> int:
+        return self.input_tokens + self.cached_input_tokens + self.cache_write_tokens
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.output_tokens
+
+    def __add__(self, other: "TokenUsage") -> "TokenUsage":
+        return TokenUsage(
+            input_tokens=self.input_tokens + other.input_tokens,
+            output_tokens=self.output_tokens + other.output_tokens,
+            cached_input_tokens=self.cached_input_tokens + other.cached_input_tokens,
+            cache_write_tokens=self.cache_write_tokens + other.cache_write_tokens,
+            source=self.source if self.source == other.source else "mixed"
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _field(obj: Any, name: str, default: Any = 0) -> Any:
+    """Attribute or key lookup (responses may be SDK objects or cached dicts)"""
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        value = obj.get(name, default)
+    else:
+        value = getattr(obj, name, default)
+    return default if value is None else value
+
+
+def usage_from_openai(completion: Any) -> TokenUsage:
+    """Usage from an OpenAI chat completion (prompt_tokens includes cached tokens)"""
+    usage = _field(completion, 'usage', None)
+    cached = _field(_field(usage, 'prompt_tokens_details', None), 'cached_tokens')
+    return TokenUsage(
+        input_tokens=_field(usage, 'prompt_tokens') - cached,
+        output_tokens=_field(usage, 'completion_tokens'),
+        cached_input_tokens=cached
+    )
+
+
+def usage_from_anthropic(message: Any) -> TokenUsage:
+    """Usage from an Anthropic message (input_tokens excludes cache reads and writes)"""
+    usage = _field(message, 'usage', None)
+    return TokenUsage(
+        input_tokens=_field(usage, 'input_tokens'),
+        output_tokens=_field(usage, 'output_tokens'),
+        cached_input_tokens=_field(usage, 'cache_read_input_tokens'),
+        cache_write_tokens=_field(usage, 'cache_creation_input_tokens')
+    )
+
+
+def usage_from_gemini(response: Any) -> TokenUsage:
+    """Usage from a Gemini response (prompt_token_count includes cached content)"""
+    usage = _field(response, 'usage_metadata', None)
+    cached = _field(usage, 'cached_content_token_count')
+    return TokenUsage(
+        input_tokens=_field(usage, 'prompt_token_count') - cached,
+        output_tokens=_field(usage, 'candidates_token_count'),
+        cached_input_tokens=cached
+    )
+
+
+def estimate_usage(prompt_chars: int, image_count: int, output_chars: int) -> TokenUsage:
+    """Fallback when a response carries no usage metadata (e.g. streamed responses)"""
+    from .rate_limiter import IMAGE_TOKEN_ESTIMATE
+    return TokenUsage(
+        input_tokens=prompt_chars // 4 + image_count * IMAGE_TOKEN_ESTIMATE,
+        output_tokens=output_chars // 4,
+        source="estimate"
+    )
+
+
+def get_price_table_version() -> str:
+    """Price table version in use (MODEL_PRICE_TABLE_VERSION, falling back to the latest)"""
+    global _active_version
+    if _active_version is None:
+        configured = SystemConfig().model_price_table_version
+        if configured and configured not in PRICE_TABLES:
+            logger.warning(
+                f"Unknown price table version '{configured}', using {LATEST_PRICE_TABLE_VERSION}",
+                component="pricing"
+            )
+        _active_version = configured if configured in PRICE_TABLES else LATEST_PRICE_TABLE_VERSION
+    return _active_version
+
+
+def get_model_price(model: str, version: Optional[str] = None) -> Dict[str, float]:
+    """Per-1M-token prices for a model (longest matching model-name prefix wins)"""
+    table = PRICE_TABLES.get(version or get_price_table_version(), PRICE_TABLES[LATEST_PRICE_TABLE_VERSION])
+
+    matches = [name for name in table if model.startswith(name)]
+    if matches:
+        return table[max(matches, key=len)]
+
+    if model not in _warned_models:
+        _warned_models.add(model)
+        logger.error(
+            f"No price for model '{model}' in price table {version or get_price_table_version()}, "
+            f"pricing at the conservative default; add it to PRICE_TABLES",
+            component="pricing"
+        )
+    return _UNKNOWN_MODEL_PRICE
+
+
+def get_usd_to_gbp_rate() -> float:
+    """Exchange rate applied to the USD price tables (USD_TO_GBP_RATE)"""
+    global _usd_to_gbp
+    if _usd_to_gbp is None:
+        _usd_to_gbp = SystemConfig().usd_to_gbp_rate
+    return _usd_to_gbp
+
+
+def price_usage(model: str, usage: TokenUsage, version: Optional[str] = None, batch: bool = False) -> float:
+    """Cost in GBP of one call (`batch` applies the batch API discount)"""
+    price = get_model_price(model, version)
+    cost = (
+        usage.input_tokens * price['input']
+        + usage.cached_input_tokens * price.get('cached_input', price['input'])
+        + usage.cache_write_tokens * price.get('cache_write', price['input'])
+        + usage.output_tokens * price['output']
+    ) / 1_000_000 * get_usd_to_gbp_rate()
+    if batch:
+        cost *= BATCH_DISCOUNT
+    return round(cost, 6)
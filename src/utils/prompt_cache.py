@@ -0,0 +1,111 @@
+"""
+Prompt Prefix Caching
+Splits prompts into a stable prefix (image plus static instructions) and a small
+variable suffix, and lays out provider messages so the prefix can be served from
+the provider's prompt cache. When the image changes between calls (per-shelf
+crops) only the static instructions form the prefix.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Separates the cacheable prefix from the per-call suffix inside a prompt string, so
+# prompts keep flowing through the existing str-typed APIs, cache keys and cassettes
+PROMPT_CACHE_BREAK = "\n\n<<<prompt-cache-break>>>\n\n"
+# The same break for prompts whose images vary between calls: the images then go
+# after the cached text prefix rather than before it
+PROMPT_CACHE_BREAK_IMAGES_VARY = "\n\n<<<prompt-cache-break:images-vary>>>\n\n"
+
+# Anthropic models without prompt caching (requests with cache_control are rejected)
+_UNCACHED_ANTHROPIC_MODELS = ("claude-3-sonnet", "claude-2", "claude-instant")
+
+_enabled: Optional[bool] = None
+
+
+def prompt_caching_enabled() -> bool:
+    """Whether prompts are laid out for provider prompt caching (PROMPT_CACHING_ENABLED)"""
+    global _enabled
+    if _enabled is None:
+        from ..config import SystemConfig
+        _enabled = SystemConfig().prompt_caching_enabled
+    return _enabled
+
+
+def cacheable_prompt(prefix: str, suffix: str = "", images_vary: bool = False) -> str:
+    """Join a static prefix and a variable suffix into one prompt
+
+    `images_vary` marks a prompt sent with a different image on each call, so the
+    cached prefix is the text alone.
+    """
+    if images_vary and prompt_caching_enabled():
+        prefix = prefix.replace(PROMPT_CACHE_BREAK, PROMPT_CACHE_BREAK_IMAGES_VARY)
+    if not suffix:
+        return prefix
+    if not prompt_caching_enabled() or _cache_break(prefix):
+        # A prompt only has one break; later suffixes extend the variable part
+        return f"{prefix}\n\n{suffix}"
+    return f"{prefix}{PROMPT_CACHE_BREAK_IMAGES_VARY if images_vary else PROMPT_CACHE_BREAK}{suffix}"
+
+
+def _cache_break(prompt: str) -> Optional[str]:
+    for marker in (PROMPT_CACHE_BREAK, PROMPT_CACHE_BREAK_IMAGES_VARY):
+        if marker in prompt:
+            return marker
+    return None
+
+
+def split_prompt(prompt: str) -> Tuple[str, str]:
+    """(prefix, suffix) of a prompt; a prompt without a break is all prefix"""
+    prefix, _, suffix = prompt.partition(_cache_break(prompt) or PROMPT_CACHE_BREAK)
+    return prefix, suffix
+
+
+def flatten_prompt(prompt: str) -> str:
+    """The prompt as plain text, for providers without explicit prefix caching"""
+    return prompt.replace(PROMPT_CACHE_BREAK, "\n\n").replace(PROMPT_CACHE_BREAK_IMAGES_VARY, "\n\n")
+
+
+def supports_prompt_caching(provider: str, model: str) -> bool:
+    """Whether `model` can serve a prompt prefix from the provider's cache"""
+    if provider == "anthropic":
+        return not model.startswith(_UNCACHED_ANTHROPIC_MODELS)
+    return True
+
+
+def message_content(prompt: str, image_parts: List[Dict[str, Any]], provider: str, model: str,
+                    text_first: bool = True) -> List[Dict[str, Any]]:
+    """User message content for an OpenAI or Anthropic vision call
+
+    With prompt caching on, the images go first, then the static prefix, then the
+    suffix: OpenAI caches the longest previously seen prefix automatically, and
+    Anthropic gets a cache breakpoint after the prefix (or after the last image
+    when the whole prompt varies). A prompt whose images vary between calls puts
+    them after the prefix instead. Otherwise, or for a model without prompt
+    caching, the legacy layout is kept.
+    """
+    if not prompt_caching_enabled() or not supports_prompt_caching(provider, model):
+        text = [{"type": "text", "text": flatten_prompt(prompt)}]
+        return text + image_parts if text_first else image_parts + text
+
+    prefix, suffix = split_prompt(prompt)
+    if PROMPT_CACHE_BREAK_IMAGES_VARY in prompt:
+        content = [{"type": "text", "text": prefix}]
+        if provider == "anthropic":
+            content[0]["cache_control"] = {"type": "ephemeral"}
+        content += [dict(part) for part in image_parts]
+        if suffix:
+            content.append({"type": "text", "text": suffix})
+        return content
+
+    if not suffix:
+        # No stable text: only the images are worth caching
+        prefix, suffix = "", prefix
+
+    content = [dict(part) for part in image_parts]
+    if prefix:
+        content.append({"type": "text", "text": prefix})
+    if provider == "anthropic" and content:
+        content[-1]["cache_control"] = {"type": "ephemeral"}
+    if suffix:
+        content.append({"type": "text", "text": suffix})
+    return content
@@ -0,0 +1,338 @@
+"""
+Provider Batch Collector
+Collects provider calls from many queue items and runs them through the OpenAI Batch
+and Anthropic Message Batches APIs instead of the interactive endpoints
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import io
+import json
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from .logger import logger
+
+
+# Providers with a batch endpoint (Gemini calls stay interactive)
+BATCH_PROVIDERS = ("openai", "anthropic")
+
+_TERMINAL_OPENAI_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchRequestError(Exception):
+    """A request in a provider batch failed or expired"""
+    pass
+
+
+@dataclass
+class BatchItem:
+    """Batch-mode accounting for one queue item"""
+    item_id: Any
+    started: float = field(default_factory=time.time)
+    requests: int = 0
+    batch_cost: float = 0.0
+    interactive_cost: float = 0.0  # what the same calls would have cost interactively
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'item_id': self.item_id,
+            'wall_time_seconds': time.time() - self.started,
+            'batched_requests': self.requests,
+            'batch_cost': self.batch_cost,
+            'interactive_cost': self.interactive_cost,
+            'cost_saving': self.interactive_cost - self.batch_cost
+        }
+
+
+_active_batch: contextvars.ContextVar[Optional[Tuple["ProviderBatchCollector", BatchItem]]] = \
+    contextvars.ContextVar("provider_batch", default=None)
+
+
+@contextlib.contextmanager
+def batch_mode_scope(collector: "ProviderBatchCollector", item_id: Any) -> Iterator[BatchItem]:
+    """Route OpenAI/Anthropic calls made inside this scope (and tasks it starts) through `collector`"""
+    item = BatchItem(item_id)
+    token = _active_batch.set((collector, item))
+    try:
+        yield item
+    finally:
+        _active_batch.reset(token)
+
+
+def get_active_batch() -> Optional[Tuple["ProviderBatchCollector", BatchItem]]:
+    """(collector, item) when running in batch mode, else None"""
+    return _active_batch.get()
+
+
+def record_batch_cost(batch_cost: float, interactive_cost: float) -> None:
+    """Attribute one batched call's cost (and its interactive-price equivalent) to the current item"""
+    active = _active_batch.get()
+    if active is not None:
+        _, item = active
+        item.requests += 1
+        item.batch_cost += batch_cost
+        item.interactive_cost += interactive_cost
+
+
+class ProviderBatchCollector:
+    """Pools chat/message requests per provider and submits them as provider batches
+
+    submit() parks the caller until its request comes back from a batch. Pending
+    requests are submitted when `max_batch_size` is reached or `collect_seconds`
+    after the first one arrived, and batches are polled every `poll_seconds`.
+    Each caller's pipeline resumes from where it awaited once its result is in.
+    """
+
+    def __init__(self, openai_api_key: Optional[str] = None, anthropic_api_key: Optional[str] = None,
+                 openai_base_url: Optional[str] = None, anthropic_base_url: Optional[str] = None,
+                 max_batch_size: int = 500, collect_seconds: float = 60.0, poll_seconds: float = 60.0,
+                 completion_window: str = "24h"):
+        import openai
+        import anthropic
+
+        self.openai = openai.AsyncOpenAI(api_key=openai_api_key, base_url=openai_base_url or None)
+        self.anthropic = anthropic.AsyncAnthropic(api_key=anthropic_api_key, base_url=anthropic_base_url or None)
+        self.max_batch_size = max_batch_size
+        self.collect_seconds = collect_seconds
+        self.poll_seconds = poll_seconds
+        self.completion_window = completion_window
+        self._pending: Dict[str, List[Tuple[str, Dict[str, Any], asyncio.Future]]] = {p: [] for p in BATCH_PROVIDERS}
+        self._timers: Dict[str, Optional[asyncio.Task]] = {p: None for p in BATCH_PROVIDERS}
+        self._batches: List[asyncio.Task] = []
+        self._instructor_clients: Dict[str, Any] = {}
+        self.recent_batches: Deque[Dict[str, Any]] = deque(maxlen=50)
+        self.stats = {'batches': 0, 'requests': 0, 'failed_requests': 0}
+
+    # Instructor clients whose "create" goes through the batch endpoints
+
+    def instructor_client(self, provider: str):
+        """Instructor client for `provider` that sends every request through a batch
+
+        Built with the regular from_openai/from_anthropic constructors over an SDK
+        client whose chat/messages "create" is swapped for the batch submit.
+        """
+        client = self._instructor_clients.get(provider)
+        if client is None:
+            import instructor
+
+            if provider == "openai":
+                sdk = self.openai.copy()
+                sdk.chat = SimpleNamespace(completions=SimpleNamespace(create=self._openai_create))
+                client = instructor.from_openai(sdk)
+            else:
+                sdk = self.anthropic.copy()
+                sdk.messages = SimpleNamespace(create=self._anthropic_create)
+                client = instructor.from_anthropic(sdk)
+            self._instructor_clients[provider] = client
+        return client
+
+    async def _openai_create(self, **kwargs):
+        from openai.types.chat import ChatCompletion
+        body = await self.submit("openai", self._without_stream(kwargs))
+        return ChatCompletion.model_validate(body)
+
+    async def _anthropic_create(self, **kwargs):
+        return await self.submit("anthropic", self._without_stream(kwargs))
+
+    @staticmethod
+    def _without_stream(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        if kwargs.get("stream"):
+            raise ValueError("Streaming requests can't be batched")
+        return {name: value for name, value in kwargs.items() if value is not None}
+
+    # Collection
+
+    async def submit(self, provider: str, body: Dict[str, Any]) -> Any:
+        """Queue one request body for the next `provider` batch and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending[provider].append((f"req-{uuid.uuid4().hex[:24]}", body, future))
+
+        if len(self._pending[provider]) >= self.max_batch_size:
+            self._flush(provider)
+        elif self._timers[provider] is None:
+            self._timers[provider] = asyncio.ensure_future(self._flush_later(provider))
+        return await future
+
+    async def _flush_later(self, provider: str) -> None:
+        await asyncio.sleep(self.collect_seconds)
+        self._timers[provider] = None
+        self._flush(provider)
+
+    def _flush(self, provider: str) -> None:
+        timer = self._timers[provider]
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        self._timers[provider] = None
+
+        requests, self._pending[provider] = self._pending[provider], []
+        requests = [request for request in requests if not request[2].cancelled()]
+        if requests:
+            self._batches.append(asyncio.ensure_future(self._run_batch(provider, requests)))
+            self._batches = [task for task in self._batches if not task.done()]
+
+    async def _run_batch(self, provider: str, requests: List[Tuple[str, Dict[str, Any], asyncio.Future]]) -> None:
+        started = time.time()
+        futures = {custom_id: future for custom_id, _, future in requests}
+        self.stats['batches'] += 1
+        self.stats['requests'] += len(requests)
+
+        try:
+            if provider == "openai":
+                batch_id, results = await self._run_openai_batch(requests)
+            else:
+                batch_id, results = await self._run_anthropic_batch(requests)
+        except Exception as e:
+            logger.error(
+                f"{provider} batch of {len(requests)} requests failed: {e}",
+                component="provider_batch",
+                provider=provider
+            )
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(BatchRequestError(f"{provider} batch failed: {e}"))
+            return
+
+        failed = 0
+        for custom_id, future in futures.items():
+            if future.done():
+                continue
+            outcome = results.get(custom_id)
+            if isinstance(outcome, Exception) or outcome is None:
+                failed += 1
+                future.set_exception(outcome or BatchRequestError(f"No result for {custom_id} in batch {batch_id}"))
+            else:
+                future.set_result(outcome)
+        self.stats['failed_requests'] += failed
+
+        duration = time.time() - started
+        self.recent_batches.append({
+            'provider': provider,
+            'batch_id': batch_id,
+            'requests': len(requests),
+            'failed': failed,
+            'duration_seconds': duration
+        })
+        logger.info(
+            f"{provider} batch {batch_id} finished: {len(requests) - failed}/{len(requests)} succeeded in {duration:.0f}s",
+            component="provider_batch",
+            provider=provider,
+            batch_id=batch_id,
+            requests=len(requests),
+            failed=failed,
+            duration=duration
+        )
+
+    # Provider batch APIs
+
+    async def _run_openai_batch(self, requests) -> Tuple[str, Dict[str, Any]]:
+        lines = "\n".join(
+            json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body})
+            for custom_id, body, _ in requests
+        )
+        input_file = await self.openai.files.create(
+            file=("batch.jsonl", io.BytesIO(lines.encode("utf-8"))), purpose="batch"
+        )
+        batch = await self.openai.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window
+        )
+        logger.info(
+            f"Submitted OpenAI batch {batch.id} with {len(requests)} requests",
+            component="provider_batch",
+            batch_id=batch.id
+        )
+
+        while batch.status not in _TERMINAL_OPENAI_STATUSES:
+            await asyncio.sleep(self.poll_seconds)
+            batch = await self.openai.batches.retrieve(batch.id)
+
+        results: Dict[str, Any] = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.openai.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                if response.get("status_code") == 200:
+                    results[entry["custom_id"]] = response["body"]
+                else:
+                    error = entry.get("error") or response.get("body", {}).get("error")
+                    results[entry["custom_id"]] = BatchRequestError(f"OpenAI batch request failed: {error}")
+
+        if batch.status != "completed":
+            logger.warning(
+                f"OpenAI batch {batch.id} ended as {batch.status}",
+                component="provider_batch",
+                batch_id=batch.id
+            )
+        return batch.id, results
+
+    def _anthropic_batches(self):
+        # Message Batches moved out of beta in newer SDKs
+        messages = self.anthropic.messages
+        return getattr(messages, "batches", None) or self.anthropic.beta.messages.batches
+
+    async def _run_anthropic_batch(self, requests) -> Tuple[str, Dict[str, Any]]:
+        batches = self._anthropic_batches()
+        batch = await batches.create(requests=[
+            {"custom_id": custom_id, "params": body} for custom_id, body, _ in requests
+        ])
+        logger.info(
+            f"Submitted Anthropic message batch {batch.id} with {len(requests)} requests",
+            component="provider_batch",
+            batch_id=batch.id
+        )
+
+        while batch.processing_status != "ended":
+            await asyncio.sleep(self.poll_seconds)
+            batch = await batches.retrieve(batch.id)
+
+        results: Dict[str, Any] = {}
+        async for entry in await batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                results[entry.custom_id] = entry.result.message
+            else:
+                error = getattr(entry.result, "error", None)
+                results[entry.custom_id] = BatchRequestError(
+                    f"Anthropic batch request {entry.result.type}: {error}"
+                )
+        return batch.id, results
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'pending_requests': {provider: len(pending) for provider, pending in self._pending.items()},
+            'batches_in_flight': sum(1 for task in self._batches if not task.done()),
+            'recent_batches': list(self.recent_batches)
+        }
+
+
+# Global instance
+_collector = None
+
+def get_batch_collector() -> ProviderBatchCollector:
+    """Get or create the process-wide provider batch collector"""
+    global _collector
+    if _collector is None:
+        from ..config import SystemConfig
+        config = SystemConfig()
+        _collector = ProviderBatchCollector(
+            openai_api_key=config.openai_api_key,
+            anthropic_api_key=config.anthropic_api_key,
+            openai_base_url=config.openai_batch_base_url,
+            anthropic_base_url=config.anthropic_batch_base_url,
+            max_batch_size=config.batch_max_requests,
+            collect_seconds=config.batch_collect_seconds,
+            poll_seconds=config.batch_poll_seconds
+        )
+    return _collector
@@ -0,0 +1,187 @@
+"""
+Provider Cassettes
+Record provider responses and latencies to a cassette file and replay them as a
+fake provider, so whole pipelines can be benchmarked without network access
+"""
+
+import asyncio
+import base64
+import json
+import os
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .logger import logger
+from .error_handling import NonRecoverableError
+from ..config import SystemConfig
+
+
+CASSETTE_MODES = ("off", "record", "replay")
+
+
+class CassetteMissError(NonRecoverableError):
+    """Raised in replay mode when the cassette has no recording for a request"""
+
+    def __init__(self, provider: str, model: str, key: str):
+        self.provider = provider
+        self.model = model
+        self.key = key
+        super().__init__(f"No cassette recording for {provider}/{model} (key {key[:12]})")
+
+
+class ProviderCassette:
+    """JSONL cassette of provider interactions
+
+    Each line is {"key", "provider", "model", "latency", "payload"}. Identical
+    requests recorded several times are replayed in recording order (the last
+    recording repeats once they run out).
+    """
+
+    def __init__(self, path: str, mode: str = "off", replay_latency: bool = False, latency_scale: float = 1.0):
+        if mode not in CASSETTE_MODES:
+            logger.warning(f"Unknown cassette mode '{mode}', disabling cassette", component="provider_cassette")
+            mode = "off"
+
+        self.path = path
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self.latency_scale = latency_scale
+        self._recordings: Dict[str, List[Dict[str, Any]]] = {}
+        self._replay_positions: Dict[str, int] = {}
+        self._latencies: Dict[str, List[float]] = {}
+        self.replayed = 0
+        self.recorded = 0
+
+        if self.mode == "replay":
+            self._load()
+        elif self.mode == "record":
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            logger.warning(f"Cassette {self.path} not found - every request will miss", component="provider_cassette")
+            return
+
+        with open(self.path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self._recordings.setdefault(entry['key'], []).append(entry)
+                if entry.get('model') != 'storage':
+                    self._latencies.setdefault(entry['provider'], []).append(entry.get('latency', 0.0))
+
+        logger.info(
+            f"Loaded cassette {self.path}: {sum(len(v) for v in self._recordings.values())} recordings",
+            component="provider_cassette"
+        )
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+        if entry['model'] != 'storage':
+            self._latencies.setdefault(entry['provider'], []).append(entry['latency'])
+        self.recorded += 1
+
+    def _next_recording(self, provider: str, model: str, key: str) -> Dict[str, Any]:
+        recordings = self._recordings.get(key)
+        if not recordings:
+            raise CassetteMissError(provider, model, key)
+        position = self._replay_positions.get(key, 0)
+        self._replay_positions[key] = position + 1
+        return recordings[min(position, len(recordings) - 1)]
+
+    async def call(self, provider: str, model: str, key: str,
+                   call: Callable[[], Awaitable[Any]],
+                   dump: Callable[[Any], Optional[Dict[str, Any]]],
+                   restore: Callable[[Dict[str, Any]], Any]) -> Any:
+        """Run a provider call through the cassette (record, replay or pass through)"""
+        if self.mode == "replay":
+            entry = self._next_recording(provider, model, key)
+            if self.replay_latency and entry.get('latency'):
+                await asyncio.sleep(entry['latency'] * self.latency_scale)
+            self.replayed += 1
+            return restore(entry['payload'])
+
+        if self.mode != "record":
+            return await call()
+
+        started = time.perf_counter()
+        result = await call()
+        latency = time.perf_counter() - started
+
+        payload = dump(result)
+        if payload is None:
+            logger.warning(
+                f"Response from {provider}/{model} can't be serialised - not recorded",
+                component="provider_cassette"
+            )
+        else:
+            self._append({
+                'key': key,
+                'provider': provider,
+                'model': model,
+                'latency': latency,
+                'payload': payload
+            })
+        return result
+
+    def save_blob(self, key: str, data: bytes, provider: str = "supabase") -> None:
+        """Record a binary payload (e.g. an image download); no-op unless recording"""
+        if self.mode != "record":
+            return
+        self._append({
+            'key': key,
+            'provider': provider,
+            'model': 'storage',
+            'latency': 0.0,
+            'payload': {'b64': base64.b64encode(data).decode('utf-8')}
+        })
+
+    def load_blob(self, key: str, provider: str = "supabase") -> bytes:
+        """Replay a recorded binary payload"""
+        entry = self._next_recording(provider, 'storage', key)
+        return base64.b64decode(entry['payload']['b64'])
+
+    def get_latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """Recorded latency distribution per provider"""
+        stats = {}
+        for provider, latencies in self._latencies.items():
+            if not latencies:
+                continue
+            ordered = sorted(latencies)
+            stats[provider] = {
+                'count': len(ordered),
+                'mean': statistics.mean(ordered),
+                'p50': ordered[len(ordered) // 2],
+                'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                'max': ordered[-1]
+            }
+        return stats
+
+
+# Global instance
+_cassette = None
+
+def get_provider_cassette() -> ProviderCassette:
+    """Get or create the process-wide provider cassette"""
+    global _cassette
+    if _cassette is None:
+        config = SystemConfig()
+        _cassette = ProviderCassette(
+            path=config.provider_cassette_path,
+            mode=config.provider_cassette_mode,
+            replay_latency=config.provider_cassette_replay_latency
+        )
+    return _cassette
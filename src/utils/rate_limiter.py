@@ -0,0 +1,228 @@
+"""
+Provider Rate Limiter
+Process-wide token buckets and concurrency caps shared by every AI call site
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Any
+
+from .logger import logger
+from ..config import SystemConfig
+
+
+# Rough token cost of one image in a vision request, used before the real usage is known
+IMAGE_TOKEN_ESTIMATE = 1000
+
+
+def estimate_request_tokens(prompt: str, image_count: int = 0, max_tokens: int = 0) -> int:
+    """Estimate the tokens a request will consume (prompt + images + completion budget)"""
+    return len(prompt or "") // 4 + image_count * IMAGE_TOKEN_ESTIMATE + max_tokens
+
+
+class TokenBucket:
+    """Continuously refilling token bucket sized for a per-minute quota"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(max(per_minute, 1))
+        self.refill_rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def time_until_available(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (0 if available now)"""
+        self._refill()
+        # A request bigger than the whole bucket is allowed once the bucket is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        """Return (or, with a negative amount, charge) tokens after the real usage is known"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ProviderRateLimiter:
+    """Shared requests/tokens-per-minute budget and concurrency cap per provider and model"""
+
+    def __init__(self, config: SystemConfig):
+        self.enabled = config.rate_limiter_enabled
+        self.provider_limits = config.provider_rate_limits
+        self.model_limits = config.model_rate_limits
+
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def _get_buckets(self, key: str, limits: Dict[str, int]) -> Dict[str, TokenBucket]:
+        if key not in self._buckets:
+            self._buckets[key] = {}
+            if limits.get('requests_per_minute'):
+                self._buckets[key]['requests'] = TokenBucket(limits['requests_per_minute'])
+            if limits.get('tokens_per_minute'):
+                self._buckets[key]['tokens'] = TokenBucket(limits['tokens_per_minute'])
+        return self._buckets[key]
+
+    def _get_semaphore(self, provider: str) -> Optional[asyncio.Semaphore]:
+        max_concurrency = self.provider_limits.get(provider, {}).get('max_concurrency')
+        if not max_concurrency:
+            return None
+        if provider not in self._semaphores:
+            self._semaphores[provider] = asyncio.Semaphore(max_concurrency)
+        return self._semaphores[provider]
+
+    def _bucket_sets(self, provider: str, model: Optional[str]) -> List[Dict[str, TokenBucket]]:
+        bucket_sets = [self._get_buckets(provider, self.provider_limits.get(provider, {}))]
+        if model and model in self.model_limits:
+            bucket_sets.append(self._get_buckets(f"{provider}:{model}", self.model_limits[model]))
+        return bucket_sets
+
+    def _get_stats(self, provider: str, model: Optional[str]) -> Dict[str, Any]:
+        stats = self._stats.setdefault(provider, {
+            'requests': 0,
+            'in_flight': 0,
+            'total_wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+            'throttled_requests': 0,
+            'estimated_tokens': 0,
+            'actual_tokens': 0,
+            'models': {}
+        })
+        if model:
+            stats['models'].setdefault(model, {'requests': 0, 'total_wait_seconds': 0.0, 'actual_tokens': 0})
+        return stats
+
+    @asynccontextmanager
+    async def acquire(self, provider: str, model: Optional[str] = None, estimated_tokens: int = 0):
+        """Wait for a slot and budget for one provider call
+
+        Usage:
+            async with limiter.acquire('openai', 'gpt-4o', estimated_tokens=2500):
+                response = await client.chat.completions.create(...)
+        """
+        if not self.enabled:
+            yield
+            return
+
+        started = time.monotonic()
+        stats = self._get_stats(provider, model)
+
+        semaphore = self._get_semaphore(provider)
+        if semaphore:
+            await semaphore.acquire()
+
+        try:
+            # Reserve request and token budget across provider and model buckets
+            # (no awaits between the check and the consume, so this is atomic on the loop)
+            while True:
+                bucket_sets = self._bucket_sets(provider, model)
+                wait = 0.0
+                for buckets in bucket_sets:
+                    if 'requests' in buckets:
+                        wait = max(wait, buckets['requests'].time_until_available(1))
+                    if 'tokens' in buckets and estimated_tokens:
+                        wait = max(wait, buckets['tokens'].time_until_available(estimated_tokens))
+
+                if wait <= 0:
+                    for buckets in bucket_sets:
+                        if 'requests' in buckets:
+                            buckets['requests'].consume(1)
+                        if 'tokens' in buckets and estimated_tokens:
+                            buckets['tokens'].consume(estimated_tokens)
+                    break
+
+                await asyncio.sleep(wait)
+
+            waited = time.monotonic() - started
+            stats['requests'] += 1
+            stats['in_flight'] += 1
+            stats['total_wait_seconds'] += waited
+            stats['max_wait_seconds'] = max(stats['max_wait_seconds'], waited)
+            stats['estimated_tokens'] += estimated_tokens
+            if model:
+                stats['models'][model]['requests'] += 1
+                stats['models'][model]['total_wait_seconds'] += waited
+            if waited > 0.5:
+                stats['throttled_requests'] += 1
+                logger.debug(
+                    f"Rate limiter delayed {provider} call by {waited:.2f}s",
+                    component="rate_limiter",
+                    provider=provider,
+                    model=model
+                )
+
+            try:
+                yield
+            finally:
+                stats['in_flight'] -= 1
+        finally:
+            if semaphore:
+                semaphore.release()
+
+    def record_usage(self, provider: str, model: Optional[str], estimated_tokens: int, actual_tokens: int) -> None:
+        """Reconcile the token buckets with the usage reported by the provider"""
+        if not self.enabled or actual_tokens is None:
+            return
+
+        difference = estimated_tokens - actual_tokens
+        if difference:
+            for buckets in self._bucket_sets(provider, model):
+                if 'tokens' in buckets:
+                    buckets['tokens'].refund(difference)
+
+        stats = self._get_stats(provider, model)
+        stats['actual_tokens'] += actual_tokens
+        if model:
+            stats['models'][model]['actual_tokens'] += actual_tokens
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-provider queue wait and throughput figures for quota sizing"""
+        summary = {}
+        for provider, stats in self._stats.items():
+            requests = stats['requests']
+            limits = self.provider_limits.get(provider, {})
+            summary[provider] = {
+                'limits': limits,
+                'requests': requests,
+                'in_flight': stats['in_flight'],
+                'throttled_requests': stats['throttled_requests'],
+                'avg_wait_seconds': stats['total_wait_seconds'] / requests if requests else 0.0,
+                'max_wait_seconds': stats['max_wait_seconds'],
+                'estimated_tokens': stats['estimated_tokens'],
+                'actual_tokens': stats['actual_tokens'],
+                'models': {
+                    model: {
+                        'requests': model_stats['requests'],
+                        'avg_wait_seconds': (
+                            model_stats['total_wait_seconds'] / model_stats['requests']
+                            if model_stats['requests'] else 0.0
+                        ),
+                        'actual_tokens': model_stats['actual_tokens']
+                    }
+                    for model, model_stats in stats['models'].items()
+                }
+            }
+        return summary
+
+
+# Global instance
+_rate_limiter = None
+
+def get_rate_limiter() -> ProviderRateLimiter:
+    """Get or create the process-wide provider rate limiter"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = ProviderRateLimiter(SystemConfig())
+    return _rate_limiter
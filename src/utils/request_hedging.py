@@ -0,0 +1,120 @@
+"""
+Request Hedging
+Latency history per model and the hedge trigger used by the extraction fallback chain
+"""
+
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple, Any
+
+from .logger import logger
+from ..config import SystemConfig
+
+
+class HedgePolicy:
+    """Decides when a slow call gets a parallel backup and tracks what hedging costs
+
+    The hedge delay for a model is the configured percentile of its recent
+    successful latencies; until enough samples exist the default delay is used.
+    """
+
+    def __init__(self, enabled: bool = False, percentile: float = 90.0, min_samples: int = 10,
+                 default_delay: float = 45.0, window: int = 200):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.window = window
+        self._history: Dict[str, Deque[Tuple[float, float]]] = {}  # model -> (latency, cost)
+        self._stats = {
+            'requests': 0,
+            'hedged_requests': 0,
+            'hedges_fired': 0,
+            'hedge_wins': 0,
+            'cancelled_calls': 0,
+            'total_cost': 0.0,
+            'overhead_cost': 0.0
+        }
+
+    def record_latency(self, model: str, latency: float, cost: float = 0.0) -> None:
+        """Record one successful call"""
+        history = self._history.get(model)
+        if history is None:
+            history = self._history[model] = deque(maxlen=self.window)
+        history.append((latency, cost))
+
+    def latency_percentile(self, model: str, percentile: Optional[float] = None) -> Optional[float]:
+        """Latency percentile for a model, None until `min_samples` calls are recorded"""
+        history = self._history.get(model)
+        if not history or len(history) < self.min_samples:
+            return None
+        ordered = sorted(latency for latency, _ in history)
+        rank = (percentile if percentile is not None else self.percentile) / 100.0
+        return ordered[min(len(ordered) - 1, int(len(ordered) * rank))]
+
+    def hedge_delay(self, model: str) -> float:
+        """Seconds to wait on a call to `model` before firing the next model in parallel"""
+        delay = self.latency_percentile(model)
+        return self.default_delay if delay is None else delay
+
+    def expected_cost(self, model: str) -> float:
+        """Mean recorded cost per call (used to price cancelled calls)"""
+        history = self._history.get(model)
+        if not history:
+            return 0.0
+        return sum(cost for _, cost in history) / len(history)
+
+    def record_outcome(self, hedges_fired: int, hedge_won: bool, winner_cost: float,
+                       cancelled_models: Tuple[str, ...] = ()) -> None:
+        """Record one hedged-chain request once it has a winner (or has failed)"""
+        overhead = sum(self.expected_cost(model) for model in cancelled_models)
+        self._stats['requests'] += 1
+        self._stats['hedges_fired'] += hedges_fired
+        self._stats['cancelled_calls'] += len(cancelled_models)
+        self._stats['total_cost'] += winner_cost + overhead
+        self._stats['overhead_cost'] += overhead
+        if hedges_fired:
+            self._stats['hedged_requests'] += 1
+        if hedge_won:
+            self._stats['hedge_wins'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats['enabled'] = self.enabled
+        stats['percentile'] = self.percentile
+        stats['hedge_rate'] = stats['hedged_requests'] / stats['requests'] if stats['requests'] else 0.0
+        stats['hedge_win_rate'] = stats['hedge_wins'] / stats['hedged_requests'] if stats['hedged_requests'] else 0.0
+        stats['cost_overhead_ratio'] = stats['overhead_cost'] / stats['total_cost'] if stats['total_cost'] else 0.0
+        stats['models'] = {
+            model: {
+                'samples': len(history),
+                'p50': self.latency_percentile(model, 50),
+                'trigger': self.hedge_delay(model),
+                'mean_cost': self.expected_cost(model)
+            }
+            for model, history in self._history.items()
+        }
+        return stats
+
+
+# Global instance
+_hedge_policy = None
+
+def get_hedge_policy() -> HedgePolicy:
+    """Get or create the process-wide hedge policy"""
+    global _hedge_policy
+    if _hedge_policy is None:
+        config = SystemConfig()
+        _hedge_policy = HedgePolicy(
+            enabled=config.hedge_requests_enabled,
+            percentile=config.hedge_latency_percentile,
+            min_samples=config.hedge_min_samples,
+            default_delay=config.hedge_default_delay_seconds
+        )
+        if _hedge_policy.enabled:
+            logger.info(
+                f"Request hedging enabled at p{config.hedge_latency_percentile:g} latency",
+                component="request_hedging",
+                min_samples=config.hedge_min_samples,
+                default_delay=config.hedge_default_delay_seconds
+            )
+    return _hedge_policy
@@ -0,0 +1,228 @@
+"""
+LLM Response Cache
+Disk-backed, size-bounded LRU cache of model responses with an offline replay mode
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Any, Iterable
+
+from .logger import logger
+from .error_handling import NonRecoverableError
+from ..config import SystemConfig
+
+
+CACHE_MODES = ("off", "read_write", "replay_only")
+
+
+class ResponseCacheMissError(NonRecoverableError):
+    """Raised in replay-only mode when a request has no recorded response"""
+
+    def __init__(self, stage: str, model: str):
+        self.stage = stage
+        self.model = model
+        super().__init__(
+            f"No cached response for {model} ({stage}) and response cache is in replay-only mode"
+        )
+
+
+def make_request_key(model: str, prompt: str, image_hashes: Iterable[str],
+                     output_schema: str, temperature: float, max_tokens: Optional[int] = None) -> str:
+    """Stable key for one model request (shared by the response cache and provider cassettes)
+
+    `max_tokens` only needs passing where it isn't implied by the output schema.
+    """
+    material = {
+        'model': model,
+        'prompt': hashlib.sha256(prompt.encode('utf-8')).hexdigest(),
+        'images': list(image_hashes),
+        'schema': output_schema,
+        'temperature': round(float(temperature), 4)
+    }
+    if max_tokens is not None:
+        material['max_tokens'] = int(max_tokens)
+    key_material = json.dumps(material, sort_keys=True)
+    return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Model responses on disk, keyed by model, prompt hash, image hashes, output schema and temperature
+
+    Entries are one JSON file each; the file mtime doubles as the LRU clock.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, mode: str = "read_write"):
+        if mode not in CACHE_MODES:
+            logger.warning(f"Unknown response cache mode '{mode}', disabling cache", component="response_cache")
+            mode = "off"
+
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self._index: Dict[str, Dict[str, float]] = {}  # key -> {'size', 'accessed'}
+        self._total_bytes = 0
+        self._stage_stats: Dict[str, Dict[str, int]] = {}
+
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._load_index()
+            logger.info(
+                f"Response cache enabled ({self.mode}): {len(self._index)} entries, "
+                f"{self._total_bytes / 1024 / 1024:.1f} MB",
+                component="response_cache",
+                cache_dir=self.cache_dir
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def replay_only(self) -> bool:
+        return self.mode == "replay_only"
+
+    def _load_index(self) -> None:
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith('.json'):
+                stat = entry.stat()
+                self._index[entry.name[:-5]] = {'size': stat.st_size, 'accessed': stat.st_mtime}
+                self._total_bytes += stat.st_size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def make_key(self, model: str, prompt: str, image_hashes: Iterable[str],
+                 output_schema: str, temperature: float, max_tokens: Optional[int] = None) -> str:
+        """Stable cache key for one request"""
+        return make_request_key(model, prompt, image_hashes, output_schema, temperature, max_tokens)
+
+    def _record(self, stage: str, outcome: str) -> None:
+        stats = self._stage_stats.setdefault(stage, {'hits': 0, 'misses': 0, 'writes': 0})
+        stats[outcome] += 1
+
+    async def get(self, key: str, stage: str = "unknown", model: str = "unknown") -> Optional[Dict[str, Any]]:
+        """Return the cached payload, None on a miss (ResponseCacheMissError in replay-only mode)"""
+        if not self.enabled:
+            return None
+
+        payload = None
+        if key in self._index:
+            try:
+                payload = await asyncio.to_thread(self._read, key)
+                self._index[key]['accessed'] = time.time()
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping unreadable cache entry {key[:12]}: {e}", component="response_cache")
+                await self._remove([key])
+                payload = None
+
+        if payload is not None:
+            self._record(stage, 'hits')
+            logger.debug(f"Response cache hit for {model} ({stage})", component="response_cache", key=key[:12])
+            return payload
+
+        self._record(stage, 'misses')
+        if self.replay_only:
+            raise ResponseCacheMissError(stage, model)
+        return None
+
+    async def put(self, key: str, payload: Dict[str, Any], stage: str = "unknown") -> None:
+        """Store a JSON-serialisable payload (no-op unless mode is read_write)"""
+        if self.mode != "read_write":
+            return
+
+        try:
+            data = json.dumps(payload, default=str)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Response not cacheable: {e}", component="response_cache")
+            return
+
+        try:
+            size = await asyncio.to_thread(self._write, key, data)
+        except OSError as e:
+            logger.warning(f"Failed to write cache entry: {e}", component="response_cache")
+            return
+
+        if key in self._index:
+            self._total_bytes -= self._index[key]['size']
+        self._index[key] = {'size': size, 'accessed': time.time()}
+        self._total_bytes += size
+        self._record(stage, 'writes')
+
+        await self._evict()
+
+    # File access runs in worker threads; the index is only touched on the event loop
+
+    def _read(self, key: str) -> Dict[str, Any]:
+        path = self._path(key)
+        with open(path, 'r') as f:
+            payload = json.load(f)
+        now = time.time()
+        os.utime(path, (now, now))
+        return payload
+
+    def _write(self, key: str, data: str) -> int:
+        path = self._path(key)
+        # Unique temp file, so concurrent writes of the same key can't interleave
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return os.path.getsize(path)
+
+    def _delete(self, keys: List[str]) -> None:
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    async def _remove(self, keys: List[str]) -> None:
+        for key in keys:
+            entry = self._index.pop(key, None)
+            if entry:
+                self._total_bytes -= entry['size']
+        await asyncio.to_thread(self._delete, keys)
+
+    async def _evict(self) -> None:
+        if self._total_bytes <= self.max_bytes:
+            return
+        excess = self._total_bytes - self.max_bytes
+        evicted = []
+        for key in sorted(self._index, key=lambda k: self._index[k]['accessed']):
+            if excess <= 0:
+                break
+            excess -= self._index[key]['size']
+            evicted.append(key)
+        await self._remove(evicted)
+
+    def get_stage_stats(self, stage: str) -> Dict[str, int]:
+        return dict(self._stage_stats.get(stage, {'hits': 0, 'misses': 0, 'writes': 0}))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'entries': len(self._index),
+            'size_mb': self._total_bytes / 1024 / 1024,
+            'max_mb': self.max_bytes / 1024 / 1024,
+            'stages': {stage: dict(stats) for stage, stats in self._stage_stats.items()}
+        }
+
+
+# Global instance
+_response_cache = None
+
+def get_response_cache() -> ResponseCache:
+    """Get or create the process-wide response cache"""
+    global _response_cache
+    if _response_cache is None:
+        config = SystemConfig()
+        _response_cache = ResponseCache(
+            cache_dir=config.response_cache_dir,
+            max_bytes=config.response_cache_max_mb * 1024 * 1024,
+            mode=config.response_cache_mode
+        )
+    return _response_cache
@@ -0,0 +1,132 @@
+"""
+Shelf Crops
+Per-shelf sub-images cut from the structure stage's shelf bands, so each
+shelf-by-shelf products call sends only its own shelf instead of the whole bay
+"""
+
+import asyncio
+import io
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .image_cache import get_image_variant_store
+
+
+# A crop is never shorter than this share of the image height
+MIN_CROP_HEIGHT = 0.1
+
+# Vision providers downscale large images before tokenising them (Anthropic: longest
+# side 1568px, ~1.15 megapixels, about 750 pixels per token)
+_MAX_IMAGE_SIDE = 1568
+_MAX_IMAGE_PIXELS = 1_150_000
+_PIXELS_PER_TOKEN = 750
+
+
+def image_tokens(width: float, height: float) -> int:
+    """Approximate vision input tokens for an image after provider downscaling"""
+    if width <= 0 or height <= 0:
+        return 0
+    scale = min(1.0, _MAX_IMAGE_SIDE / max(width, height), (_MAX_IMAGE_PIXELS / (width * height)) ** 0.5)
+    return max(1, int(width * height * scale * scale / _PIXELS_PER_TOKEN))
+
+
+def shelf_bands(structure: Any) -> Dict[int, Tuple[float, float]]:
+    """{shelf_number: (top, bottom)} from a structure's `shelf_bands`, as fractions of image height
+
+    Accepts structure models or dicts; bands outside the image or inverted are dropped.
+    """
+    raw = structure.get('shelf_bands') if isinstance(structure, dict) else getattr(structure, 'shelf_bands', None)
+    bands = {}
+    for band in raw or []:
+        get = band.get if isinstance(band, dict) else lambda name: getattr(band, name, None)
+        shelf, top, bottom = get('shelf_number'), get('top'), get('bottom')
+        if shelf is None or top is None or bottom is None:
+            continue
+        if 0.0 <= top < bottom <= 1.0:
+            bands[int(shelf)] = (float(top), float(bottom))
+    return bands
+
+
+def padded_band(top: float, bottom: float, margin: float) -> Tuple[float, float]:
+    """Band grown by `margin` of its height on each side and to MIN_CROP_HEIGHT, kept inside the image"""
+    overlap = (bottom - top) * margin
+    top, bottom = top - overlap, bottom + overlap
+    if bottom - top < MIN_CROP_HEIGHT:
+        centre = (top + bottom) / 2
+        top, bottom = centre - MIN_CROP_HEIGHT / 2, centre + MIN_CROP_HEIGHT / 2
+    if top < 0.0:
+        top, bottom = 0.0, bottom - top
+    if bottom > 1.0:
+        top, bottom = top - (bottom - 1.0), 1.0
+    return max(0.0, top), min(1.0, bottom)
+
+
+@dataclass
+class ShelfCrops:
+    """One image cut into per-shelf crops, with the vision-token estimate of each"""
+    images: Dict[int, bytes]
+    crop_tokens: Dict[int, int]
+    full_image_tokens: int
+
+
+async def crop_shelves(image: bytes, structure: Any, margin: float = 0.25) -> Optional[ShelfCrops]:
+    """Crop every shelf band of `structure` out of `image` (None when the structure has no bands)
+
+    Crops go through the run's image variant store, so each one is cut once in a
+    worker thread and shared by every agent, retry and model.
+    """
+    bands = shelf_bands(structure)
+    if not bands:
+        return None
+
+    from PIL import Image
+    with Image.open(io.BytesIO(image)) as img:
+        width, height = img.size
+
+    padded = {shelf: padded_band(top, bottom, margin) for shelf, (top, bottom) in bands.items()}
+    store = get_image_variant_store()
+    crops = await asyncio.gather(*[store.get_crop(image, top, bottom) for top, bottom in padded.values()])
+
+    return ShelfCrops(
+        images=dict(zip(padded, crops)),
+        crop_tokens={shelf: image_tokens(width, height * (bottom - top)) for shelf, (top, bottom) in padded.items()},
+        full_image_tokens=image_tokens(width, height)
+    )
+
+
+@dataclass
+class ShelfCropReport:
+    """Vision-token and latency totals of the shelf calls of one extraction"""
+    shelf_calls: int = 0
+    cropped_calls: int = 0
+    full_image_tokens: int = 0
+    sent_image_tokens: int = 0
+    cropped_seconds: List[float] = field(default_factory=list)
+    full_image_seconds: List[float] = field(default_factory=list)
+
+    def record(self, full_image_tokens: int, sent_image_tokens: int, seconds: float, cropped: bool) -> None:
+        self.shelf_calls += 1
+        self.full_image_tokens += full_image_tokens
+        self.sent_image_tokens += sent_image_tokens
+        if cropped:
+            self.cropped_calls += 1
+            self.cropped_seconds.append(seconds)
+        else:
+            self.full_image_seconds.append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        saved = self.full_image_tokens - self.sent_image_tokens
+        return {
+            'shelf_calls': self.shelf_calls,
+            'cropped_calls': self.cropped_calls,
+            'image_tokens_full': self.full_image_tokens,
+            'image_tokens_sent': self.sent_image_tokens,
+            'image_tokens_saved': saved,
+            'image_token_saving_rate': saved / self.full_image_tokens if self.full_image_tokens else 0.0,
+            'avg_cropped_call_seconds': (
+                sum(self.cropped_seconds) / len(self.cropped_seconds) if self.cropped_seconds else None
+            ),
+            'avg_full_image_call_seconds': (
+                sum(self.full_image_seconds) / len(self.full_image_seconds) if self.full_image_seconds else None
+            )
+        }
@@ -137,6 +137,16 @@ class WebSocketManager:
         }
         await self.broadcast_to_agent(agent_id, message)
     
+    async def broadcast_product_extracted(self, agent_id: str, product: Dict, product_count: int):
+        """Broadcast a product as soon as it has been extracted"""
+        message = {
+            'type': 'product_extracted',
+            'agent_id': agent_id,
+            'product': product,
+            'product_count': product_count
+        }
+        await self.broadcast_to_agent(agent_id, message)
+    
     async def broadcast_escalation(self, agent_id: str, final_accuracy: float, reason: str):
         """Broadcast human escalation needed"""
         message = {
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Stub Batch Server
+Local stand-in for the OpenAI Batch and Anthropic Message Batches APIs, for running
+the queue in batch mode end to end without provider accounts
+
+    python stub_batch_server.py --port 8765 --delay 5
+
+    export QUEUE_BATCH_MODE=all
+    export OPENAI_BATCH_BASE_URL=http://127.0.0.1:8765/v1
+    export ANTHROPIC_BATCH_BASE_URL=http://127.0.0.1:8765
+    export BATCH_COLLECT_SECONDS=2 BATCH_POLL_SECONDS=1
+
+Each request gets a tool call whose arguments are filled in from the request's tool
+schema, so instructor can validate the response models. Batches finish `--delay`
+seconds after they are created.
+"""
+
+import argparse
+import json
+import time
+import uuid
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import PlainTextResponse
+
+app = FastAPI(title="Stub Batch Server")
+
+BATCH_DELAY_SECONDS = 5.0
+
+files: Dict[str, str] = {}
+openai_batches: Dict[str, Dict[str, Any]] = {}
+anthropic_batches: Dict[str, Dict[str, Any]] = {}
+
+
+def _fake_value(schema: Dict[str, Any], defs: Dict[str, Any]) -> Any:
+    """Smallest value that satisfies a JSON schema"""
+    if "$ref" in schema:
+        return _fake_value(defs[schema["$ref"].split("/")[-1]], defs)
+    for combinator in ("anyOf", "oneOf", "allOf"):
+        if combinator in schema:
+            options = [option for option in schema[combinator] if option.get("type") != "null"]
+            return _fake_value(options[0] if options else {}, defs)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "default" in schema:
+        return schema["default"]
+
+    kind = schema.get("type", "object")
+    if kind == "object":
+        return {
+            name: _fake_value(prop, defs)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [_fake_value(schema.get("items", {}), defs) for _ in range(schema.get("minItems", 1))]
+    if kind == "integer":
+        return max(1, schema.get("minimum", 1))
+    if kind == "number":
+        return schema.get("minimum", 0.9)
+    if kind == "boolean":
+        return True
+    return "stub"
+
+
+def _tool_arguments(schema: Dict[str, Any]) -> Dict[str, Any]:
+    return _fake_value(schema, schema.get("$defs", schema.get("definitions", {})))
+
+
+def _usage(body: Dict[str, Any]) -> Dict[str, int]:
+    return {"input": len(json.dumps(body.get("messages", []))) // 4, "output": 200}
+
+
+def _openai_response(body: Dict[str, Any]) -> Dict[str, Any]:
+    message: Dict[str, Any] = {"role": "assistant", "content": None}
+    tools = body.get("tools") or []
+    if tools:
+        function = tools[0]["function"]
+        message["tool_calls"] = [{
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": function["name"], "arguments": json.dumps(_tool_arguments(function["parameters"]))}
+        }]
+    else:
+        message["content"] = "stub response"
+
+    usage = _usage(body)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o"),
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tools else "stop"}],
+        "usage": {
+            "prompt_tokens": usage["input"],
+            "completion_tokens": usage["output"],
+            "total_tokens": usage["input"] + usage["output"]
+        }
+    }
+
+
+def _anthropic_message(body: Dict[str, Any]) -> Dict[str, Any]:
+    tools = body.get("tools") or []
+    if tools:
+        content = [{
+            "type": "tool_use",
+            "id": f"toolu_{uuid.uuid4().hex[:12]}",
+            "name": tools[0]["name"],
+            "input": _tool_arguments(tools[0]["input_schema"])
+        }]
+    else:
+        content = [{"type": "text", "text": "stub response"}]
+
+    usage = _usage(body)
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:12]}",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "claude-3-5-sonnet"),
+        "content": content,
+        "stop_reason": "tool_use" if tools else "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": usage["input"], "output_tokens": usage["output"]}
+    }
+
+
+def _finished(batch: Dict[str, Any]) -> bool:
+    return time.time() - batch["_created"] >= BATCH_DELAY_SECONDS
+
+
+# OpenAI
+
+@app.post("/v1/files")
+async def create_file(file: UploadFile = File(...), purpose: str = Form(...)):
+    file_id = f"file-{uuid.uuid4().hex[:12]}"
+    files[file_id] = (await file.read()).decode("utf-8")
+    return {"id": file_id, "object": "file", "bytes": len(files[file_id]), "created_at": int(time.time()),
+            "filename": file.filename, "purpose": purpose, "status": "processed"}
+
+
+@app.get("/v1/files/{file_id}/content", response_class=PlainTextResponse)
+async def file_content(file_id: str):
+    if file_id not in files:
+        raise HTTPException(status_code=404, detail="No such file")
+    return files[file_id]
+
+
+def _openai_batch_view(batch: Dict[str, Any]) -> Dict[str, Any]:
+    if batch["status"] == "in_progress" and _finished(batch):
+        lines = []
+        for line in files[batch["input_file_id"]].splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            lines.append(json.dumps({
+                "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": _openai_response(request["body"])},
+                "error": None
+            }))
+        output_id = f"file-{uuid.uuid4().hex[:12]}"
+        files[output_id] = "\n".join(lines)
+        batch.update(status="completed", output_file_id=output_id, completed_at=int(time.time()),
+                     request_counts={"total": len(lines), "completed": len(lines), "failed": 0})
+    return {key: value for key, value in batch.items() if not key.startswith("_")}
+
+
+@app.post("/v1/batches")
+async def create_openai_batch(request: Request):
+    params = await request.json()
+    batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+    openai_batches[batch_id] = {
+        "id": batch_id,
+        "object": "batch",
+        "endpoint": params["endpoint"],
+        "input_file_id": params["input_file_id"],
+        "completion_window": params.get("completion_window", "24h"),
+        "status": "in_progress",
+        "created_at": int(time.time()),
+        "output_file_id": None,
+        "error_file_id": None,
+        "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        "_created": time.time()
+    }
+    return _openai_batch_view(openai_batches[batch_id])
+
+
+@app.get("/v1/batches/{batch_id}")
+async def retrieve_openai_batch(batch_id: str):
+    if batch_id not in openai_batches:
+        raise HTTPException(status_code=404, detail="No such batch")
+    return _openai_batch_view(openai_batches[batch_id])
+
+
+# Anthropic
+
+def _anthropic_batch_view(batch: Dict[str, Any]) -> Dict[str, Any]:
+    count = len(batch["_requests"])
+    if batch["processing_status"] == "in_progress" and _finished(batch):
+        batch.update(processing_status="ended", ended_at=_now_iso(),
+                     results_url=f"/v1/messages/batches/{batch['id']}/results")
+    succeeded = count if batch["processing_status"] == "ended" else 0
+    batch["request_counts"] = {"processing": count - succeeded, "succeeded": succeeded,
+                               "errored": 0, "canceled": 0, "expired": 0}
+    return {key: value for key, value in batch.items() if not key.startswith("_")}
+
+
+def _now_iso() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+@app.post("/v1/messages/batches")
+async def create_anthropic_batch(request: Request):
+    params = await request.json()
+    batch_id = f"msgbatch_{uuid.uuid4().hex[:12]}"
+    anthropic_batches[batch_id] = {
+        "id": batch_id,
+        "type": "message_batch",
+        "processing_status": "in_progress",
+        "created_at": _now_iso(),
+        "expires_at": _now_iso(),
+        "ended_at": None,
+        "cancel_initiated_at": None,
+        "archived_at": None,
+        "results_url": None,
+        "_requests": params["requests"],
+        "_created": time.time()
+    }
+    return _anthropic_batch_view(anthropic_batches[batch_id])
+
+
+@app.get("/v1/messages/batches/{batch_id}")
+async def retrieve_anthropic_batch(batch_id: str):
+    if batch_id not in anthropic_batches:
+        raise HTTPException(status_code=404, detail="No such batch")
+    return _anthropic_batch_view(anthropic_batches[batch_id])
+
+
+@app.get("/v1/messages/batches/{batch_id}/results", response_class=PlainTextResponse)
+async def anthropic_batch_results(batch_id: str):
+    batch = anthropic_batches.get(batch_id)
+    if batch is None or batch["processing_status"] != "ended":
+        raise HTTPException(status_code=404, detail="Batch results not ready")
+    return "\n".join(
+        json.dumps({
+            "custom_id": request["custom_id"],
+            "result": {"type": "succeeded", "message": _anthropic_message(request["params"])}
+        })
+        for request in batch["_requests"]
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub OpenAI/Anthropic batch APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=5.0, help="Seconds before a batch completes")
+    args = parser.parse_args()
+
+    BATCH_DELAY_SECONDS = args.delay
+    uvicorn.run(app, host=args.host, port=args.port)
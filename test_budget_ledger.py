@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test budget ledger admission, reservations and deferral
+"""
+
+import asyncio
+
+from src.utils.budget_ledger import BudgetLedger, BudgetLabels, BudgetDeferredError, budget_scope
+from src.utils.cost_tracker import CostLimitExceededException
+
+
+def make_ledger(caps, enabled: bool = True) -> BudgetLedger:
+    # No database URL: an in-process ledger, with short waits so deferral tests run quickly
+    return BudgetLedger(enabled=enabled, caps=caps, headroom=0.9, defer_max_seconds=0.05, poll_seconds=0.01)
+
+
+async def spend(ledger: BudgetLedger, cost: float, labels: BudgetLabels = None) -> None:
+    with budget_scope(labels or BudgetLabels()):
+        async with ledger.reserve(cost, "test call") as reservation:
+            reservation.settle(cost)
+
+
+def test_admission_stops_at_headroom():
+    """New items stop at 90% of a cap, in-flight items may use all of it"""
+    async def run():
+        ledger = make_ledger({'global': {'hourly': 1.00}})
+        assert await ledger.check_admission(BudgetLabels(), 0.50) is None
+
+        await spend(ledger, 0.50)
+        assert ledger.spent('global', 'hourly') == 0.50
+        reason = await ledger.check_admission(BudgetLabels(), 0.45)
+        assert reason is not None and reason.startswith("global hourly")
+
+        # Still within the full cap, so a running item's call goes ahead
+        await spend(ledger, 0.45)
+        assert ledger.deferrals == 0
+
+    asyncio.run(run())
+
+
+def test_scope_caps():
+    """Tenant caps only hold back that tenant; an exact scope overrides its kind"""
+    async def run():
+        ledger = make_ledger({'tenant': {'daily': 1.00}, 'tenant:acme': {'daily': 5.00}})
+        other = BudgetLabels(tenant="other", store="12")
+        acme = BudgetLabels(tenant="acme")
+
+        await spend(ledger, 0.95, other)
+        await spend(ledger, 0.95, acme)
+        assert other.spent == 0.95
+        assert ledger.spent('store:12', 'daily') == 0.95
+        assert ledger.spent('global', 'daily') == 1.90
+
+        assert await ledger.check_admission(other, 0.10) is not None
+        assert await ledger.check_admission(BudgetLabels(tenant="new"), 0.10) is None
+        assert await ledger.check_admission(acme, 0.10) is None
+
+    asyncio.run(run())
+
+
+def test_in_flight_reservations_defer_calls():
+    async def run():
+        ledger = make_ledger({'global': {'hourly': 1.00}})
+        async with ledger.reserve(0.60, "first call"):
+            try:
+                await spend(ledger, 0.60)
+            except BudgetDeferredError as e:
+                assert isinstance(e, CostLimitExceededException)
+                assert (e.scope, e.window) == ('global', 'hourly')
+            else:
+                raise AssertionError("Expected the second call to be deferred")
+        assert ledger.deferrals == 1
+
+        # The unsettled reservation is released without recording spend
+        assert ledger.spent('global', 'hourly') == 0.0
+        await spend(ledger, 0.60)
+        assert ledger.spent('global', 'hourly') == 0.60
+
+    asyncio.run(run())
+
+
+def test_disabled_ledger_admits_everything():
+    async def run():
+        ledger = make_ledger({'global': {'hourly': 0.01}}, enabled=False)
+        assert await ledger.check_admission(BudgetLabels(), 10.0) is None
+        await spend(ledger, 10.0)
+        assert ledger.spent('global', 'hourly') == 0.0
+
+    asyncio.run(run())
+
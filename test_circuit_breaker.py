@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Test the per-model circuit breakers
+"""
+
+import asyncio
+
+from src.utils.error_handling import CircuitBreaker, CircuitBreakerRegistry, CircuitOpenError
+
+
+def make_registry(enabled: bool = True) -> CircuitBreakerRegistry:
+    return CircuitBreakerRegistry(
+        enabled=enabled, error_rate=0.5, slow_call_seconds=0.05, min_calls=4,
+        window_seconds=60.0, cooldown_seconds=30.0
+    )
+
+
+async def call(registry: CircuitBreakerRegistry, error: BaseException = None, delay: float = 0.0):
+    async with registry.guard("anthropic", "claude"):
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+
+
+async def fail(registry: CircuitBreakerRegistry, times: int):
+    for _ in range(times):
+        try:
+            await call(registry, ConnectionError("overloaded"))
+        except ConnectionError:
+            pass
+
+
+def cool_down(breaker: CircuitBreaker) -> None:
+    breaker.opened_at -= breaker.cooldown_seconds
+
+
+def test_opens_once_the_error_rate_is_reached():
+    async def run():
+        registry = make_registry()
+        await call(registry)
+        await call(registry)
+        await fail(registry, 1)
+        assert not registry.is_open("anthropic", "claude")  # below min_calls
+        await fail(registry, 1)
+        assert registry.is_open("anthropic", "claude")
+
+        try:
+            await call(registry)
+        except CircuitOpenError as e:
+            assert 0 < e.retry_after <= 30.0
+        else:
+            raise AssertionError("Expected the open circuit to reject the call")
+        return registry.get("anthropic", "claude").get_state()
+
+    state = asyncio.run(run())
+    assert state['state'] == CircuitBreaker.OPEN
+    assert state['times_opened'] == 1
+    assert state['rejected_calls'] == 1
+    assert state['last_error'] == "ConnectionError: overloaded"
+
+
+def test_slow_calls_count_as_bad():
+    async def run():
+        registry = make_registry()
+        for _ in range(2):
+            await call(registry)
+            await call(registry, delay=0.06)
+        return registry.get("anthropic", "claude")
+
+    breaker = asyncio.run(run())
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_client_errors_are_ignored():
+    async def run():
+        registry = make_registry()
+        for _ in range(5):
+            try:
+                await call(registry, ValueError("bad schema"))
+            except ValueError:
+                pass
+        return registry.get("anthropic", "claude").get_state()
+
+    state = asyncio.run(run())
+    assert state['state'] == CircuitBreaker.CLOSED
+    assert state['window_calls'] == 0
+
+
+def test_half_open_probe_closes_or_reopens():
+    async def run():
+        registry = make_registry()
+        await fail(registry, 4)
+        breaker = registry.get("anthropic", "claude")
+
+        # A failed probe re-opens for another cooldown
+        cool_down(breaker)
+        await fail(registry, 1)
+        assert breaker.state == CircuitBreaker.OPEN and breaker.times_opened == 2
+
+        # Only one probe at a time; its success closes the circuit
+        cool_down(breaker)
+        probe = asyncio.ensure_future(call(registry, delay=0.01))
+        await asyncio.sleep(0)
+        assert breaker.state == CircuitBreaker.HALF_OPEN and breaker.probe_in_flight
+        try:
+            await call(registry)
+        except CircuitOpenError:
+            pass
+        else:
+            raise AssertionError("Expected a second probe to be rejected")
+        await probe
+        return breaker
+
+    breaker = asyncio.run(run())
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.get_state()['window_calls'] == 0
+
+
+def test_cancelled_probe_releases_the_slot():
+    async def run():
+        registry = make_registry()
+        await fail(registry, 4)
+        breaker = registry.get("anthropic", "claude")
+        cool_down(breaker)
+
+        probe = asyncio.ensure_future(call(registry, delay=10))
+        await asyncio.sleep(0)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        return breaker
+
+    breaker = asyncio.run(run())
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.probe_in_flight
+    assert breaker.times_opened == 1
+
+
+def test_disabled_registry_records_without_rejecting():
+    async def run():
+        registry = make_registry(enabled=False)
+        await fail(registry, 4)
+        await call(registry)
+        return registry
+
+    registry = asyncio.run(run())
+    assert not registry.is_open("anthropic", "claude")
+    states = registry.get_states()
+    assert not states['enabled']
+    assert states['breakers'][0]['state'] == CircuitBreaker.OPEN
+    assert states['breakers'][0]['rejected_calls'] == 0
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test focused re-extraction locking with engine-shaped products
+"""
+
+from src.extraction.models import (
+    ProductExtraction, SectionCoordinates, Position, Quantity, AIModelType
+)
+from src.orchestrator.smart_iteration_manager import SmartIterationManager, product_slot
+from src.systems.custom_consensus_visual import CustomConsensusVisualSystem
+
+
+def engine_product(shelf: int, position: int, confidence: float, name: str = None) -> dict:
+    """A product as the visual system receives it: ProductExtraction.model_dump()"""
+    return ProductExtraction(
+        section=SectionCoordinates(horizontal=str(shelf), vertical="Left"),
+        position=Position(l_position_on_section=position, r_position_on_section=4 - position,
+                          l_empty=False, r_empty=False),
+        brand="Coca-Cola",
+        name=name or f"Product {shelf}-{position}",
+        quantity=Quantity(stack=1, columns=2, total_facings=2),
+        shelf_level=shelf,
+        position_on_shelf=position,
+        extraction_confidence=confidence,
+        extracted_by_model=AIModelType.GPT4O_LATEST
+    ).model_dump()
+
+
+def test_product_slot_reads_engine_and_consensus_products():
+    assert product_slot(engine_product(2, 3, 0.97)) == (2, 3, 0.97)
+    consensus = {'name': 'Sprite', 'position': {'shelf': 1, 'position': 4}, 'confidence': 0.9}
+    assert product_slot(consensus) == (1, 4, 0.9)
+    assert product_slot({'name': 'Sprite', 'position': {'shelf': 1}}, default_confidence=0.8) == (1, 0, 0.8)
+    assert product_slot({'name': 'No position'}) is None
+    assert product_slot("not a product") is None
+
+
+def test_confident_engine_products_lock():
+    manager = SmartIterationManager()
+    products = [engine_product(shelf, 1, 0.97) for shelf in (1, 2, 3)]
+    focus = manager.analyze_consensus_products(1, products, shelf_count=3)
+
+    assert manager.structure_locked
+    assert sorted(manager.locked_positions) == [(1, 1), (2, 1), (3, 1)]
+    assert focus.shelves_to_reextract == set()
+
+
+def test_uncertain_and_empty_shelves_are_refocused():
+    manager = SmartIterationManager()
+    products = [
+        engine_product(1, 1, 0.97),
+        engine_product(1, 3, 0.97),
+        engine_product(2, 1, 0.70),
+    ]
+    focus = manager.analyze_consensus_products(1, products, shelf_count=3)
+
+    assert sorted(manager.locked_positions) == [(1, 1), (1, 3)]
+    # Shelf 1 has a gap at position 2, shelf 2 an uncertain product, shelf 3 nothing at all
+    assert focus.shelves_to_reextract == {1, 2, 3}
+    assert focus.positions_to_reextract == {(1, 2), (2, 1)}
+
+
+def test_merge_keeps_locked_and_focus_shelf_products():
+    manager = SmartIterationManager()
+    manager.analyze_consensus_products(1, [engine_product(1, 1, 0.97), engine_product(3, 1, 0.97)], shelf_count=3)
+    focus = {'shelves': [2], 'locked_products': manager.get_locked_products()}
+
+    re_extracted = [
+        engine_product(2, 1, 0.90, name="Fanta"),
+        engine_product(2, 2, 0.85, name="Sprite"),
+        # Off-focus shelves are already confirmed, so these are dropped
+        engine_product(1, 1, 0.60, name="Misread"),
+        engine_product(3, 2, 0.60, name="Phantom"),
+    ]
+    # Only the merge is exercised, so no clients are built
+    system = CustomConsensusVisualSystem.__new__(CustomConsensusVisualSystem)
+    merged = system._merge_locked_products(re_extracted, focus)
+
+    assert sorted((product['shelf_level'], product['position_on_shelf'], product['name']) for product in merged) == [
+        (1, 1, "Product 1-1"), (2, 1, "Fanta"), (2, 2, "Sprite"), (3, 1, "Product 3-1")
+    ]
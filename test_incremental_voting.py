@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test incremental early-exit voting in the custom consensus system
+"""
+
+import asyncio
+
+from src.systems.custom_consensus import (
+    CustomConsensusSystem, DeterministicOrchestrator, ConsensusPolicy
+)
+
+
+EARLY_EXIT = ConsensusPolicy(enabled=True, min_agreeing=2, min_confidence=0.8)
+
+
+def structure(model: str, shelf_count: int, confidence: float) -> dict:
+    return {'model_used': model, 'shelf_count': shelf_count, 'confidence': confidence}
+
+
+def positions(model: str, confidence: float) -> dict:
+    return {'model': model, 'positions': {
+        'shelf_1_pos_1': {'product': 'Coke Zero', 'brand': 'Coca-Cola', 'confidence': confidence},
+        'shelf_1_pos_2': {'product': 'Sprite', 'brand': 'Coca-Cola', 'confidence': confidence},
+    }}
+
+
+def test_structure_vote_locks_once_it_cannot_be_outvoted():
+    vote = DeterministicOrchestrator(EARLY_EXIT).start_vote('structure', 3)
+    assert not vote.add(structure('claude', 4, 0.95))
+    # Two agreeing strong proposals: the third can no longer change the result
+    assert vote.add(structure('gpt4o', 4, 0.9))
+    assert vote.result()['result']['shelf_count'] == 4
+
+
+def test_structure_vote_waits_on_disagreement():
+    vote = DeterministicOrchestrator(EARLY_EXIT).start_vote('structure', 3)
+    vote.add(structure('claude', 4, 0.95))
+    assert not vote.add(structure('gpt4o', 5, 0.9))
+    assert vote.add(structure('gemini', 4, 0.8))
+
+
+def test_failed_calls_count_towards_the_vote():
+    vote = DeterministicOrchestrator(EARLY_EXIT).start_vote('structure', 2)
+    assert not vote.add(None)
+    assert vote.add(structure('claude', 4, 0.95))
+    assert len(vote.proposals) == 1
+
+
+def test_disabled_policy_waits_for_every_proposal():
+    vote = DeterministicOrchestrator().start_vote('structure', 3)
+    assert not vote.add(structure('claude', 4, 0.95))
+    assert not vote.add(structure('gpt4o', 4, 0.95))
+    assert vote.add(structure('gemini', 4, 0.95))
+
+
+def test_position_vote_needs_confident_agreement():
+    orchestrator = DeterministicOrchestrator(EARLY_EXIT)
+
+    vote = orchestrator.start_vote('positions', 3)
+    assert not vote.add(positions('claude', 0.9))
+    assert vote.add(positions('gpt4o', 0.85))
+
+    vote = orchestrator.start_vote('positions', 3)
+    vote.add(positions('claude', 0.9))
+    assert not vote.add(positions('gpt4o', 0.7))
+
+
+def test_collect_votes_cancels_outstanding_calls():
+    # Only the vote bookkeeping is exercised, so no provider clients are built
+    system = CustomConsensusSystem.__new__(CustomConsensusSystem)
+    system.orchestrator = DeterministicOrchestrator(EARLY_EXIT)
+    system.call_latencies = {}
+    system.early_exit_report = {}
+    system.cost_tracker = {'total_cost': 0, 'model_costs': {'gemini': 0.03}, 'api_calls': {'gemini': 1}, 'tokens_used': {}}
+    finished = []
+
+    async def propose(model: str, delay: float, shelf_count: int, confidence: float):
+        await asyncio.sleep(delay)
+        finished.append(model)
+        return structure(model, shelf_count, confidence)
+
+    vote = asyncio.run(system._collect_votes('structure', {
+        'claude': propose('claude', 0.01, 4, 0.95),
+        'gpt4o': propose('gpt4o', 0.02, 4, 0.9),
+        'gemini': propose('gemini', 5.0, 3, 0.8),
+    }))
+
+    assert finished == ['claude', 'gpt4o']
+    assert vote.result()['consensus_reached']
+    report = system.early_exit_report['structure']
+    assert report['early_exits'] == 1
+    assert report['saved_calls'] == 1
+    assert report['saved_cost'] == 0.03
+
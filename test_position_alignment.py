@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test alignment-based position voting
+"""
+
+import numpy as np
+
+from src.systems.position_alignment import PositionAlignmentVoter, align_sequences, text_vectors
+
+
+MODEL_WEIGHTS = {'claude': 1.0, 'gpt4o': 0.9, 'gemini': 0.8}
+SHELF = [("Coca-Cola", "Zero Sugar 330ml"), ("Fanta", "Orange 500ml"), ("Heinz", "Tomato Ketchup 460g")]
+
+
+def required_threshold(num_models: int) -> float:
+    return 0.6 if num_models >= 3 else 0.7
+
+
+def make_voter() -> PositionAlignmentVoter:
+    return PositionAlignmentVoter(lambda model: MODEL_WEIGHTS.get(model, 0.5))
+
+
+def proposal(model: str, items, shelf: int = 1) -> dict:
+    return {'model': model, 'positions': {
+        f"s{shelf}_p{position}": {'brand': brand, 'name': name, 'confidence': 0.9, 'shelf': shelf, 'position': position}
+        for position, (brand, name) in enumerate(items, start=1)
+    }}
+
+
+def voted_products(result: dict):
+    return sorted((product['position'], product['brand']) for product in result['result'].values())
+
+
+def test_text_vectors_are_normalised():
+    vectors = text_vectors([" coca-cola zero ", " coca-cola zero ", " heinz ketchup ", ""])
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1.0)
+    assert np.isclose(vectors[0] @ vectors[1], 1.0)
+    assert vectors[0] @ vectors[2] < 0.5
+    assert not vectors[3].any()
+
+
+def test_align_sequences_skips_an_inserted_item():
+    # The second sequence has an extra item at the front; everything else matches
+    score = np.array([
+        [-0.5, 0.5, -0.5, -0.5],
+        [-0.5, -0.5, 0.5, -0.5],
+        [-0.5, -0.5, -0.5, 0.5],
+    ])
+    assert align_sequences(score, gap=0.05) == [(None, 0), (0, 1), (1, 2), (2, 3)]
+
+
+def test_identical_proposals_reach_consensus():
+    result = make_voter().vote(
+        [proposal(model, SHELF) for model in MODEL_WEIGHTS], required_threshold
+    )
+    assert result['consensus_reached']
+    assert voted_products(result) == [(1, "Coca-Cola"), (2, "Fanta"), (3, "Heinz")]
+    assert all(product['supporting_models'] == 3 for product in result['result'].values())
+
+
+def test_shifted_and_misspelt_proposal_still_votes():
+    """A phantom product at the start of the shelf and a typo don't split the votes"""
+    shifted = [("Unknown", "Shelf Edge Label"), ("Coca-Cola", "Zreo Sugar 330ml")] + SHELF[1:]
+    result = make_voter().vote([
+        proposal('claude', SHELF),
+        proposal('gpt4o', shifted),
+        proposal('gemini', SHELF[:1] + SHELF[2:]),
+    ], required_threshold)
+
+    assert voted_products(result) == [(1, "Coca-Cola"), (2, "Fanta"), (3, "Heinz")]
+    supporting = {product['brand']: product['supporting_models'] for product in result['result'].values()}
+    assert supporting == {"Coca-Cola": 3, "Fanta": 2, "Heinz": 3}
+    # The phantom product only one model reported is not voted in
+    assert result['voting_details']['min_votes_required'] == 2
+
+
+def test_shelves_are_aligned_separately():
+    result = make_voter().vote([
+        {'model': 'claude', 'positions': {**proposal('claude', SHELF[:2])['positions'],
+                                          **proposal('claude', SHELF[2:], shelf=2)['positions']}},
+        {'model': 'gpt4o', 'positions': {**proposal('gpt4o', SHELF[:2])['positions'],
+                                         **proposal('gpt4o', SHELF[2:], shelf=2)['positions']}},
+    ], required_threshold)
+    shelves = sorted((product['shelf'], product['brand']) for product in result['result'].values())
+    assert shelves == [(1, "Coca-Cola"), (1, "Fanta"), (2, "Heinz")]
+
+
+def test_no_valid_proposals():
+    result = make_voter().vote([{'model': 'claude', 'error': 'timeout'}], required_threshold)
+    assert not result['consensus_reached']
+
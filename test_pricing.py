@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test model pricing from provider usage metadata
+"""
+
+from types import SimpleNamespace
+
+from src.utils.pricing import (
+    TokenUsage, usage_from_openai, usage_from_anthropic, usage_from_gemini,
+    price_usage, get_model_price, get_usd_to_gbp_rate, BATCH_DISCOUNT
+)
+
+
+def gbp(usd: float) -> float:
+    return round(usd * get_usd_to_gbp_rate(), 6)
+
+
+def test_usage_from_openai():
+    """Cached prompt tokens are split out of prompt_tokens"""
+    completion = SimpleNamespace(usage=SimpleNamespace(
+        prompt_tokens=1000, completion_tokens=200,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=400)
+    ))
+    usage = usage_from_openai(completion)
+    assert usage.input_tokens == 600
+    assert usage.cached_input_tokens == 400
+    assert usage.output_tokens == 200
+    assert usage.prompt_tokens == 1000
+
+
+def test_usage_from_anthropic():
+    """Cache reads and writes are reported alongside input_tokens"""
+    message = {'usage': {
+        'input_tokens': 300, 'output_tokens': 50,
+        'cache_read_input_tokens': 2000, 'cache_creation_input_tokens': 100
+    }}
+    usage = usage_from_anthropic(message)
+    assert usage.input_tokens == 300
+    assert usage.cached_input_tokens == 2000
+    assert usage.cache_write_tokens == 100
+    assert usage.total_tokens == 2450
+
+
+def test_usage_from_gemini():
+    """Missing usage metadata reads as zero rather than failing"""
+    response = SimpleNamespace(usage_metadata=SimpleNamespace(
+        prompt_token_count=800, candidates_token_count=120, cached_content_token_count=None
+    ))
+    usage = usage_from_gemini(response)
+    assert usage.input_tokens == 800
+    assert usage.cached_input_tokens == 0
+    assert usage.output_tokens == 120
+    assert usage_from_gemini(SimpleNamespace()).total_tokens == 0
+
+
+def test_price_usage_in_gbp():
+    """USD table prices are converted to GBP, cached input at its own rate"""
+    assert price_usage("gpt-4o", TokenUsage(input_tokens=1_000_000), version="2024-12-01") == gbp(2.50)
+    assert price_usage("gpt-4o", TokenUsage(cached_input_tokens=1_000_000), version="2024-12-01") == gbp(1.25)
+    assert price_usage("gpt-4o", TokenUsage(output_tokens=1_000_000), version="2024-12-01") == gbp(10.00)
+
+    claude = TokenUsage(input_tokens=1_000_000, cache_write_tokens=1_000_000)
+    assert price_usage("claude-3-5-sonnet-20241022", claude, version="2024-12-01") == gbp(3.00 + 3.75)
+
+
+def test_batch_discount():
+    usage = TokenUsage(input_tokens=1_000_000, output_tokens=1_000_000)
+    interactive = price_usage("gpt-4o", usage, version="2024-12-01")
+    batched = price_usage("gpt-4o", usage, version="2024-12-01", batch=True)
+    assert abs(batched - interactive * BATCH_DISCOUNT) < 1e-6
+
+
+def test_longest_prefix_wins():
+    """Dated model ids resolve to their own entry before the family entry"""
+    assert get_model_price("gpt-4o-mini-2024-07-18", "2024-12-01")['input'] == 0.15
+    assert get_model_price("gpt-4o-2024-05-13", "2024-12-01")['input'] == 5.00
+    assert get_model_price("gpt-4o-2024-11-20", "2024-12-01")['input'] == 2.50
+
+
+def test_price_table_versions():
+    """Gemini 2.x models are only priced from the 2025-06-01 table on"""
+    usage = TokenUsage(input_tokens=1_000_000)
+    assert price_usage("gemini-2.0-pro-exp-02-05", usage, version="2025-06-01") == gbp(1.25)
+    assert price_usage("gemini-2.5-flash", usage, version="2025-06-01") == gbp(0.30)
+    # Unknown in the older table, so priced at the conservative default
+    assert price_usage("gemini-2.0-pro-exp-02-05", usage, version="2024-12-01") == gbp(15.00)
+    # Published prices are unchanged in later versions
+    assert price_usage("gpt-4o", usage, version="2025-06-01") == price_usage("gpt-4o", usage, version="2024-12-01")
+
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test the provider batch collector against stub_batch_server.py
+"""
+
+import asyncio
+import socket
+import threading
+import time
+from typing import List
+
+import uvicorn
+from pydantic import BaseModel
+
+import stub_batch_server
+from src.utils.provider_batch import ProviderBatchCollector, batch_mode_scope, record_batch_cost
+
+
+class ShelfCount(BaseModel):
+    shelf_count: int
+    shelves: List[str]
+
+
+def start_stub_server() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    stub_batch_server.BATCH_DELAY_SECONDS = 0.2
+    server = uvicorn.Server(uvicorn.Config(stub_batch_server.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 10
+    while not server.started:
+        assert time.time() < deadline, "Stub batch server did not start"
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def make_collector(base_url: str) -> ProviderBatchCollector:
+    return ProviderBatchCollector(
+        openai_api_key="stub", anthropic_api_key="stub",
+        openai_base_url=f"{base_url}/v1", anthropic_base_url=base_url,
+        collect_seconds=0.1, poll_seconds=0.1
+    )
+
+
+def test_structured_calls_through_both_batch_apis():
+    collector = make_collector(start_stub_server())
+    messages = [{"role": "user", "content": "How many shelves?"}]
+
+    async def run():
+        openai_client = collector.instructor_client("openai")
+        anthropic_client = collector.instructor_client("anthropic")
+        return await asyncio.gather(
+            openai_client.chat.completions.create(
+                model="gpt-4o", messages=messages, response_model=ShelfCount, max_retries=0
+            ),
+            openai_client.chat.completions.create(
+                model="gpt-4o", messages=messages, response_model=ShelfCount, max_retries=0
+            ),
+            anthropic_client.messages.create(
+                model="claude-3-5-sonnet-20241022", messages=messages, max_tokens=1024,
+                response_model=ShelfCount, max_retries=0
+            )
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ShelfCount) for result in results)
+
+    stats = collector.get_stats()
+    # Both OpenAI calls arrived within the collect window, so they share one batch
+    assert stats['batches'] == 2
+    assert stats['requests'] == 3
+    assert stats['failed_requests'] == 0
+    assert sorted(batch['provider'] for batch in stats['recent_batches']) == ["anthropic", "openai"]
+
+
+def test_instructor_clients_are_reused():
+    collector = make_collector("http://127.0.0.1:9")
+    assert collector.instructor_client("openai") is collector.instructor_client("openai")
+    assert collector.instructor_client("anthropic") is not collector.instructor_client("openai")
+
+
+def test_streaming_requests_are_rejected():
+    collector = make_collector("http://127.0.0.1:9")
+    try:
+        asyncio.run(collector._openai_create(model="gpt-4o", messages=[], stream=True))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected streaming to be rejected")
+
+
+def test_batch_costs_are_attributed_to_the_scope_item():
+    collector = make_collector("http://127.0.0.1:9")
+    record_batch_cost(1.0, 2.0)  # outside a scope: ignored
+    with batch_mode_scope(collector, 42) as item:
+        record_batch_cost(0.05, 0.10)
+        record_batch_cost(0.05, 0.10)
+    report = item.report()
+    assert report['batched_requests'] == 2
+    assert abs(report['cost_saving'] - 0.10) < 1e-9
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test provider token buckets, concurrency caps and usage reconciliation
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from src.utils.rate_limiter import TokenBucket, ProviderRateLimiter, estimate_request_tokens
+
+
+def make_limiter(provider_limits, model_limits=None, enabled: bool = True) -> ProviderRateLimiter:
+    return ProviderRateLimiter(SimpleNamespace(
+        rate_limiter_enabled=enabled,
+        provider_rate_limits=provider_limits,
+        model_rate_limits=model_limits or {}
+    ))
+
+
+def test_estimate_request_tokens():
+    assert estimate_request_tokens("x" * 400, image_count=2, max_tokens=500) == 100 + 2000 + 500
+
+
+def test_bucket_refills_at_the_per_minute_rate():
+    bucket = TokenBucket(600)  # 10 tokens a second
+    bucket.consume(600)
+    assert 0 < bucket.time_until_available(10) <= 1.0
+    bucket.updated_at -= 1.0
+    assert bucket.time_until_available(10) == 0.0
+
+
+def test_oversized_requests_wait_for_a_full_bucket():
+    bucket = TokenBucket(60)
+    assert bucket.time_until_available(1000) == 0.0
+    bucket.consume(1000)
+    assert bucket.tokens == 0.0
+    assert 59.0 < bucket.time_until_available(1000) <= 60.0
+
+
+def test_refund_is_capped_at_capacity():
+    bucket = TokenBucket(100)
+    bucket.consume(80)
+    bucket.refund(500)
+    assert bucket.tokens == 100.0
+    bucket.refund(-30)  # actual usage above the estimate charges the difference
+    assert 69.9 < bucket.tokens <= 70.1
+
+
+def test_record_usage_reconciles_provider_and_model_buckets():
+    async def run():
+        limiter = make_limiter(
+            {'openai': {'tokens_per_minute': 10_000}},
+            {'gpt-4o': {'tokens_per_minute': 5_000}}
+        )
+        async with limiter.acquire('openai', 'gpt-4o', estimated_tokens=4_000):
+            pass
+        limiter.record_usage('openai', 'gpt-4o', 4_000, 1_000)
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert 8_999 < limiter._buckets['openai']['tokens'].tokens <= 9_001
+    assert 3_999 < limiter._buckets['openai:gpt-4o']['tokens'].tokens <= 4_001
+    stats = limiter.get_stats()['openai']
+    assert stats['estimated_tokens'] == 4_000
+    assert stats['actual_tokens'] == 1_000
+    assert stats['models']['gpt-4o']['actual_tokens'] == 1_000
+
+
+def test_concurrency_cap():
+    async def run():
+        limiter = make_limiter({'anthropic': {'max_concurrency': 2}})
+        running, peak = 0, 0
+
+        async def call():
+            nonlocal running, peak
+            async with limiter.acquire('anthropic'):
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        return peak, limiter.get_stats()['anthropic']
+
+    peak, stats = asyncio.run(run())
+    assert peak == 2
+    assert stats['requests'] == 6
+    assert stats['in_flight'] == 0
+
+
+def test_empty_request_bucket_delays_the_call():
+    async def run():
+        limiter = make_limiter({'google': {'requests_per_minute': 1}})
+        async with limiter.acquire('google'):
+            pass
+        # Pretend the minute is nearly over so the next call only waits briefly
+        limiter._buckets['google']['requests'].tokens = 1 - 0.05 / 60
+        async with limiter.acquire('google'):
+            pass
+        return limiter.get_stats()['google']
+
+    stats = asyncio.run(run())
+    assert stats['requests'] == 2
+    assert 0.0 < stats['max_wait_seconds'] < 1.0
+
+
+def test_disabled_limiter_passes_calls_through():
+    async def run():
+        limiter = make_limiter({'anthropic': {'requests_per_minute': 1, 'max_concurrency': 1}}, enabled=False)
+        for _ in range(3):
+            async with limiter.acquire('anthropic', estimated_tokens=1_000_000):
+                pass
+        limiter.record_usage('anthropic', None, 1_000_000, 10)
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter._buckets == {}
+    assert limiter.get_stats() == {}
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test the disk-backed response cache
+"""
+
+import asyncio
+import os
+
+from src.utils.response_cache import ResponseCache, ResponseCacheMissError
+
+
+def test_round_trip_and_stage_stats(tmp_path):
+    async def run():
+        cache = ResponseCache(str(tmp_path), max_bytes=1024 * 1024)
+        key = cache.make_key("gpt-4o", "Count the shelves", ["abc"], "ShelfStructure", 0.0)
+        assert await cache.get(key, stage="structure") is None
+        await cache.put(key, {'shelf_count': 4}, stage="structure")
+        assert await cache.get(key, stage="structure") == {'shelf_count': 4}
+        return cache
+
+    cache = asyncio.run(run())
+    assert cache.get_stage_stats("structure") == {'hits': 1, 'misses': 1, 'writes': 1}
+    # Entries survive a restart
+    assert ResponseCache(str(tmp_path), max_bytes=1024 * 1024).get_stats()['entries'] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    async def run():
+        cache = ResponseCache(str(tmp_path), max_bytes=250)
+        for key in ("a", "b", "c"):
+            await cache.put(key, {'text': key * 80})
+            await asyncio.sleep(0.01)
+        return cache
+
+    cache = asyncio.run(run())
+    assert sorted(cache._index) == ["b", "c"]
+    assert sorted(os.listdir(tmp_path)) == ["b.json", "c.json"]
+
+
+def test_unreadable_entries_are_dropped(tmp_path):
+    async def run():
+        cache = ResponseCache(str(tmp_path), max_bytes=1024)
+        await cache.put("broken", {'text': "ok"})
+        (tmp_path / "broken.json").write_text("{not json")
+        assert await cache.get("broken") is None
+        return cache
+
+    cache = asyncio.run(run())
+    assert cache.get_stats()['entries'] == 0
+    assert not (tmp_path / "broken.json").exists()
+
+
+def test_replay_only_misses_fail(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1024, mode="replay_only")
+    try:
+        asyncio.run(cache.get("missing", stage="products", model="claude"))
+    except ResponseCacheMissError as e:
+        assert (e.stage, e.model) == ("products", "claude")
+    else:
+        raise AssertionError("Expected a replay-only miss to fail")
+    # Replay-only never writes
+    asyncio.run(cache.put("missing", {'text': "ok"}))
+    assert os.listdir(tmp_path) == []
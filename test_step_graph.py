@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test dependency-graph scheduling of extraction sequence steps
+"""
+
+import asyncio
+
+from src.extraction.engine import ModularExtractionEngine
+from src.extraction.models import ExtractionStep, AIModelType
+
+
+def make_step(step_id: str, *dependencies: str) -> ExtractionStep:
+    return ExtractionStep(
+        step_id=step_id,
+        model=AIModelType.GPT4O_LATEST,
+        prompt_template=f"{step_id} prompt",
+        input_dependencies=list(dependencies),
+        output_schema="Dict[str, float]"
+    )
+
+
+def make_engine() -> ModularExtractionEngine:
+    # The graph helpers need no provider clients
+    return ModularExtractionEngine.__new__(ModularExtractionEngine)
+
+
+# structure -> products -> (pricing, facings) -> final
+STEPS = [
+    make_step("structure"),
+    make_step("products", "structure"),
+    make_step("pricing", "products"),
+    make_step("facings", "products", "structure"),
+    make_step("final", "pricing", "facings"),
+]
+
+
+def test_dependencies_ignore_steps_outside_sequence():
+    engine = make_engine()
+    dependencies = engine._step_dependencies([make_step("a", "earlier_run"), make_step("b", "a", "b")])
+    assert dependencies == {"a": [], "b": ["a"]}
+
+
+def test_duplicate_ids_and_cycles_rejected():
+    engine = make_engine()
+    for steps in (
+        [make_step("a"), make_step("a")],
+        [make_step("a", "c"), make_step("b", "a"), make_step("c", "b")],
+    ):
+        try:
+            engine._step_dependencies(steps)
+        except ValueError:
+            continue
+        raise AssertionError(f"Expected ValueError for {[step.step_id for step in steps]}")
+
+
+def run_graph(parallelism: int):
+    """Run STEPS with short sleeps; returns (start order, finish order, peak concurrency)"""
+    engine = make_engine()
+    dependencies = engine._step_dependencies(STEPS)
+    started, finished = [], []
+    running = {'now': 0, 'peak': 0}
+
+    async def run_step(step: ExtractionStep) -> None:
+        started.append(step.step_id)
+        running['now'] += 1
+        running['peak'] = max(running['peak'], running['now'])
+        try:
+            await asyncio.sleep(0.02 if step.step_id == "pricing" else 0.01)
+            finished.append(step.step_id)
+        finally:
+            running['now'] -= 1
+
+    asyncio.run(engine._run_step_graph(STEPS, dependencies, run_step, parallelism))
+    return started, finished, running['peak']
+
+
+def test_sequential_by_default():
+    """Parallelism 1 keeps the list order"""
+    started, finished, peak = run_graph(parallelism=1)
+    assert started == [step.step_id for step in STEPS]
+    assert finished == started
+    assert peak == 1
+
+
+def test_independent_steps_run_together():
+    started, finished, peak = run_graph(parallelism=4)
+    assert peak == 2
+    assert set(started[2:4]) == {"pricing", "facings"}
+    # Every step starts only after its dependencies finished
+    for step in STEPS:
+        for dependency in step.input_dependencies:
+            assert finished.index(dependency) < started.index(step.step_id)
+    assert finished[-1] == "final"
+
+
+def test_failure_cancels_running_steps():
+    """The first failing step's error is raised and the steps still running are cancelled"""
+    engine = make_engine()
+    dependencies = engine._step_dependencies(STEPS)
+    started, finished = [], []
+
+    async def run_step(step: ExtractionStep) -> None:
+        started.append(step.step_id)
+        await asyncio.sleep(0.02 if step.step_id == "pricing" else 0.01)
+        if step.step_id == "facings":
+            raise RuntimeError("facings failed")
+        finished.append(step.step_id)
+
+    try:
+        asyncio.run(engine._run_step_graph(STEPS, dependencies, run_step, 4))
+    except RuntimeError as e:
+        assert "facings failed" in str(e)
+    else:
+        raise AssertionError("Expected the failing step's error")
+    assert "pricing" in started and "pricing" not in finished
+    assert "final" not in started
+
+
+def test_critical_path():
+    engine = make_engine()
+    dependencies = engine._step_dependencies(STEPS)
+    durations = {"structure": 1.0, "products": 3.0, "pricing": 2.0, "facings": 0.5, "final": 1.0}
+    path, duration = engine._critical_path(STEPS, dependencies, durations)
+    assert path == ["structure", "products", "pricing", "final"]
+    assert duration == 7.0
+    assert engine._critical_path([], {}, {}) == ([], 0.0)
+
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test warm extraction system reuse in the system pool
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from src.systems.base_system import ExtractionSystemFactory, RunContext
+from src.systems.system_pool import SystemPool
+
+
+class FakeSystem:
+    """Stands in for an extraction system: records the runs it was started for"""
+
+    def __init__(self, config):
+        self.config = config
+        self.runs = []
+
+    def begin_run(self, context: RunContext) -> None:
+        self.runs.append(context.upload_id)
+
+    def sdk_client_count(self) -> int:
+        return 3
+
+
+def use_fake_systems(monkeypatch) -> list:
+    built = []
+
+    def get_system(system_type, config):
+        built.append(FakeSystem(config))
+        return built[-1]
+
+    monkeypatch.setattr(ExtractionSystemFactory, "get_system", staticmethod(get_system))
+    return built
+
+
+async def run(pool: SystemPool, upload_id: str, config, fail: bool = False):
+    async with pool.lease("custom", config, RunContext(upload_id=upload_id)) as lease:
+        if fail:
+            raise RuntimeError("extraction failed")
+        return lease
+
+
+def test_idle_system_is_reused(monkeypatch):
+    built = use_fake_systems(monkeypatch)
+    pool = SystemPool(max_idle=2)
+    config = SimpleNamespace(temperature=0.7)
+
+    first = asyncio.run(run(pool, "upload-1", config))
+    second = asyncio.run(run(pool, "upload-2", SimpleNamespace(temperature=0.7)))
+
+    assert len(built) == 1
+    assert not first.reused and second.reused
+    assert second.system is first.system
+    assert first.system.runs == ["upload-1", "upload-2"]
+    assert second.saved_handshakes == 3
+    summary = pool.summary()['custom']
+    assert (summary['builds'], summary['reuses'], summary['idle']) == (1, 1, 1)
+    assert summary['saved_handshakes'] == 3
+
+
+def test_different_config_builds_a_new_system(monkeypatch):
+    built = use_fake_systems(monkeypatch)
+    pool = SystemPool()
+    asyncio.run(run(pool, "upload-1", SimpleNamespace(temperature=0.7)))
+    lease = asyncio.run(run(pool, "upload-2", SimpleNamespace(temperature=0.2)))
+
+    assert len(built) == 2
+    assert not lease.reused
+    assert pool.summary()['custom']['idle'] == 2
+
+
+def test_concurrent_runs_get_their_own_systems(monkeypatch):
+    built = use_fake_systems(monkeypatch)
+    pool = SystemPool()
+    config = SimpleNamespace(temperature=0.7)
+
+    async def overlapping():
+        async with pool.lease("custom", config, RunContext(upload_id="a")) as first:
+            async with pool.lease("custom", config, RunContext(upload_id="b")) as second:
+                return first.system is second.system
+
+    assert not asyncio.run(overlapping())
+    assert len(built) == 2
+
+
+def test_failed_run_drops_the_system(monkeypatch):
+    built = use_fake_systems(monkeypatch)
+    pool = SystemPool()
+    config = SimpleNamespace(temperature=0.7)
+    try:
+        asyncio.run(run(pool, "upload-1", config, fail=True))
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("Expected the run's error to propagate")
+
+    assert pool.summary()['custom']['idle'] == 0
+    lease = asyncio.run(run(pool, "upload-2", config))
+    assert not lease.reused
+    assert len(built) == 2
+
+
+def test_idle_systems_are_capped(monkeypatch):
+    use_fake_systems(monkeypatch)
+    pool = SystemPool(max_idle=1)
+    config = SimpleNamespace(temperature=0.7)
+
+    async def three_at_once():
+        async with pool.lease("custom", config, RunContext(upload_id="a")), \
+                pool.lease("custom", config, RunContext(upload_id="b")), \
+                pool.lease("custom", config, RunContext(upload_id="c")):
+            pass
+
+    asyncio.run(three_at_once())
+    assert pool.summary()['custom']['idle'] == 1